@@ -3,18 +3,18 @@ Aplicação Streamlit principal do VerbaFlow.
 """
 import os
 import re
+import uuid
+import pandas as pd
+from contextlib import nullcontext
 import streamlit as st
 from pathlib import Path
 from dotenv import load_dotenv
-from crewai import Crew, Process
-import sys
-from io import StringIO
 
 # Carregar variáveis de ambiente do arquivo .env
 load_dotenv()
 
 # Importar estilos customizados
-from src.styles import inject_custom_css, apply_page_config
+from src.styles import inject_custom_css, apply_page_config, confirm_theme_injection
 
 # Aplicar configuração e estilos
 apply_page_config()
@@ -22,80 +22,418 @@ inject_custom_css()
 
 from src.utils import (
     fetch_newsgroups_samples,
-    clean_text,
     load_custom_csv,
+    detect_csv_columns,
     extract_ground_truth_from_filename,
     get_text_from_file
 )
-from src.agents import (
-    get_llm,
-    get_llm_with_fallback,
-    create_analyst_agent,
-    create_researcher_agent,
-    create_editor_agent
-)
-from src.tasks import (
-    create_classification_task,
-    create_enrichment_task,
-    create_reporting_task
+from src.pipeline import (
+    run_pipeline,
+    run_batch_classification,
+    build_few_shot_examples,
+    is_rate_limit_error
 )
+from src.labels import LabelSet, NEWSGROUPS_LABEL_SET, load_csv_label_set
+from src.jobs import JobQueue, JOB_DONE, JOB_FAILED
 from src.config import get_config
-from src.models import ClassificationOutput
-import json
+from src.profiling import RunProfiler, should_profile
+from src.samples import DEFAULT_SAMPLES_DIR, get_sample_index
+from src.prefetch import get_prefetcher
+from src.session import SessionContext
+
+
+MODEL_CHOICES = [
+    "llama-3.1-8b-instant (Recomendado: Mais rápido, menos tokens) ⭐",
+    "llama-3.3-70b-versatile (Melhor qualidade, mais tokens)",
+    "mixtral-8x7b-32768 (Alternativa)"
+]
+
+
+def current_session() -> SessionContext:
+    """Credenciais e modelo desta sessão do navegador (definidos na sidebar)."""
+    return st.session_state.get('session_context') or SessionContext()
+
 
+def use_small_model():
+    """Callback: seleciona o modelo menor na sidebar antes do próximo rerun."""
+    st.session_state['model_choice'] = MODEL_CHOICES[0]
 
-def extract_category_robust(text: str) -> str:
+
+def show_rate_limit_error(error_str: str):
     """
-    Extrai a categoria do output do modelo com parsing robusto.
-    Tenta múltiplos padrões regex para encontrar 'Category: <nome>'.
-    Também procura no relatório final por "Categoria Identificada:".
+    Exibe a mensagem de rate limit do Groq com as soluções sugeridas.
     
     Args:
-        text: Texto do output do modelo
+        error_str: Mensagem de erro original
+    """
+    # Extrair tempo de espera se disponível
+    wait_time = "algumas horas"
+    if "try again in" in error_str.lower():
+        time_match = re.search(r'try again in (\d+m\d+\.\d+s)', error_str, re.IGNORECASE)
+        if time_match:
+            wait_time = time_match.group(1)
+    
+    # Rate limit atingido - mostrar mensagem de erro
+    st.error("""
+    ## ⚠️ Rate Limit Atingido
+    
+    Você atingiu o limite diário de tokens do Groq (100,000 tokens/dia no tier gratuito).
+    
+    **📊 Informações:**
+    - Limite: 100,000 tokens/dia (tier gratuito)
+    - Modelo atual: """ + f"{current_session().resolve_model()}" + """
+    - Tempo estimado para reset: """ + wait_time + """
+    
+    **💡 Soluções Imediatas:**
+    
+    1. **Trocar para modelo menor:** 
+       - Vá na sidebar e selecione `llama-3.1-8b-instant`
+       - Este modelo consome **~10x menos tokens** que o 70b
+       - Qualidade ainda é excelente para classificação
+    
+    2. **Aguardar reset:** 
+       - O limite será resetado automaticamente (geralmente à meia-noite UTC)
+       - Tempo estimado: """ + wait_time + """
+    
+    3. **Upgrade para Dev Tier:**
+       - Limite muito maior (30M tokens/dia)
+       - Acesso a modelos premium
+       - https://console.groq.com/settings/billing
+    
+    **🎯 Recomendação:** Use `llama-3.1-8b-instant` como padrão - é rápido, eficiente e tem qualidade excelente!
+    """)
+    
+    # Botão para trocar modelo automaticamente
+    if st.button("🔄 Trocar para llama-3.1-8b-instant agora", type="primary", on_click=use_small_model):
+        st.success("✅ Modelo alterado para llama-3.1-8b-instant! Tente novamente.")
+
+
+def text_preview(raw_text: str) -> str:
+    """
+    Trecho do texto exibido nas caixas de texto (INPUT_PREVIEW_CHARS), para não
+    reenviar entradas enormes ao navegador a cada rerun.
+    
+    Args:
+        raw_text: Texto completo
     
     Returns:
-        Categoria extraída ou string vazia
+        Texto completo ou seu início com a indicação do tamanho total
+    """
+    limit = get_config().input_preview_chars
+    if len(raw_text) <= limit:
+        return raw_text
+    return f"{raw_text[:limit]}\n\n[... exibindo {limit:,} de {len(raw_text):,} caracteres]"
+
+
+def render_results(record: dict, raw_text: str, ground_truth: str):
+    """
+    Renderiza a validação e o relatório de um execution_record.
+    
+    Args:
+        record: execution_record produzido por run_pipeline
+        raw_text: Texto original exibido ao lado da validação
+        ground_truth: Categoria real
+    """
+    predicted_category = record.get('predicted', '')
+    
+    if record.get('trace_output', '').strip():
+        with st.expander("📊 Detalhes do Tracing (CrewAI)", expanded=False):
+            st.code(record['trace_output'], language="text")
+    
+    # Layout de duas colunas para resultados
+    st.markdown("---")
+    st.markdown("## 📊 Resultados da Análise")
+    
+    col_left, col_right = st.columns([1, 1])
+    
+    with col_left:
+        st.markdown("### 📄 Texto Original")
+        # Usando st.text_area que é mais semântico e permite rolagem nativa
+        st.text_area(
+            "Texto Original",
+            text_preview(raw_text),
+            height=300,
+            disabled=True,
+            label_visibility="collapsed"
+        )
+
+        st.markdown(f"**🏷️ Categoria Real (Ground Truth):**")
+        st.markdown(f'<span class="category-badge">{ground_truth}</span>', unsafe_allow_html=True)
+    
+    with col_right:
+        st.markdown("### ✅ Validação da Classificação")
+        
+        if record.get('is_correct'):
+            st.markdown('<div class="success-indicator">✅ Classificação Correta!</div>', unsafe_allow_html=True)
+            st.balloons()
+        else:
+            st.markdown('<div class="error-indicator">❌ Classificação Incorreta</div>', unsafe_allow_html=True)
+        
+        # Métricas
+        st.metric("Categoria Real", ground_truth)
+        st.metric("Categoria Prevista", predicted_category if predicted_category else "Não encontrada")
+        
+        probabilities = (record.get('classification_data') or {}).get('probabilities')
+        if probabilities:
+            # Modo logprob ou ensemble: distribuição sobre as categorias
+            st.metric("Confiança", f"{record['classification_data'].get('confidence_score', 0):.1%}")
+            top = sorted(probabilities.items(), key=lambda item: item[1], reverse=True)[:5]
+            st.bar_chart(pd.Series(dict(top), name="Probabilidade"), horizontal=True)
+            members = record['classification_data'].get('ensemble_members')
+            if members:
+                st.caption("🗳️ Decidido por voto: " + ", ".join(
+                    f"{m['model']} (t={m['temperature']}) → {m['final_category']}" for m in members
+                ))
+        
+        if record.get('near_duplicate_similarity'):
+            st.caption(f"♻️ Classificação reaproveitada de um texto quase idêntico (similaridade {record['near_duplicate_similarity']:.0%})")
+    
+    # Relatório completo em seção expandível
+    st.markdown("---")
+    
+    # Usar HTML customizado para evitar problema de ícone
+    st.markdown("""
+    <details open style="background-color: #1e1e1e; padding: 1rem; border-radius: 8px; margin: 1rem 0; border: 1px solid rgba(255,255,255,0.1);">
+        <summary style="font-weight: 600; font-size: 1.1rem; cursor: pointer; padding: 0.5rem; color: #FFFFFF;">
+            📋 Relatório Enriquecido Completo
+        </summary>
+        <div style="margin-top: 1rem; padding: 1rem; background-color: #121212; border-radius: 4px; color: #FFFFFF;">
+    """, unsafe_allow_html=True)
+    
+    # Renderizar markdown se disponível, senão mostrar resultado completo
+    st.markdown(record.get('report_markdown') or record.get('report', ''))
+    
+    st.markdown("""
+        </div>
+    </details>
+    """, unsafe_allow_html=True)
+    
+    if record.get('profile'):
+        render_profile(record['profile'])
+
+
+def render_profile(profile: dict):
+    """
+    Exibe o resumo de uma execução perfilada (src/profiling.py).
+    
+    Args:
+        profile: Resumo gravado em record['profile']
+    """
+    with st.expander("🔬 Perfil da Execução", expanded=False):
+        col_wall, col_cpu, col_mem = st.columns(3)
+        col_wall.metric("Tempo total", f"{profile['wall_time']:.2f}s")
+        col_cpu.metric("Tempo de CPU", f"{profile['cpu_time']:.2f}s")
+        if profile.get('peak_memory_mb') is not None:
+            col_mem.metric("Pico de memória", f"{profile['peak_memory_mb']:.1f} MiB")
+        
+        st.markdown("**Para onde foi o tempo** (amostras de pilha):")
+        st.bar_chart(pd.Series(profile['breakdown'], name="Fração"), horizontal=True)
+        if profile.get('top_functions'):
+            st.dataframe(pd.DataFrame(profile['top_functions']), use_container_width=True)
+        
+        st.caption(f"Artefatos em `{profile['dir']}`: profile.pstats, stacks.collapsed (flamegraph), memory.txt")
+        stacks_path = Path(profile['dir']) / "stacks.collapsed"
+        if stacks_path.exists():
+            st.download_button(
+                "⬇️ Baixar pilhas (collapsed)",
+                stacks_path.read_bytes(),
+                file_name=f"{Path(profile['dir']).name}.collapsed",
+                mime="text/plain",
+                key=f"profile_{Path(profile['dir']).name}"
+            )
+
+
+def save_to_history(record: dict):
+    """
+    Salva o execution_record na sessão e no histórico (limitado a max_history_items).
+    
+    Args:
+        record: execution_record produzido por run_pipeline
+    """
+    st.session_state['last_result'] = record
+    
+    if 'execution_history' not in st.session_state:
+        st.session_state['execution_history'] = []
+    
+    # Não duplicar registros já adicionados (ex: job exibido em vários reruns)
+    if record.get('job_id') and any(h.get('job_id') == record['job_id'] for h in st.session_state['execution_history']):
+        return
+    
+    st.session_state['execution_history'].append(record)
+    
+    # Manter apenas os últimos N itens
+    max_items = get_config().max_history_items
+    if len(st.session_state['execution_history']) > max_items:
+        st.session_state['execution_history'] = st.session_state['execution_history'][-max_items:]
+
+
+@st.cache_resource
+def get_job_queue() -> JobQueue:
+    """Fila de jobs compartilhada por todas as sessões do processo."""
+    return JobQueue()
+
+
+@st.fragment(run_every=get_config().job_poll_interval)
+def render_job_progress(job_id: str):
+    """
+    Fragmento de polling: reexecuta apenas este trecho da página até o job terminar,
+    sem bloquear o restante da interface. Ao terminar, dispara um rerun completo.
+    
+    Args:
+        job_id: ID do job submetido
+    """
+    job = get_job_queue().get(job_id)
+    if job is None or job['status'] in (JOB_DONE, JOB_FAILED):
+        st.rerun()
+    with st.status(job.get('stage') or "⏳ Aguardando worker...", expanded=True, state="running"):
+        st.caption("Você pode continuar usando a página; o job roda em um worker separado.")
+
+
+def render_job_panel(job_id: str):
+    """
+    Acompanha um job da fila: mostra a etapa atual e, ao concluir, os resultados.
+    
+    Args:
+        job_id: ID do job submetido
+    """
+    job = get_job_queue().get(job_id)
+    if job is None:
+        st.warning(f"⚠️ Job {job_id} não encontrado.")
+        st.session_state.pop('active_job_id', None)
+        st.query_params.pop('job', None)
+        return
+    
+    payload = job['payload']
+    st.markdown(f"### 🧾 Job `{job_id[:8]}`")
+    if st.button("✖️ Fechar job", key="close_job"):
+        st.session_state.pop('active_job_id', None)
+        st.query_params.pop('job', None)
+        st.rerun()
+    
+    if job['status'] == JOB_FAILED:
+        error = job.get('error') or ""
+        if is_rate_limit_error(error):
+            show_rate_limit_error(error)
+        else:
+            st.error(f"❌ Erro durante execução: {error}")
+        return
+    
+    if job['status'] != JOB_DONE:
+        render_job_progress(job_id)
+        return
+    
+    record = dict(job['result'], job_id=job_id)
+    save_to_history(record)
+    render_results(record, payload['raw_text'], payload.get('ground_truth', ''))
+
+
+def session_id() -> str:
+    """Identificador estável da sessão do navegador (chave da especulação)."""
+    if 'session_id' not in st.session_state:
+        st.session_state['session_id'] = uuid.uuid4().hex
+    return st.session_state['session_id']
+
+
+def speculate_classification(raw_text: str, label_set: LabelSet, ground_truth: str = ""):
+    """
+    Modo especulativo: começa a classificação em segundo plano assim que a
+    amostra é exibida, com o mesmo modelo e few-shot que o clique usará.
+    
+    Args:
+        raw_text: Texto bruto selecionado
+        label_set: Conjunto de categorias da fonte de dados
+        ground_truth: Categoria real (filtra o rótulo enviado ao classificador local)
+    """
+    if not st.session_state.get('speculative_prefetch'):
+        return
+    # Amostra recém-executada: o histórico (e com ele o few-shot) mudou, e
+    # especular de novo pagaria outra classificação do mesmo texto
+    if st.session_state.get('last_executed') == (label_set.name, raw_text):
+        return
+    session = current_session()
+    get_prefetcher().speculate(
+        session_id(),
+        raw_text,
+        label_set,
+        model_name=session.resolve_model(),
+        few_shot_examples=build_few_shot_examples(st.session_state.get('execution_history', []), label_set),
+        session=session,
+        ground_truth=ground_truth
+    )
+
+
+def execute_verbaflow(raw_text: str, ground_truth: str, label_set: LabelSet):
+    """
+    Executa o VerbaFlow para um texto (inline ou via fila de jobs) e exibe o resultado.
+    
+    Args:
+        raw_text: Texto bruto selecionado
+        ground_truth: Categoria real
+        label_set: Conjunto de categorias da fonte de dados
     """
-    if not text:
-        return ""
-    
-    # Padrões regex para tentar (em ordem de especificidade)
-    patterns = [
-        r'Category:\s*([^\n\r]+)',  # Padrão básico
-        r'Category\s*:\s*([^\n\r]+)',  # Com espaços variáveis
-        r'Categoria\s+Identificada:\s*([^\n\r]+)',  # Do relatório final
-        r'Categoria:\s*([^\n\r]+)',  # Em português
-        r'Category\s*=\s*([^\n\r]+)',  # Com igual
-        r'Final\s+Category:\s*([^\n\r]+)',  # Com prefixo
-        r'Classified\s+as:\s*([^\n\r]+)',  # Alternativo
-        r'categoria\s+identificada[:\s]+([^\n\r]+)',  # Case insensitive
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, text, re.IGNORECASE | re.MULTILINE)
-        if match:
-            category = match.group(1).strip()
-            # Limpar pontuação extra no final e aspas
-            category = re.sub(r'[.,;:!?"\']+$', '', category)
-            category = category.strip('"\'')
-            # Verificar se é uma categoria válida do 20 Newsgroups
-            valid_categories = [
-                'alt.atheism', 'comp.graphics', 'comp.os.ms-windows.misc',
-                'comp.sys.ibm.pc.hardware', 'comp.sys.mac.hardware', 'comp.windows.x',
-                'misc.forsale', 'rec.autos', 'rec.motorcycles',
-                'rec.sport.baseball', 'rec.sport.hockey', 'sci.crypt',
-                'sci.electronics', 'sci.med', 'sci.space',
-                'soc.religion.christian', 'talk.politics.guns',
-                'talk.politics.mideast', 'talk.politics.misc', 'talk.religion.misc'
-            ]
-            # Verificar se a categoria extraída corresponde a uma válida
-            if any(cat.lower() == category.lower() for cat in valid_categories):
-                return category
-            # Se não corresponder exatamente, retornar mesmo assim (pode ser variação)
-            if category:
-                return category
-    
-    return ""
+    session = current_session()
+    if not session.resolve_tavily_key():
+        st.warning("⚠️ Tavily API Key é necessária para enriquecimento completo.")
+    
+    selected_model = session.resolve_model()
+    # Preparar few-shot examples do histórico (se disponível)
+    few_shot_examples = build_few_shot_examples(st.session_state.get('execution_history', []), label_set)
+    st.session_state['last_executed'] = (label_set.name, raw_text)
+    
+    if get_config().use_job_queue:
+        # Submeter à fila: a execução sobrevive a reruns e recarregamentos da página.
+        # Só o modelo vai no payload; o worker usa as próprias credenciais (chaves não são gravadas)
+        job_id = get_job_queue().submit({
+            'raw_text': raw_text,
+            'ground_truth': ground_truth,
+            'model_name': selected_model,
+            'few_shot_examples': few_shot_examples,
+            'label_set': label_set.name,
+            'profile': st.session_state.get('profiling_enabled')
+        })
+        st.session_state['active_job_id'] = job_id
+        st.query_params['job'] = job_id
+        st.rerun()
+    
+    # Status step-by-step com feedback visual rico
+    record = None
+    with st.status("🚀 Iniciando VerbaFlow...", expanded=True) as status:
+        try:
+            if st.session_state.get('speculative_prefetch'):
+                # Classificação especulativa da mesma amostra em andamento: aguardar o cache
+                status.update(label="⏳ Concluindo a classificação antecipada...", state="running")
+                get_prefetcher().settle(session_id(), raw_text, label_set, selected_model, few_shot_examples)
+            st.info("🔍 **Tracing ativado:** Acompanhe o progresso detalhado do CrewAI...")
+            record = run_pipeline(
+                raw_text,
+                ground_truth=ground_truth,
+                model_name=selected_model,
+                few_shot_examples=few_shot_examples,
+                on_stage=lambda label: status.update(label=label, state="running"),
+                label_set=label_set,
+                on_classification=lambda partial: st.toast(
+                    f"🏷️ Categoria prevista: {partial.get('final_category')} ({partial.get('confidence')})"
+                ),
+                profile=st.session_state.get('profiling_enabled'),
+                session=session
+            )
+            status.update(label="✅ Análise completa! Processando resultados...", state="complete")
+        
+        except Exception as e:
+            if is_rate_limit_error(e):
+                show_rate_limit_error(str(e))
+                status.update(label=f"❌ Erro: Rate limit", state="error")
+                st.stop()
+            status.update(label=f"❌ Erro: {str(e)[:50]}...", state="error")
+            st.error(f"❌ Erro durante execução: {e}")
+            with st.expander("🔍 Detalhes do Erro"):
+                st.exception(e)
+            st.stop()
+    
+    render_results(record, raw_text, ground_truth)
+    
+    # Salvar resultado na sessão e histórico
+    save_to_history(record)
 
 
 # Título principal com estilo centralizado
@@ -146,11 +484,8 @@ with st.sidebar:
     
     model_choice = st.selectbox(
         "Selecione o modelo:",
-        [
-            "llama-3.1-8b-instant (Recomendado: Mais rápido, menos tokens) ⭐",
-            "llama-3.3-70b-versatile (Melhor qualidade, mais tokens)",
-            "mixtral-8x7b-32768 (Alternativa)"
-        ],
+        MODEL_CHOICES,
+        key="model_choice",
         help="💡 Modelos menores consomem muito menos tokens! Use llama-3.1-8b-instant para evitar rate limits."
     )
     
@@ -162,19 +497,13 @@ with st.sidebar:
     else:
         selected_model = "mixtral-8x7b-32768"
     
-    # Salvar API keys nas variáveis de ambiente
-    # Se o usuário digitou algo, usa isso. Senão, mantém o valor do .env
-    if groq_key:
-        os.environ["GROQ_API_KEY"] = groq_key
-    elif groq_key_env:
-        os.environ["GROQ_API_KEY"] = groq_key_env
-    
-    if tavily_key:
-        os.environ["TAVILY_API_KEY"] = tavily_key
-    elif tavily_key_env:
-        os.environ["TAVILY_API_KEY"] = tavily_key_env
-    
-    os.environ["GROQ_MODEL"] = selected_model
+    # Chaves e modelo ficam na sessão, não em os.environ (compartilhado por todas
+    # as sessões do processo). Campo vazio: usa o valor do .env
+    st.session_state['session_context'] = SessionContext(
+        groq_api_key=groq_key or None,
+        tavily_api_key=tavily_key or None,
+        model_name=selected_model
+    )
     
     # Mostrar status das chaves
     st.markdown("---")
@@ -190,6 +519,22 @@ with st.sidebar:
     else:
         st.info("ℹ️ Tavily API Key opcional (enriquecimento não funcionará sem ela)")
     
+    st.toggle(
+        "🔬 Perfilar execuções",
+        value=get_config().profiling_enabled,
+        key="profiling_enabled",
+        help="Grava cProfile, memória (tracemalloc) e pilhas amostradas (formato flamegraph) de cada execução. "
+             "Em lotes, perfila a fração PROFILING_SAMPLE_RATE das execuções."
+    )
+    
+    st.toggle(
+        "⚡ Pré-carregar classificação",
+        value=get_config().speculative_prefetch,
+        key="speculative_prefetch",
+        help="Classifica a amostra em segundo plano assim que ela é selecionada; o clique em "
+             "\"Executar VerbaFlow\" encontra a classificação pronta. Consome tokens mesmo sem clique."
+    )
+    
     
     # Histórico de execuções
     st.markdown("---")
@@ -224,9 +569,12 @@ with st.sidebar:
     )
 
 
+# A sidebar já chegou ao navegador: o componente do tema foi renderizado
+confirm_theme_injection()
+
 # Área principal
-# Verificar se temos Groq API Key (do .env ou da sidebar)
-groq_key_available = os.getenv("GROQ_API_KEY")
+# Verificar se temos Groq API Key (do .env ou da sidebar); em replay do cassette não é necessária
+groq_key_available = current_session().resolve_groq_key() or get_config().cassette_mode == "replay"
 if not groq_key_available:
     st.warning("""
     ⚠️ **Groq API Key não encontrada!**
@@ -237,6 +585,14 @@ if not groq_key_available:
     """)
     st.stop()
 
+# Job em andamento (sobrevive a reruns e, via query param, a recarregamentos)
+if 'job' in st.query_params and 'active_job_id' not in st.session_state:
+    st.session_state['active_job_id'] = st.query_params['job']
+
+if st.session_state.get('active_job_id'):
+    render_job_panel(st.session_state['active_job_id'])
+    st.markdown("---")
+
 # Seleção de dados
 if data_source == "20 Newsgroups (Amostras)":
     st.subheader("📰 Dataset 20 Newsgroups")
@@ -244,361 +600,53 @@ if data_source == "20 Newsgroups (Amostras)":
     if st.button("🔄 Carregar Amostras Aleatórias"):
         with st.spinner("Baixando amostras do dataset 20 Newsgroups..."):
             try:
-                samples = fetch_newsgroups_samples(num_samples=5)
+                samples = fetch_newsgroups_samples(num_samples=5, corpus_path=get_config().corpus_path)
                 st.session_state['samples'] = samples
                 st.success(f"✅ {len(samples)} amostras carregadas com sucesso!")
             except Exception as e:
                 st.error(f"❌ Erro ao carregar amostras: {e}")
     
+    # Amostras já salvas em disco: sorteio estratificado pelo índice, sem download
+    if os.path.isdir(DEFAULT_SAMPLES_DIR) and st.button("📂 Sortear do Acervo Local"):
+        sample_index = get_sample_index()
+        sample_index.ensure_fresh(DEFAULT_SAMPLES_DIR)
+        local_samples = sample_index.stratified_sample(DEFAULT_SAMPLES_DIR, n=5)
+        if local_samples:
+            st.session_state['samples'] = [entry.path for entry in local_samples]
+            st.success(f"✅ {len(local_samples)} amostras sorteadas de {len(sample_index.categories(DEFAULT_SAMPLES_DIR))} categorias")
+        else:
+            st.info("ℹ️ Nenhuma amostra local ainda. Use \"Carregar Amostras Aleatórias\".")
+    
     if 'samples' in st.session_state and st.session_state['samples']:
         sample_files = st.session_state['samples']
         selected_file = st.selectbox(
             "Selecione uma amostra:",
             options=sample_files,
-            format_func=lambda x: os.path.basename(x)
+            format_func=lambda x: os.path.basename(x).rsplit("#", 1)[-1]
         )
         
         if selected_file:
             # Carregar texto
-            raw_text = get_text_from_file(selected_file)
-            ground_truth = extract_ground_truth_from_filename(selected_file)
+            try:
+                raw_text = get_text_from_file(selected_file)
+            except ValueError as e:
+                st.error(f"❌ {e}")
+                st.stop()
+            # Categoria do índice (reindexa o arquivo se ele foi reescrito)
+            sample_entry = get_sample_index().lookup(selected_file)
+            ground_truth = sample_entry.category if sample_entry else extract_ground_truth_from_filename(selected_file)
             
             # Exibir texto e ground truth
             st.markdown("### 📄 Texto Original")
-            st.text_area("Texto Original", raw_text, height=200, disabled=True, key="raw_text_display", label_visibility="visible")
+            st.text_area("Texto Original", text_preview(raw_text), height=200, disabled=True, key="raw_text_display", label_visibility="visible")
             
             st.markdown(f"### 🏷️ Categoria Real (Ground Truth)")
             st.info(f"**{ground_truth}**")
+            speculate_classification(raw_text, NEWSGROUPS_LABEL_SET, ground_truth)
             
             # Executar VerbaFlow
             if st.button("🚀 Executar VerbaFlow", type="primary", use_container_width=True):
-                if not tavily_key:
-                    st.warning("⚠️ Tavily API Key é necessária para enriquecimento completo.")
-                
-                # Status step-by-step com feedback visual rico
-                with st.status("🚀 Iniciando VerbaFlow...", expanded=True) as status:
-                    try:
-                        # Step 1: Preparação
-                        status.update(label="🔄 Limpando e preparando texto...", state="running")
-                        cleaned_text = clean_text(raw_text)
-                        
-                        # Step 2: Configuração LLM
-                        status.update(label="⚙️ Configurando LLM (Groq)...", state="running")
-                        if "OPENAI_API_KEY" in os.environ:
-                            original_openai_key = os.environ.pop("OPENAI_API_KEY", None)
-                        
-                        selected_model = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")
-                        llm_provider = "Groq"  # Inicializar variável
-                        
-                        try:
-                            llm = get_llm(model_name=selected_model)
-                            llm_provider = "Groq"
-                        except Exception as e:
-                            error_str = str(e).lower()
-                            is_rate_limit = "429" in error_str or "rate limit" in error_str or "rate_limit" in error_str
-                            
-                            if is_rate_limit:
-                                raise ValueError(
-                                    f"Rate limit do Groq atingido: {e}\n\n"
-                                    "💡 **Soluções:**\n"
-                                    "1. Troque para modelo menor (llama-3.1-8b-instant) na sidebar - consome ~10x menos tokens\n"
-                                    "2. Aguarde o reset do limite (geralmente à meia-noite UTC)\n"
-                                    "3. Faça upgrade para Dev Tier: https://console.groq.com/settings/billing"
-                                )
-                            raise
-                        
-                        # Step 3: Criar agentes
-                        status.update(label="🤖 Criando agentes especializados...", state="running")
-                        analyst = create_analyst_agent(llm)
-                        researcher = create_researcher_agent(llm)
-                        editor = create_editor_agent(llm)
-                        
-                        # Step 4: Criar tasks
-                        status.update(label="📋 Criando tasks e pipeline...", state="running")
-                        # Preparar few-shot examples do histórico (se disponível)
-                        few_shot_examples = []
-                        if 'execution_history' in st.session_state and st.session_state['execution_history']:
-                            for hist in st.session_state['execution_history'][-3:]:  # Últimos 3
-                                category = hist.get('predicted') or hist.get('category')
-                                if 'text_sample' in hist and category:
-                                    few_shot_examples.append({
-                                        'text': hist['text_sample'],
-                                        'category': category,
-                                        'reasoning': hist.get('reasoning', f"Classificado como {category}")
-                                    })
-                        
-                        task1 = create_classification_task(analyst, cleaned_text, few_shot_examples if few_shot_examples else None)
-                        task2 = create_enrichment_task(researcher, task1)
-                        task3 = create_reporting_task(editor, task1, task2)
-                        
-                        crew = Crew(
-                            agents=[analyst, researcher, editor],
-                            tasks=[task1, task2, task3],
-                            process=Process.sequential,
-                            verbose=True,
-                            tracing=True  # Ativar tracing do CrewAI
-                        )
-                        
-                        # Step 5: Executar Task 1 - Classificação
-                        status.update(label="🕵️ [Task 1/3] Analisando texto com Chain of Thought...", state="running")
-                        old_stdout = sys.stdout
-                        sys.stdout = StringIO()
-                        
-                        result = None
-                        try:
-                            # Executar crew com tracing ativado
-                            st.info("🔍 **Tracing ativado:** Acompanhe o progresso detalhado do CrewAI...")
-                            result = crew.kickoff()
-                            
-                            # Capturar output do tracing após execução
-                            output = sys.stdout.getvalue()
-                            if output and len(output.strip()) > 0:
-                                with st.expander("📊 Detalhes do Tracing (CrewAI)", expanded=False):
-                                    st.code(output, language="text")
-                        except Exception as crew_error:
-                            error_str = str(crew_error)
-                            # Verificar se é rate limit
-                            is_rate_limit = (
-                                "429" in error_str or 
-                                "rate_limit" in error_str.lower() or 
-                                "Rate limit" in error_str or
-                                "rate limit reached" in error_str.lower()
-                            )
-                            
-                            # Se for rate limit, mostrar mensagem de erro
-                            if is_rate_limit:
-                                # Extrair tempo de espera se disponível
-                                wait_time = "algumas horas"
-                                if "try again in" in error_str.lower():
-                                    import re
-                                    time_match = re.search(r'try again in (\d+m\d+\.\d+s)', error_str, re.IGNORECASE)
-                                    if time_match:
-                                        wait_time = time_match.group(1)
-                                
-                                # Rate limit atingido - mostrar mensagem de erro
-                                st.error("""
-                                ## ⚠️ Rate Limit Atingido
-                                
-                                Você atingiu o limite diário de tokens do Groq (100,000 tokens/dia no tier gratuito).
-                                
-                                **📊 Informações:**
-                                - Limite: 100,000 tokens/dia (tier gratuito)
-                                - Modelo atual: """ + f"{os.getenv('GROQ_MODEL', 'llama-3.1-8b-instant')}" + """
-                                - Tempo estimado para reset: """ + wait_time + """
-                                
-                                **💡 Soluções Imediatas:**
-                                
-                                1. **Trocar para modelo menor:** 
-                                   - Vá na sidebar e selecione `llama-3.1-8b-instant`
-                                   - Este modelo consome **~10x menos tokens** que o 70b
-                                   - Qualidade ainda é excelente para classificação
-                                
-                                2. **Aguardar reset:** 
-                                   - O limite será resetado automaticamente (geralmente à meia-noite UTC)
-                                   - Tempo estimado: """ + wait_time + """
-                                
-                                3. **Upgrade para Dev Tier:**
-                                   - Limite muito maior (30M tokens/dia)
-                                   - Acesso a modelos premium
-                                   - https://console.groq.com/settings/billing
-                                
-                                **🎯 Recomendação:** Use `llama-3.1-8b-instant` como padrão - é rápido, eficiente e tem qualidade excelente!
-                                """)
-                                
-                                # Botão para trocar modelo automaticamente
-                                if st.button("🔄 Trocar para llama-3.1-8b-instant agora", type="primary"):
-                                    os.environ["GROQ_MODEL"] = "llama-3.1-8b-instant"
-                                    st.success("✅ Modelo alterado! Recarregue a página e tente novamente.")
-                                    st.rerun()
-                                
-                                status.update(label=f"❌ Erro: Rate limit", state="error")
-                                st.stop()
-                            else:
-                                # Erro não relacionado a rate limit
-                                raise crew_error
-                        finally:
-                            sys.stdout = old_stdout
-                        
-                        if result is None:
-                            st.error("❌ Execução falhou sem resultado")
-                            st.stop()
-                        
-                        status.update(label="✅ Análise completa! Processando resultados...", state="complete")
-                    
-                    except Exception as e:
-                        error_str = str(e)
-                        status.update(label=f"❌ Erro: {str(e)[:50]}...", state="error")
-                        st.error(f"❌ Erro durante execução: {e}")
-                        with st.expander("🔍 Detalhes do Erro"):
-                            st.exception(e)
-                        st.stop()
-                
-                # Extrair categoria com parsing robusto
-                result_str = str(result)
-                predicted_category = ""
-                classification_data = None
-                
-                # Tentar parsear JSON estruturado primeiro (método preferido)
-                try:
-                    # Procurar por JSON no resultado (pode estar em qualquer lugar do texto)
-                    json_patterns = [
-                        r'\{[^{}]*"final_category"[^{}]*"confidence"[^{}]*\}',  # JSON com final_category e confidence
-                        r'\{[^{}]*"final_category"[^{}]*\}',  # JSON com final_category
-                        r'\{.*?"entity_analysis".*?"final_category".*?\}',  # JSON completo
-                    ]
-                    
-                    for pattern in json_patterns:
-                        json_match = re.search(pattern, result_str, re.DOTALL | re.IGNORECASE)
-                        if json_match:
-                            json_str = json_match.group(0)
-                            try:
-                                data = json.loads(json_str)
-                                if 'final_category' in data:
-                                    predicted_category = data['final_category']
-                                    classification_data = data
-                                    break
-                            except json.JSONDecodeError:
-                                continue
-                except Exception:
-                    # Se falhar, continuar com parsing tradicional
-                    pass
-                
-                # Fallback: parsing robusto tradicional
-                if not predicted_category:
-                    predicted_category = extract_category_robust(result_str)
-                    
-                    # Se não encontrou, tentar buscar no output da task1 diretamente
-                    if not predicted_category and hasattr(result, 'tasks_output'):
-                        for task_output in result.tasks_output:
-                            predicted_category = extract_category_robust(str(task_output))
-                            if predicted_category:
-                                break
-                    
-                    # Se ainda não encontrou, buscar no texto completo com padrões mais flexíveis
-                    if not predicted_category:
-                        category_pattern = r'\b(' + '|'.join([
-                            r'alt\.atheism', r'comp\.graphics', r'comp\.os\.ms-windows\.misc',
-                            r'comp\.sys\.ibm\.pc\.hardware', r'comp\.sys\.mac\.hardware', r'comp\.windows\.x',
-                            r'misc\.forsale', r'rec\.autos', r'rec\.motorcycles',
-                            r'rec\.sport\.baseball', r'rec\.sport\.hockey', r'sci\.crypt',
-                            r'sci\.electronics', r'sci\.med', r'sci\.space',
-                            r'soc\.religion\.christian', r'talk\.politics\.guns',
-                            r'talk\.politics\.mideast', r'talk\.politics\.misc', r'talk\.religion\.misc'
-                        ]) + r')\b'
-                        match = re.search(category_pattern, result_str, re.IGNORECASE)
-                        if match:
-                            predicted_category = match.group(1)
-                
-                # Layout de duas colunas para resultados
-                st.markdown("---")
-                st.markdown("## 📊 Resultados da Análise")
-                
-                col_left, col_right = st.columns([1, 1])
-                
-                with col_left:
-                    st.markdown("### 📄 Texto Original")
-                    # Usando st.text_area que é mais semântico e permite rolagem nativa
-                    st.text_area(
-                        "Texto Original",
-                        raw_text,
-                        height=300,
-                        disabled=True,
-                        label_visibility="collapsed"
-                    )
-
-                    st.markdown(f"**🏷️ Categoria Real (Ground Truth):**")
-                    st.markdown(f'<span class="category-badge">{ground_truth}</span>', unsafe_allow_html=True)
-                
-                with col_right:
-                    st.markdown("### ✅ Validação da Classificação")
-                    
-                    # Comparar categorias (case-insensitive)
-                    is_correct = predicted_category.lower() == ground_truth.lower() if predicted_category else False
-                    
-                    if is_correct:
-                        st.markdown('<div class="success-indicator">✅ Classificação Correta!</div>', unsafe_allow_html=True)
-                        st.balloons()
-                    else:
-                        st.markdown('<div class="error-indicator">❌ Classificação Incorreta</div>', unsafe_allow_html=True)
-                    
-                    # Métricas
-                    st.metric("Categoria Real", ground_truth)
-                    st.metric("Categoria Prevista", predicted_category if predicted_category else "Não encontrada")
-                
-                # Relatório completo em seção expandível
-                st.markdown("---")
-                
-                # Extrair markdown do relatório se disponível
-                report_markdown = None
-                try:
-                    # Tentar extrair JSON do resultado
-                    json_pattern = r'\{[^{}]*"full_report_markdown"[^{}]*\}'
-                    json_match = re.search(json_pattern, result_str, re.DOTALL | re.IGNORECASE)
-                    if json_match:
-                        try:
-                            data = json.loads(json_match.group(0))
-                            if 'full_report_markdown' in data:
-                                report_markdown = data['full_report_markdown']
-                        except json.JSONDecodeError:
-                            # Tentar buscar JSON completo
-                            json_full_pattern = r'\{.*?"full_report_markdown".*?\}'
-                            json_full_match = re.search(json_full_pattern, result_str, re.DOTALL | re.IGNORECASE)
-                            if json_full_match:
-                                try:
-                                    data = json.loads(json_full_match.group(0))
-                                    if 'full_report_markdown' in data:
-                                        report_markdown = data['full_report_markdown']
-                                except json.JSONDecodeError:
-                                    pass
-                except Exception:
-                    pass
-                
-                # Usar HTML customizado para evitar problema de ícone
-                st.markdown("""
-                <details open style="background-color: #1e1e1e; padding: 1rem; border-radius: 8px; margin: 1rem 0; border: 1px solid rgba(255,255,255,0.1);">
-                    <summary style="font-weight: 600; font-size: 1.1rem; cursor: pointer; padding: 0.5rem; color: #FFFFFF;">
-                        📋 Relatório Enriquecido Completo
-                    </summary>
-                    <div style="margin-top: 1rem; padding: 1rem; background-color: #121212; border-radius: 4px; color: #FFFFFF;">
-                """, unsafe_allow_html=True)
-                
-                # Renderizar markdown se disponível, senão mostrar resultado completo
-                if report_markdown:
-                    st.markdown(report_markdown)
-                else:
-                    st.markdown(result_str)
-                
-                st.markdown("""
-                    </div>
-                </details>
-                """, unsafe_allow_html=True)
-                
-                # Salvar resultado na sessão e histórico
-                from datetime import datetime
-                execution_record = {
-                    'timestamp': datetime.now().isoformat(),
-                    'ground_truth': ground_truth,
-                    'predicted': predicted_category,
-                    'is_correct': is_correct,
-                    'report': result_str,
-                    'text_sample': raw_text[:200],  # Primeiros 200 caracteres
-                    'llm_provider': llm_provider if 'llm_provider' in locals() else "Groq",
-                    'classification_data': classification_data if 'classification_data' in locals() else None
-                }
-                
-                st.session_state['last_result'] = execution_record
-                
-                # Adicionar ao histórico
-                if 'execution_history' not in st.session_state:
-                    st.session_state['execution_history'] = []
-                
-                st.session_state['execution_history'].append(execution_record)
-                
-                # Manter apenas os últimos N itens
-                config = get_config()
-                max_items = config.max_history_items
-                if len(st.session_state['execution_history']) > max_items:
-                    st.session_state['execution_history'] = st.session_state['execution_history'][-max_items:]
+                execute_verbaflow(raw_text, ground_truth, NEWSGROUPS_LABEL_SET)
 
 else:  # CSV Customizado
     st.subheader("📊 CSV Customizado (6 Classes)")
@@ -614,18 +662,13 @@ else:  # CSV Customizado
         if not df.empty:
             # Assumir que o CSV tem colunas 'texto' e 'categoria' (ou similar)
             # Tentar detectar automaticamente
-            text_col = None
-            category_col = None
-            
-            for col in df.columns:
-                col_lower = col.lower()
-                if 'text' in col_lower or 'texto' in col_lower:
-                    text_col = col
-                if 'categor' in col_lower or 'class' in col_lower or 'label' in col_lower:
-                    category_col = col
+            text_col, category_col = detect_csv_columns(df)
             
             if text_col and category_col:
+                # Label set do CSV: o prompt lista apenas as categorias deste arquivo
+                csv_label_set = load_csv_label_set(csv_path, category_col=category_col)
                 st.dataframe(df.head(), use_container_width=True)
+                st.caption(f"🏷️ {len(csv_label_set.labels)} categorias: {', '.join(csv_label_set.labels)}")
                 
                 selected_idx = st.selectbox(
                     "Selecione um registro:",
@@ -638,14 +681,77 @@ else:  # CSV Customizado
                     ground_truth = str(df.iloc[selected_idx][category_col])
                     
                     st.markdown("### 📄 Texto Original")
-                    st.text_area("Texto Original", raw_text, height=200, disabled=True, label_visibility="visible")
+                    st.text_area("Texto Original", text_preview(raw_text), height=200, disabled=True, label_visibility="visible")
                     
                     st.markdown(f"### 🏷️ Categoria Real (Ground Truth)")
                     st.info(f"**{ground_truth}**")
+                    speculate_classification(raw_text, csv_label_set, ground_truth)
                     
-                    if st.button("🚀 Executar VerbaFlow", type="primary"):
-                        # Similar ao fluxo acima, mas adaptado para CSV
-                        st.info("Funcionalidade para CSV customizado - implementação similar ao 20 Newsgroups")
+                    if st.button("🚀 Executar VerbaFlow", type="primary", use_container_width=True):
+                        execute_verbaflow(raw_text, ground_truth, csv_label_set)
+                
+                # Classificação em lote de todos os registros
+                st.markdown("---")
+                st.markdown("### ⚡ Classificação em Lote")
+                config = get_config()
+                st.caption(
+                    f"Classifica os {len(df)} registros em lotes de {config.batch_size} textos por chamada, "
+                    f"com {config.batch_max_workers} lotes simultâneos (apenas classificação, sem enriquecimento web)."
+                )
+                
+                if st.button("⚡ Classificar todos os registros"):
+                    progress_bar = st.progress(0.0, text="Iniciando classificação em lote...")
+                    # Perfil opcional (fração PROFILING_SAMPLE_RATE dos lotes)
+                    batch_profiler = nullcontext()
+                    if should_profile(st.session_state.get('profiling_enabled'), sample=True):
+                        batch_profiler = RunProfiler("batch")
+                    try:
+                        with batch_profiler:
+                            batch_results = run_batch_classification(
+                                df[text_col].astype(str).tolist(),
+                                label_set=csv_label_set,
+                                model_name=current_session().resolve_model(),
+                                on_progress=lambda done, total: progress_bar.progress(
+                                    done / total, text=f"{done}/{total} registros classificados"
+                                ),
+                                session=current_session(),
+                                ground_truths=df[category_col].astype(str).tolist()
+                            )
+                    except Exception as e:
+                        if is_rate_limit_error(e):
+                            show_rate_limit_error(str(e))
+                        else:
+                            st.error(f"❌ Erro durante execução: {e}")
+                        st.stop()
+                    
+                    results_df = pd.DataFrame({
+                        'Texto': df[text_col].astype(str).str[:120],
+                        'Categoria Real': df[category_col].astype(str),
+                        'Categoria Prevista': [r.get('predicted', '') for r in batch_results],
+                        'Confiança': [r.get('confidence', '') for r in batch_results],
+                        'Erro': [r.get('error', '') for r in batch_results]
+                    })
+                    results_df['Correto'] = results_df['Categoria Real'].str.lower() == results_df['Categoria Prevista'].str.lower()
+                    
+                    col_acc, col_total, col_errors = st.columns(3)
+                    col_acc.metric("Acurácia", f"{results_df['Correto'].mean():.1%}")
+                    col_total.metric("Registros", len(results_df))
+                    col_errors.metric("Falhas", int((results_df['Erro'] != '').sum()))
+                    
+                    st.markdown("**Acurácia por categoria:**")
+                    st.dataframe(
+                        results_df.groupby('Categoria Real')['Correto'].mean().rename('Acurácia').to_frame(),
+                        use_container_width=True
+                    )
+                    st.dataframe(results_df, use_container_width=True)
+                    st.download_button(
+                        "⬇️ Baixar resultados (CSV)",
+                        results_df.to_csv(index=False).encode('utf-8'),
+                        file_name="verbaflow_resultados_lote.csv",
+                        mime="text/csv"
+                    )
+                    if getattr(batch_profiler, 'summary', None):
+                        render_profile(batch_profiler.summary)
             else:
                 st.error("❌ Não foi possível detectar automaticamente as colunas 'texto' e 'categoria' no CSV.")
                 st.info("Colunas encontradas: " + ", ".join(df.columns.tolist()))
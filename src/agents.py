@@ -2,13 +2,17 @@
 Definições dos agentes do sistema VerbaFlow.
 Suporta Groq como provider principal.
 """
-import os
-from typing import Optional
+import threading
+from typing import Dict, Optional
 from langchain_groq import ChatGroq
 from crewai import Agent
 from crewai.llm import LLM
 from src.tools import get_tavily_tool
 from src.config import get_config
+from src.cassette import RecordingLLM, cassette_mode
+from src.providers import GROQ_BASE_URL, RoutedLLM, get_router
+from src.labels import LabelSet, NEWSGROUPS_LABEL_SET
+from src.session import DEFAULT_SESSION, SessionContext
 
 # Import LiteLLM para verificar disponibilidade
 try:
@@ -18,43 +22,77 @@ except ImportError:
     LITELLM_AVAILABLE = False
 
 
-def get_llm(model_name: Optional[str] = None, provider: str = "groq"):
+def get_llm(
+    model_name: Optional[str] = None,
+    provider: str = "groq",
+    temperature: Optional[float] = None,
+    session: Optional[SessionContext] = None,
+    idle_only: bool = False
+):
     """
     Configura e retorna o LLM usando Groq.
     
+    Com várias chaves (GROQ_API_KEYS) ou endpoints extras (LLM_ENDPOINTS), retorna
+    um RoutedLLM que balanceia as chamadas por cota restante e latência e faz
+    failover em 429/5xx.
+    
     Args:
         model_name: Nome do modelo a usar. Se None, usa o padrão do Groq.
         provider: "groq" (único provider suportado)
+        temperature: Temperatura do modelo. Se None, usa a da configuração.
+        session: Credenciais e modelo da sessão (None usa configuração e ambiente)
+        idle_only: Com vários endpoints, usar só os que não têm chamada em
+            andamento (requisições duplicadas do hedging)
+    
+    Com CASSETTE_MODE diferente de "off", o LLM é envolvido por um RecordingLLM.
     
     Returns:
-        LLM configurado (CrewAI LLM para Groq)
+        LLM configurado (CrewAI LLM para Groq, RoutedLLM ou RecordingLLM)
     
     Raises:
         ValueError: Se as credenciais necessárias não estiverem disponíveis
     """
     config = get_config()
+    session = session or DEFAULT_SESSION
     
     if provider == "groq":
-        api_key = config.groq_api_key or os.getenv("GROQ_API_KEY")
-        if not api_key:
+        api_key = session.resolve_groq_key()
+        if not api_key and cassette_mode() == "replay":
+            # Replay não acessa a rede: a chave só precisa existir
+            api_key = "replay"
+        if not (api_key or config.groq_api_keys or config.llm_endpoints):
             raise ValueError("GROQ_API_KEY não encontrada. Configure a chave do Groq no arquivo .env ou na sidebar.")
         
-        model = model_name or config.groq_model
+        model = session.resolve_model(model_name)
+        temperature = config.temperature if temperature is None else temperature
+        router = get_router(api_key)
+        
+        if len(router.endpoints) > 1 or not api_key:
+            llm = RoutedLLM(router, model=model, temperature=temperature, idle_only=idle_only)
+        else:
+            llm = LLM(
+                model=model,
+                api_key=api_key,
+                base_url=config.groq_base_url or GROQ_BASE_URL,
+                temperature=temperature
+            )
         
-        return LLM(
-            model=model,
-            api_key=api_key,
-            base_url="https://api.groq.com/openai/v1",
-            temperature=config.temperature
-        )
+        # Record/replay: grava ou reproduz as respostas (CASSETTE_MODE)
+        return RecordingLLM(llm) if cassette_mode() != "off" else llm
     
     else:
         raise ValueError(f"Provider '{provider}' não suportado. Use apenas 'groq'")
 
 
-def get_llm_with_fallback(model_name: Optional[str] = None) -> LLM:
+_llm_pool: Dict[str, LLM] = {}
+_llm_pool_lock = threading.Lock()
+
+
+def get_pooled_llm(model_name: Optional[str] = None) -> LLM:
     """
-    Obtém LLM usando Groq (fallback removido).
+    Retorna um LLM compartilhado por modelo, reutilizado entre requisições.
+    Usado por serviços de longa duração (API, workers) para não recriar
+    clientes a cada chamada.
     
     Args:
         model_name: Nome do modelo (opcional)
@@ -62,61 +100,69 @@ def get_llm_with_fallback(model_name: Optional[str] = None) -> LLM:
     Returns:
         LLM configurado (Groq)
     """
-    return get_llm(model_name=model_name, provider="groq")
+    model = model_name or get_config().groq_model
+    with _llm_pool_lock:
+        if model not in _llm_pool:
+            _llm_pool[model] = get_llm(model_name=model)
+        return _llm_pool[model]
 
 
-def create_analyst_agent(llm):
+def create_analyst_agent(llm, label_set: Optional[LabelSet] = None):
     """
     Cria o Agente 1: O Analista - Expert NLP Linguist & Classifier com Chain of Thought.
     
     Args:
         llm: Instância do LLM configurado
+        label_set: Conjunto de categorias válidas (padrão: 20 Newsgroups)
     
     Returns:
         Agent configurado com prompt engineering avançado
     """
-    return Agent(
-        role="Expert NLP Linguist & Classifier",
-        goal="Classificar textos com precisão máxima usando análise passo-a-passo (Chain of Thought). "
-             "SEMPRE siga o processo: 1) Análise de entidades, 2) Raciocínio contextual, 3) Hipótese com exclusões, "
-             "4) Conclusão final. O output DEVE terminar com 'Category: <nome_da_categoria>' em uma linha separada.",
-        backstory="""Você é um linguista computacional de renome internacional com doutorado em NLP e mais de 15 anos 
+    label_set = label_set or NEWSGROUPS_LABEL_SET
+    
+    if label_set.name == NEWSGROUPS_LABEL_SET.name:
+        backstory = f"""Você é um linguista computacional de renome internacional com doutorado em NLP e mais de 15 anos 
         de experiência em classificação de textos. Você trabalhou no desenvolvimento do próprio dataset 20 Newsgroups 
         e conhece cada nuance das 20 categorias:
         
-        **Computação:** comp.graphics, comp.os.ms-windows.misc, comp.sys.ibm.pc.hardware, 
-        comp.sys.mac.hardware, comp.windows.x
-        
-        **Ciência:** sci.crypt, sci.electronics, sci.med, sci.space
-        
-        **Recreação:** rec.autos, rec.motorcycles, rec.sport.baseball, rec.sport.hockey
-        
-        **Religião/Sociedade:** alt.atheism, soc.religion.christian, talk.religion.misc
-        
-        **Política:** talk.politics.guns, talk.politics.mideast, talk.politics.misc
-        
-        **Diversos:** misc.forsale
+        {label_set.prompt_listing()}
         
         Sua metodologia é rigorosa: você NUNCA classifica sem primeiro analisar entidades-chave, considerar o contexto 
         histórico (anos 90), distinguir categorias similares (ex: comp.sys.ibm.pc.hardware vs comp.sys.mac.hardware), 
-        e justificar sua decisão. Sua taxa de precisão é superior a 95%.""",
+        e justificar sua decisão. Sua taxa de precisão é superior a 95%."""
+    else:
+        backstory = f"""Você é um linguista computacional de renome internacional com doutorado em NLP e mais de 15 anos 
+        de experiência em classificação de {label_set.domain or 'textos'}. Você conhece cada nuance das 
+        {len(label_set.labels)} categorias deste conjunto: {label_set.prompt_listing()}.
+        
+        Sua metodologia é rigorosa: você NUNCA classifica sem primeiro analisar entidades-chave, distinguir 
+        categorias similares e justificar sua decisão."""
+    
+    return Agent(
+        role="Expert NLP Linguist & Classifier",
+        goal="Classificar textos com precisão máxima usando análise passo-a-passo (Chain of Thought). "
+             "SEMPRE siga o processo: 1) Análise de entidades, 2) Raciocínio contextual, 3) Hipótese com exclusões, "
+             "4) Conclusão final. O output DEVE terminar com 'Category: <nome_da_categoria>' em uma linha separada.",
+        backstory=backstory,
         verbose=True,
         allow_delegation=False,
         llm=llm
     )
 
 
-def create_researcher_agent(llm):
+def create_researcher_agent(llm, focus: Optional[str] = None, session: Optional[SessionContext] = None):
     """
     Cria o Agente 2: O Pesquisador - Fact-Checker & Context Enricher.
     
     Args:
         llm: Instância do LLM configurado
+        focus: Categoria já conhecida (prioriza os trechos da busca)
+        session: Credenciais da sessão (chave do Tavily)
     
     Returns:
         Agent configurado
     """
-    tavily_tool = get_tavily_tool()
+    tavily_tool = get_tavily_tool(focus or "", session=session)
     tools = [tavily_tool] if tavily_tool else []
     
     return Agent(
@@ -0,0 +1,213 @@
+"""
+Serviço HTTP do VerbaFlow.
+
+Uso:
+    python -m src.api --port 8080
+
+Endpoints (JSON):
+    POST /classify  {"text": "...", "ground_truth": "", "model": null, "label_set": null}
+    POST /enrich    (mesmo corpo; classificação + enriquecimento web)
+    POST /report    (mesmo corpo; pipeline completo com relatório)
+    POST /batch     {"stage": "classify", "items": [{"text": "..."}, ...]}
+    GET  /health
+
+Requisições idênticas concorrentes (mesma etapa, modelo e texto) são
+coalescidas em uma única execução upstream.
+"""
+import argparse
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from src.agents import get_pooled_llm
+from src.config import get_config
+from src.dedup import get_near_duplicate_index
+from src.hedging import get_hedge_stats
+from src.labels import get_label_set
+from src.pipeline import STAGES, STAGE_CLASSIFY, is_rate_limit_error, run_pipeline
+from src.singleflight import SingleFlight
+from src.stagecache import get_stage_cache
+
+
+_single_flight = SingleFlight()
+
+
+def request_key(stage: str, text: str, model_name: Optional[str], label_set_name: str = "20newsgroups") -> str:
+    """
+    Chave de coalescência de uma requisição.
+
+    Args:
+        stage: Etapa do pipeline
+        text: Texto a processar
+        model_name: Modelo pedido (None usa o padrão)
+        label_set_name: Nome do label set da classificação
+
+    Returns:
+        Hash SHA-256 da etapa, modelo, label set e texto
+    """
+    model = model_name or get_config().groq_model
+    return hashlib.sha256(f"{stage}\0{model}\0{label_set_name}\0{text}".encode("utf-8")).hexdigest()
+
+
+def process_item(stage: str, item: dict) -> dict:
+    """
+    Executa uma requisição do pipeline, coalescendo duplicatas concorrentes.
+
+    Args:
+        stage: Etapa final ("classify", "enrich" ou "report")
+        item: Corpo da requisição com "text" e, opcionalmente, "ground_truth", "model"
+            (um dos API_MODELS) e "label_set" ("20newsgroups" ou nome de um CSV de label_set_dir)
+
+    Returns:
+        execution_record (sem o trace do CrewAI) com o campo "coalesced"
+
+    Raises:
+        ValueError: Se o texto estiver ausente, o modelo não for aceito, o
+            ground_truth não for texto ou o label set não existir
+    """
+    text = item.get("text")
+    if not text or not isinstance(text, str):
+        raise ValueError("Campo 'text' é obrigatório")
+
+    config = get_config()
+    model_name = item.get("model")
+    if model_name is not None:
+        # O pool de LLMs guarda um cliente por modelo: só modelos configurados
+        allowed = {config.groq_model} | {model.strip() for model in config.api_models.split(",") if model.strip()}
+        if model_name not in allowed:
+            raise ValueError(f"Modelo inválido. Use um de: {', '.join(sorted(allowed))}")
+    ground_truth = item.get("ground_truth") or ""
+    if not isinstance(ground_truth, str):
+        raise ValueError("Campo 'ground_truth' deve ser texto")
+    label_set = get_label_set(item.get("label_set"))
+
+    def execute():
+        return run_pipeline(
+            text,
+            model_name=model_name,
+            stage=stage,
+            llm=get_pooled_llm(model_name),
+            capture_trace=False,
+            label_set=label_set
+        )
+
+    record, coalesced = _single_flight.do(request_key(stage, text, model_name, label_set.name), execute)
+
+    # Validação contra ground truth é por requisição (não faz parte da execução compartilhada)
+    record = dict(record, ground_truth=ground_truth, coalesced=coalesced)
+    predicted = record.get("predicted") or ""
+    record["is_correct"] = bool(predicted and ground_truth) and predicted.lower() == ground_truth.lower()
+    record.pop("trace_output", None)
+    return record
+
+
+def process_batch(stage: str, items: list, max_workers: Optional[int] = None) -> list:
+    """
+    Processa uma lista de requisições em paralelo.
+
+    Args:
+        stage: Etapa final para todos os itens
+        items: Lista de corpos de requisição
+        max_workers: Paralelismo máximo (None usa a configuração)
+
+    Returns:
+        Lista de resultados na mesma ordem; itens com erro trazem {"error": ...}
+    """
+    def safe_process(item):
+        try:
+            return process_item(stage, item)
+        except Exception as e:
+            return {"error": str(e)}
+
+    with ThreadPoolExecutor(max_workers=max_workers or get_config().api_max_workers) as executor:
+        return list(executor.map(safe_process, items))
+
+
+class VerbaFlowHandler(BaseHTTPRequestHandler):
+    """Handler HTTP com roteamento para as etapas do pipeline."""
+
+    def _send_json(self, status: int, body: dict):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if not isinstance(body, dict):
+            raise ValueError("Corpo da requisição deve ser um objeto JSON")
+        return body
+
+    def do_GET(self):
+        if self.path == "/health":
+            body = {"status": "ok", "single_flight": _single_flight.stats(), "hedging": get_hedge_stats()}
+            if get_config().near_duplicate_enabled:
+                body["near_duplicates"] = get_near_duplicate_index().stats()
+            stage_cache = get_stage_cache()
+            if stage_cache:
+                body["stage_cache"] = stage_cache.stats()
+            self._send_json(200, body)
+        else:
+            self._send_json(404, {"error": f"Rota não encontrada: {self.path}"})
+
+    def do_POST(self):
+        route = self.path.strip("/")
+        try:
+            body = self._read_json()
+            if route in STAGES:
+                self._send_json(200, process_item(route, body))
+            elif route == "batch":
+                stage = body.get("stage", STAGE_CLASSIFY)
+                items = body.get("items")
+                if stage not in STAGES:
+                    raise ValueError(f"Etapa '{stage}' inválida. Use uma de: {', '.join(STAGES)}")
+                if not isinstance(items, list):
+                    raise ValueError("Campo 'items' deve ser uma lista")
+                self._send_json(200, {"results": process_batch(stage, items)})
+            else:
+                self._send_json(404, {"error": f"Rota não encontrada: /{route}"})
+        except (ValueError, json.JSONDecodeError) as e:
+            self._send_json(400, {"error": str(e)})
+        except TimeoutError as e:
+            self._send_json(504, {"error": str(e)})
+        except Exception as e:
+            self._send_json(429 if is_rate_limit_error(e) else 500, {"error": str(e)})
+
+
+def serve(host: Optional[str] = None, port: Optional[int] = None):
+    """
+    Inicia o servidor HTTP (uma thread por conexão).
+
+    Args:
+        host: Endereço de escuta (None usa a configuração)
+        port: Porta (None usa a configuração)
+    """
+    load_dotenv()
+    config = get_config()
+    server = ThreadingHTTPServer((host or config.api_host, port or config.api_port), VerbaFlowHandler)
+    print(f"VerbaFlow API escutando em http://{server.server_address[0]}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serviço HTTP do VerbaFlow")
+    parser.add_argument("--host", default=None, help="Endereço de escuta")
+    parser.add_argument("--port", type=int, default=None, help="Porta")
+    args = parser.parse_args()
+    serve(args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
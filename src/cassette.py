@@ -0,0 +1,274 @@
+"""
+Gravação e reprodução (record/replay) das chamadas LLM e de busca Tavily.
+
+As interações ficam em um cassette SQLite: a chave é o fingerprint SHA-256
+da requisição (modelo, parâmetros, mensagens ou consulta) e a resposta é
+gravada como JSON comprimido com zlib. No modo replay as respostas voltam
+na hora, sem rede e sem consumir tokens ou créditos.
+
+Modos (CASSETTE_MODE):
+    off     sem gravação (padrão)
+    record  sempre chama o serviço e grava/atualiza a resposta
+    replay  apenas reproduz; requisição não gravada levanta LookupError
+    auto    reproduz o que existir e grava o que faltar
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from crewai.llms.base_llm import BaseLLM
+from crewai_tools import TavilySearchTool
+from pydantic import BaseModel, PrivateAttr
+
+from src.config import get_config
+
+
+CASSETTE_MODES = ("off", "record", "replay", "auto")
+
+
+def fingerprint(kind: str, request: dict) -> str:
+    """
+    Calcula a chave de uma requisição.
+
+    Args:
+        kind: Tipo da interação ("llm" ou "tavily")
+        request: Campos que determinam a resposta
+
+    Returns:
+        Hash SHA-256 do JSON canônico da requisição
+    """
+    canonical = json.dumps(request, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(f"{kind}\0{canonical}".encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """Armazenamento das interações gravadas (SQLite, respostas comprimidas)."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or get_config().cassette_path
+        if self.path != ":memory:":
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS interactions (
+                key TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                response BLOB NOT NULL
+            );
+        """)
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM interactions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, key: str, kind: str, response: dict):
+        blob = zlib.compress(json.dumps(response, ensure_ascii=False).encode("utf-8"), 9)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO interactions (key, kind, response) VALUES (?, ?, ?)",
+                (key, kind, blob)
+            )
+            self._conn.commit()
+            self.recorded += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "recorded": self.recorded}
+
+
+_cassettes: Dict[str, Cassette] = {}
+_cassettes_lock = threading.Lock()
+
+
+def get_cassette(path: Optional[str] = None) -> Cassette:
+    """Retorna o cassette do processo para o caminho (padrão: cassette_path)."""
+    path = path or get_config().cassette_path
+    with _cassettes_lock:
+        if path not in _cassettes:
+            _cassettes[path] = Cassette(path)
+        return _cassettes[path]
+
+
+def cassette_mode() -> str:
+    """Modo configurado, validado."""
+    mode = (get_config().cassette_mode or "off").lower()
+    if mode not in CASSETTE_MODES:
+        raise ValueError(f"CASSETTE_MODE '{mode}' inválido. Use um de: {', '.join(CASSETTE_MODES)}")
+    return mode
+
+
+def _lookup(kind: str, key: str, mode: str) -> Optional[dict]:
+    if mode == "record":
+        return None
+    cached = get_cassette().get(key)
+    if cached is None and mode == "replay":
+        raise LookupError(f"Interação '{kind}' não gravada no cassette ({key[:12]}). Grave com CASSETTE_MODE=record")
+    return cached
+
+
+def replay_or_record(kind: str, request: dict, fetch: Callable[[], dict]) -> dict:
+    """
+    Executa uma requisição genérica passando pelo cassette.
+
+    Args:
+        kind: Tipo da interação
+        request: Campos que determinam a resposta (viram o fingerprint)
+        fetch: Função que faz a requisição real e retorna um dict serializável
+
+    Returns:
+        Resposta gravada (replay) ou a resposta de fetch (gravada se o modo pedir)
+    """
+    mode = cassette_mode()
+    if mode == "off":
+        return fetch()
+    key = fingerprint(kind, request)
+    cached = _lookup(kind, key, mode)
+    if cached is not None:
+        return cached
+    response = fetch()
+    get_cassette().put(key, kind, response)
+    return response
+
+
+def _encode_response(result: Any) -> Optional[dict]:
+    if isinstance(result, str):
+        return {"type": "text", "value": result}
+    if isinstance(result, BaseModel):
+        return {"type": "model", "value": result.model_dump(mode="json")}
+    if isinstance(result, list) and result and all(isinstance(item, BaseModel) for item in result):
+        # Tool calls nativos: reproduzidos como dicionários (formato aceito pelo CrewAI)
+        return {"type": "json", "value": [item.model_dump(mode="json") for item in result]}
+    try:
+        json.dumps(result)
+    except (TypeError, ValueError):
+        return None
+    return {"type": "json", "value": result}
+
+
+def _decode_response(entry: dict, response_model: Optional[type] = None) -> Any:
+    if entry["type"] == "model" and response_model is not None:
+        return response_model.model_validate(entry["value"])
+    return entry["value"]
+
+
+class RecordingLLM(BaseLLM):
+    """LLM que grava/reproduz as respostas do LLM envolvido conforme CASSETTE_MODE."""
+
+    llm_type: str = "recording"
+    _inner: BaseLLM = PrivateAttr()
+
+    def __init__(self, inner: BaseLLM, **kwargs: Any):
+        super().__init__(model=inner.model, temperature=inner.temperature, **kwargs)
+        self._inner = inner
+
+    def _key(self, messages, tools, response_model) -> str:
+        return fingerprint("llm", {
+            "model": self.model,
+            "temperature": self.temperature,
+            "stop": sorted(self.stop),
+            "messages": messages,
+            "tools": tools,
+            "response_model": response_model.__name__ if response_model else None
+        })
+
+    def _store(self, key: str, result: Any):
+        encoded = _encode_response(result)
+        if encoded is not None:
+            get_cassette().put(key, "llm", encoded)
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None,
+             from_task=None, from_agent=None, response_model=None):
+        mode = cassette_mode()
+        key = self._key(messages, tools, response_model)
+        cached = _lookup("llm", key, mode)
+        if cached is not None:
+            return _decode_response(cached, response_model)
+
+        self._inner.stop = list(self.stop)
+        result = self._inner.call(
+            messages, tools=tools, callbacks=callbacks, available_functions=available_functions,
+            from_task=from_task, from_agent=from_agent, response_model=response_model
+        )
+        self._store(key, result)
+        return result
+
+    async def acall(self, messages, tools=None, callbacks=None, available_functions=None,
+                    from_task=None, from_agent=None, response_model=None):
+        mode = cassette_mode()
+        key = self._key(messages, tools, response_model)
+        cached = _lookup("llm", key, mode)
+        if cached is not None:
+            return _decode_response(cached, response_model)
+
+        self._inner.stop = list(self.stop)
+        result = await self._inner.acall(
+            messages, tools=tools, callbacks=callbacks, available_functions=available_functions,
+            from_task=from_task, from_agent=from_agent, response_model=response_model
+        )
+        self._store(key, result)
+        return result
+
+    def supports_stop_words(self) -> bool:
+        return self._inner.supports_stop_words()
+
+    # Tool calling nativo como em produção (BaseLLM não define supports_function_calling)
+    def supports_function_calling(self) -> bool:
+        probe = getattr(self._inner, "supports_function_calling", None)
+        return bool(probe and probe())
+
+    def supports_multimodal(self) -> bool:
+        return self._inner.supports_multimodal()
+
+    def get_context_window_size(self) -> int:
+        return self._inner.get_context_window_size()
+
+
+class RecordingTavilySearchTool(TavilySearchTool):
+    """TavilySearchTool que grava/reproduz os resultados conforme CASSETTE_MODE."""
+
+    def _key(self, query: str) -> str:
+        return fingerprint("tavily", {
+            "query": query,
+            "search_depth": self.search_depth,
+            "topic": self.topic,
+            "time_range": self.time_range,
+            "days": self.days,
+            "max_results": self.max_results,
+            "include_domains": self.include_domains,
+            "exclude_domains": self.exclude_domains,
+            "include_answer": self.include_answer,
+            "include_raw_content": self.include_raw_content,
+            "max_content_length_per_result": self.max_content_length_per_result
+        })
+
+    def _run(self, query: str) -> str:
+        key = self._key(query)
+        cached = _lookup("tavily", key, cassette_mode())
+        if cached is not None:
+            return cached["value"]
+        result = super()._run(query)
+        get_cassette().put(key, "tavily", {"type": "text", "value": result})
+        return result
+
+    async def _arun(self, query: str) -> str:
+        key = self._key(query)
+        cached = _lookup("tavily", key, cassette_mode())
+        if cached is not None:
+            return cached["value"]
+        result = await super()._arun(query)
+        get_cassette().put(key, "tavily", {"type": "text", "value": result})
+        return result
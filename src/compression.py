@@ -0,0 +1,201 @@
+"""
+Compressão extrativa local dos resultados de busca (Tavily).
+
+Antes de chegar ao Pesquisador, o JSON de resultados é dividido em
+sentenças, as sentenças repetidas entre resultados são descartadas e as
+restantes são pontuadas com BM25 contra a consulta e a categoria. As mais
+relevantes entram até um orçamento fixo de tokens, agrupadas pela fonte
+(título e URL) e na ordem original. O Pesquisador recebe uma fração do
+texto, com o mesmo conteúdo de apoio e as URLs para citar.
+"""
+import json
+import math
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Optional
+
+from src.config import get_config
+
+
+_BM25_K1 = 1.5
+_BM25_B = 0.75
+_MIN_SENTENCE_CHARS = 30
+_MAX_SENTENCE_CHARS = 400
+# Bônus por posição do resultado no ranking do Tavily (desempate)
+_RANK_BONUS = 0.05
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[A-ZÀ-Ý0-9])|\n+")
+_TOKEN = re.compile(r"[a-z0-9]{2,}")
+_STOPWORDS = frozenset("""
+    a o as os um uma de da do das dos em no na nos nas por para com sem que se e ou ao aos como mais mas
+    foi ser sao seu sua seus suas ele ela eles elas isso este esta esse essa entre sobre ate desde
+    the an and or of to in on at for by with from is are was were be been it its this that these those as
+    not but if into than then there their they we you he she his her have has had do does did will would can
+""".split())
+
+
+def _normalize(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def tokenize(text: str) -> List[str]:
+    """Termos minúsculos sem acento, sem stopwords (pt e en)."""
+    return [token for token in _TOKEN.findall(_normalize(text)) if token not in _STOPWORDS]
+
+
+def split_sentences(text: str) -> List[str]:
+    """
+    Divide um texto em sentenças, descartando trechos curtos demais (menus,
+    rótulos) e cortando sentenças muito longas.
+
+    Args:
+        text: Conteúdo de um resultado
+
+    Returns:
+        Lista de sentenças
+    """
+    sentences = []
+    for part in _SENTENCE_SPLIT.split(text or ""):
+        sentence = " ".join(part.split())
+        if len(sentence) < _MIN_SENTENCE_CHARS:
+            continue
+        if len(sentence) > _MAX_SENTENCE_CHARS:
+            sentence = sentence[:_MAX_SENTENCE_CHARS].rsplit(" ", 1)[0] + "..."
+        sentences.append(sentence)
+    return sentences
+
+
+def focus_terms(focus: str) -> str:
+    """Termos de uma categoria (ex: "sci.space" -> "sci space")."""
+    return re.sub(r"[._\-/]+", " ", focus or "")
+
+
+def bm25_scores(documents: List[List[str]], query: List[str]) -> List[float]:
+    """
+    Pontua documentos (listas de termos) contra os termos da consulta (BM25).
+
+    Args:
+        documents: Termos de cada documento
+        query: Termos da consulta (repetições aumentam o peso do termo)
+
+    Returns:
+        Pontuação de cada documento
+    """
+    if not documents:
+        return []
+    n = len(documents)
+    average_length = sum(len(doc) for doc in documents) / n or 1.0
+    document_frequency: Counter = Counter()
+    for doc in documents:
+        document_frequency.update(set(doc))
+    weights = Counter(query)
+
+    scores = []
+    for doc in documents:
+        frequencies = Counter(doc)
+        norm = _BM25_K1 * (1 - _BM25_B + _BM25_B * len(doc) / average_length)
+        score = 0.0
+        for term, weight in weights.items():
+            tf = frequencies.get(term)
+            if not tf:
+                continue
+            df = document_frequency[term]
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            score += weight * idf * tf * (_BM25_K1 + 1) / (tf + norm)
+        scores.append(score)
+    return scores
+
+
+def _estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+def compress_search_results(
+    raw: str,
+    query: str,
+    focus: str = "",
+    budget_tokens: Optional[int] = None
+) -> str:
+    """
+    Compacta o JSON de resultados de uma busca.
+
+    Args:
+        raw: Saída da ferramenta de busca (JSON com "results")
+        query: Consulta feita pelo agente
+        focus: Categoria classificada (reforça os termos da consulta)
+        budget_tokens: Orçamento de tokens das sentenças (padrão: search_compression_budget)
+
+    Returns:
+        Texto com as sentenças mais relevantes agrupadas por fonte; a saída
+        original se não for um JSON de resultados
+    """
+    budget_tokens = budget_tokens or get_config().search_compression_budget
+    try:
+        data = json.loads(raw)
+    except (TypeError, json.JSONDecodeError):
+        return raw
+    results = data.get("results") if isinstance(data, dict) else None
+    if not isinstance(results, list) or not results:
+        return raw
+
+    sources: List[Dict[str, str]] = []
+    candidates = []  # (fonte, posição na fonte, sentença, termos)
+    seen = set()
+    total_sentences = 0
+    for result in results:
+        if not isinstance(result, dict):
+            continue
+        text = result.get("raw_content") or result.get("content") or ""
+        sources.append({"title": str(result.get("title") or "").strip(), "url": str(result.get("url") or "")})
+        for position, sentence in enumerate(split_sentences(text)):
+            total_sentences += 1
+            # Deduplicação entre resultados (mesma sentença em páginas diferentes)
+            key = " ".join(tokenize(sentence))
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            candidates.append((len(sources) - 1, position, sentence, key.split()))
+
+    if not candidates:
+        return raw
+
+    # Categoria conta em dobro: a consulta do agente costuma ser genérica
+    query_tokens = tokenize(query) + 2 * tokenize(focus_terms(focus))
+    scores = bm25_scores([terms for _, _, _, terms in candidates], query_tokens)
+    ranked = sorted(
+        range(len(candidates)),
+        key=lambda i: (scores[i] * (1 + _RANK_BONUS * (len(sources) - candidates[i][0])), -candidates[i][1]),
+        reverse=True
+    )
+
+    # Sentenças sem nenhum termo da consulta só entram se nenhuma pontuar
+    if any(scores):
+        ranked = [i for i in ranked if scores[i] > 0]
+
+    selected = []
+    used = 0
+    for i in ranked:
+        cost = _estimate_tokens(candidates[i][2])
+        if used + cost > budget_tokens:
+            continue
+        selected.append(i)
+        used += cost
+        if budget_tokens - used < _MIN_SENTENCE_CHARS // 4:
+            # Nem a menor sentença cabe mais
+            break
+
+    by_source: Dict[int, List[tuple]] = {}
+    for i in selected:
+        source, position, sentence, _ = candidates[i]
+        by_source.setdefault(source, []).append((position, sentence))
+
+    lines = [f'Resultados da busca "{query}" ({len(selected)} de {total_sentences} sentenças mais relevantes):']
+    if isinstance(data.get("answer"), str) and data["answer"].strip():
+        lines += ["", f"Resposta resumida: {data['answer'].strip()}"]
+    for source in sorted(by_source):
+        title = sources[source]["title"] or sources[source]["url"]
+        lines += ["", f"[{source + 1}] {title} ({sources[source]['url']})"]
+        lines += [f"- {sentence}" for _, sentence in sorted(by_source[source])]
+    return "\n".join(lines)
@@ -2,7 +2,7 @@
 Configuração centralizada do VerbaFlow usando Pydantic Settings.
 Suporta carregamento de .env, variáveis de sistema e segredos do Streamlit.
 """
-from typing import Optional
+from typing import Any, Dict, List, Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field
 
@@ -34,6 +34,39 @@ class VerbaFlowConfig(BaseSettings):
         description="Tavily API Key para busca web"
     )
     
+    # Endpoints alternativos (ex: mocks locais do teste de carga, src/loadtest.py)
+    groq_base_url: Optional[str] = Field(
+        default=None,
+        description="URL base OpenAI-compatível usada no lugar da API do Groq (None usa a API oficial)"
+    )
+    
+    tavily_base_url: Optional[str] = Field(
+        default=None,
+        description="URL de um endpoint compatível com a API de busca do Tavily (None usa o tavily-python)"
+    )
+    
+    # Pool de provedores LLM (src/providers.py)
+    groq_api_keys: str = Field(
+        default="",
+        description="Chaves Groq adicionais separadas por vírgula (somam-se à GROQ_API_KEY)"
+    )
+    
+    llm_endpoints: List[Dict[str, Any]] = Field(
+        default_factory=list,
+        description="Endpoints OpenAI-compatíveis extras em JSON: "
+                    '[{"base_url": "http://localhost:8000/v1", "model": "llama3", "api_key": "", "rpm": 600}]'
+    )
+    
+    groq_rpm_limit: int = Field(
+        default=30,
+        description="Requisições por minuto permitidas por chave Groq (cota local usada no balanceamento)"
+    )
+    
+    provider_cooldown: float = Field(
+        default=30.0,
+        description="Segundos que um endpoint fica fora do rodízio após 429/5xx (se não houver Retry-After)"
+    )
+    
     # Configurações de Modelo
     groq_model: str = Field(
         default="llama-3.1-8b-instant",  # Modelo mais eficiente em tokens (padrão)
@@ -50,6 +83,257 @@ class VerbaFlowConfig(BaseSettings):
         description="Temperatura do modelo (0.0-1.0)"
     )
     
+    # Modo de classificação
+    classification_mode: str = Field(
+        default="cot",
+        description="'cot' (Analista com Chain of Thought) ou 'logprob' (1 token, distribuição por logprobs)"
+    )
+    
+    classification_schema: str = Field(
+        default="compact",
+        description="Schema da saída do Analista: 'compact' (raciocínio único, chaves curtas) ou 'full' (CoT completo)"
+    )
+    
+    stream_classification: bool = Field(
+        default=False,
+        description="Classificar em streaming: resultado antecipado assim que categoria e confiança chegam"
+    )
+    
+    logprob_max_chars: int = Field(
+        default=4000,
+        description="Caracteres do texto enviados no modo logprob"
+    )
+    
+    # Ensemble de autoconsistência (src/ensemble.py)
+    ensemble_enabled: bool = Field(
+        default=False,
+        description="Reclassificar documentos ambíguos com várias chamadas paralelas do Analista e voto"
+    )
+    
+    ensemble_size: int = Field(
+        default=3,
+        description="Chamadas paralelas do Analista por documento ambíguo (além da classificação inicial)"
+    )
+    
+    ensemble_models: str = Field(
+        default="",
+        description="Modelos dos membros separados por vírgula, alternados entre eles (vazio usa o modelo da execução)"
+    )
+    
+    ensemble_temperatures: str = Field(
+        default="0.3,0.7,1.0",
+        description="Temperaturas dos membros separadas por vírgula, alternadas entre eles"
+    )
+    
+    ensemble_trigger_confidence: str = Field(
+        default="baixa",
+        description="Níveis de confiança que disparam o ensemble, separados por vírgula (ex: 'baixa,média')"
+    )
+    
+    # Destilação para classificador local (src/distill.py)
+    distill_enabled: bool = Field(
+        default=False,
+        description="Guardar classificações aceitas do LLM no conjunto de treino do classificador local"
+    )
+    
+    distill_db_path: str = Field(
+        default="data/distill.sqlite3",
+        description="Caminho do conjunto de treino SQLite"
+    )
+    
+    distill_model_dir: str = Field(
+        default="data/models",
+        description="Diretório dos artefatos versionados do classificador local"
+    )
+    
+    distill_accept_confidence: str = Field(
+        default="alta",
+        description="Níveis de confiança do LLM aceitos como rótulo de treino, separados por vírgula"
+    )
+    
+    distill_retrain_every: int = Field(
+        default=100,
+        description="Exemplos novos que disparam uma atualização incremental (partial_fit) em background"
+    )
+    
+    distill_epochs: int = Field(
+        default=5,
+        description="Passadas sobre os exemplos no treino do zero"
+    )
+    
+    distill_serve: bool = Field(
+        default=False,
+        description="Classificar localmente quando o modelo destilado estiver apto e confiante"
+    )
+    
+    distill_min_examples: int = Field(
+        default=200,
+        description="Exemplos de treino mínimos para servir o modelo local"
+    )
+    
+    distill_min_accuracy: float = Field(
+        default=0.9,
+        description="Acurácia mínima no holdout para servir o modelo local"
+    )
+    
+    distill_serve_threshold: float = Field(
+        default=0.9,
+        description="Probabilidade mínima do modelo local para dispensar o LLM"
+    )
+    
+    # Prazos por etapa e hedging (src/hedging.py)
+    classify_deadline: float = Field(
+        default=60.0,
+        description="Prazo total (s) das chamadas LLM da etapa de classificação (0 desativa)"
+    )
+    
+    enrich_deadline: float = Field(
+        default=120.0,
+        description="Prazo total (s) das chamadas LLM da etapa de enriquecimento (0 desativa)"
+    )
+    
+    report_deadline: float = Field(
+        default=90.0,
+        description="Prazo total (s) das chamadas LLM da etapa de relatório (0 desativa)"
+    )
+    
+    tavily_timeout: int = Field(
+        default=15,
+        description="Timeout (s) de cada busca Tavily"
+    )
+    
+    hedge_enabled: bool = Field(
+        default=False,
+        description="Enviar uma requisição duplicada do Analista quando a chamada passar do p95 observado"
+    )
+    
+    hedge_quantile: float = Field(
+        default=0.95,
+        description="Quantil de latência a partir do qual a requisição duplicada é enviada"
+    )
+    
+    hedge_min_samples: int = Field(
+        default=20,
+        description="Latências observadas necessárias antes de começar a enviar duplicatas"
+    )
+    
+    hedge_model: Optional[str] = Field(
+        default=None,
+        description="Modelo da requisição duplicada (None usa o mesmo modelo, só com pool de chaves e em outra chave ociosa; com uma chave não há duplicata)"
+    )
+    
+    # Relatório executivo (src/report.py)
+    report_mode: str = Field(
+        default="template",
+        description="'template' (relatório montado localmente das saídas estruturadas) ou 'llm' (Editor Chefe reescreve)"
+    )
+    
+    # Projeção de contexto entre tasks (src/tasks.py)
+    context_projection: bool = Field(
+        default=True,
+        description="Passar a cada task só os campos que ela declara precisar das anteriores (sem o raciocínio CoT)"
+    )
+    
+    # Cache de etapas (src/stagecache.py)
+    stage_cache_enabled: bool = Field(
+        default=True,
+        description="Reaproveitar resultados de etapas com o mesmo contexto projetado (ex: enriquecimento por categoria)"
+    )
+    
+    stage_cache_backend: str = Field(
+        default="sqlite",
+        description="Camada compartilhada do cache: 'sqlite' (arquivo, pode estar em volume comum), 'redis' ou 'memory' (só o processo)"
+    )
+    
+    stage_cache_path: str = Field(
+        default="data/stage_cache.sqlite3",
+        description="Arquivo SQLite do cache de etapas (backend 'sqlite')"
+    )
+    
+    stage_cache_url: Optional[str] = Field(
+        default=None,
+        description="URL do servidor do backend 'redis' (ex: redis://cache:6379/0)"
+    )
+    
+    stage_cache_lru_size: int = Field(
+        default=256,
+        description="Resultados mantidos no LRU em memória de cada processo, na frente do backend (0 = desativado)"
+    )
+    
+    stage_cache_ttl: float = Field(
+        default=86400.0,
+        description="Validade (s) dos resultados do cache de etapas (0 = sem expiração)"
+    )
+    
+    # Pré-carregamento especulativo (src/prefetch.py)
+    speculative_prefetch: bool = Field(
+        default=False,
+        description="Classificar em segundo plano assim que uma amostra é selecionada na interface (opt-in)"
+    )
+    
+    prefetch_budget: float = Field(
+        default=20.0,
+        description="Tempo máximo (s) de uma classificação especulativa; acima dele ela é cancelada na próxima etapa"
+    )
+    
+    prefetch_max_workers: int = Field(
+        default=2,
+        description="Classificações especulativas simultâneas no processo"
+    )
+    
+    prefetch_max_sessions: int = Field(
+        default=256,
+        description="Sessões com especulação em andamento guardadas em memória (as mais antigas são canceladas)"
+    )
+    
+    # Compressão dos resultados de busca (src/compression.py)
+    search_compression_enabled: bool = Field(
+        default=True,
+        description="Compactar os resultados do Tavily (sentenças mais relevantes por BM25) antes do Pesquisador"
+    )
+    
+    search_compression_budget: int = Field(
+        default=600,
+        description="Orçamento aproximado de tokens das sentenças mantidas por busca"
+    )
+    
+    # Record/replay de chamadas externas (src/cassette.py)
+    cassette_mode: str = Field(
+        default="off",
+        description="Gravação/reprodução de chamadas LLM e Tavily: off, record, replay ou auto"
+    )
+    
+    cassette_path: str = Field(
+        default="data/cassettes/default.sqlite3",
+        description="Arquivo do cassette com as interações gravadas"
+    )
+    
+    # Perfilamento de execuções (src/profiling.py)
+    profiling_enabled: bool = Field(
+        default=False,
+        description="Perfilar execuções (cProfile, tracemalloc e pilhas amostradas)"
+    )
+    
+    profiling_sample_rate: float = Field(
+        default=1.0,
+        description="Fração das execuções perfiladas (aplicada a workers, API e lotes)"
+    )
+    
+    profiling_dir: str = Field(
+        default="data/profiles",
+        description="Diretório dos artefatos de perfil (um subdiretório por execução)"
+    )
+    
+    profiling_interval: float = Field(
+        default=0.01,
+        description="Intervalo (s) entre amostras de pilha"
+    )
+    
+    profiling_memory: bool = Field(
+        default=True,
+        description="Incluir snapshot de memória (tracemalloc; deixa a execução mais lenta)"
+    )
+    
     # Configurações de UI
     enable_history: bool = Field(
         default=True,
@@ -61,6 +345,151 @@ class VerbaFlowConfig(BaseSettings):
         description="Número máximo de itens no histórico"
     )
 
+    css_inject_once: bool = Field(
+        default=True,
+        description="Injetar o CSS do tema apenas uma vez por sessão (False reenvia a cada rerun)"
+    )
+
+    # Fila de jobs (execução em background)
+    use_job_queue: bool = Field(
+        default=False,
+        description="Submeter execuções à fila de jobs (requer workers: python -m src.worker)"
+    )
+
+    job_db_path: str = Field(
+        default="data/jobs.sqlite3",
+        description="Caminho do banco SQLite da fila de jobs"
+    )
+
+    job_poll_interval: float = Field(
+        default=1.0,
+        description="Intervalo (segundos) de polling da fila pela UI e pelos workers"
+    )
+
+    job_stale_timeout: float = Field(
+        default=600.0,
+        description="Segundos sem heartbeat até um job em execução voltar para a fila"
+    )
+
+    job_max_attempts: int = Field(
+        default=3,
+        description="Execuções máximas de um job; ao esgotar, o job reenfileirado é marcado como falho"
+    )
+
+    # Label sets (src/labels.py)
+    label_set_dir: str = Field(
+        default="data/raw",
+        description="Diretório dos CSVs aceitos como label set por nome (API, workers e CLI)"
+    )
+    
+    # Serviço HTTP (src/api.py)
+    api_host: str = Field(
+        default="127.0.0.1",
+        description="Endereço de escuta do serviço HTTP"
+    )
+
+    api_port: int = Field(
+        default=8080,
+        description="Porta do serviço HTTP"
+    )
+
+    api_max_workers: int = Field(
+        default=8,
+        description="Paralelismo máximo do endpoint /batch"
+    )
+
+    api_models: str = Field(
+        default="llama-3.1-8b-instant,llama-3.3-70b-versatile,mixtral-8x7b-32768",
+        description="Modelos aceitos no campo 'model' da API, separados por vírgula (o GROQ_MODEL é sempre aceito)"
+    )
+
+    # Execuções particionadas (src/sharding.py)
+    shard_threads: int = Field(
+        default=4,
+        description="Requisições concorrentes dentro de cada shard"
+    )
+
+    shard_claim_timeout: float = Field(
+        default=900.0,
+        description="Segundos sem heartbeat até a reserva de um shard ser recuperada por outro worker"
+    )
+
+    # Leitura de entradas grandes (src/utils.py)
+    input_max_bytes: int = Field(
+        default=262144,
+        description="Máximo materializado de um texto de entrada (bytes de arquivo ou caracteres); "
+                    "acima disso, apenas o início e o final são lidos"
+    )
+
+    input_head_ratio: float = Field(
+        default=0.8,
+        description="Fração de input_max_bytes lida do início do texto (o restante vem do final)"
+    )
+
+    input_preview_chars: int = Field(
+        default=5000,
+        description="Caracteres do texto exibidos nas caixas de texto da interface"
+    )
+
+    # Índice de diretórios de amostras (src/samples.py)
+    sample_index_db_path: str = Field(
+        default="data/samples.sqlite3",
+        description="Caminho do índice SQLite dos diretórios de amostras"
+    )
+
+    # Corpus empacotado (src/corpus.py)
+    corpus_path: str = Field(
+        default="data/corpus/20newsgroups.jsonl",
+        description="Corpus empacotado (JSONL + índice) usado para sortear amostras do 20 Newsgroups"
+    )
+
+    # Classificação em lote (CSV e fontes grandes)
+    batch_size: int = Field(
+        default=10,
+        description="Textos classificados por chamada ao LLM em execuções em lote"
+    )
+
+    batch_max_workers: int = Field(
+        default=4,
+        description="Lotes classificados simultaneamente"
+    )
+
+    # Quase-duplicatas (src/dedup.py)
+    near_duplicate_enabled: bool = Field(
+        default=True,
+        description="Reaproveitar classificações de textos quase idênticos (MinHash + LSH)"
+    )
+
+    near_duplicate_db_path: str = Field(
+        default="data/near_duplicates.sqlite3",
+        description="Caminho do índice SQLite de quase-duplicatas"
+    )
+
+    near_duplicate_threshold: float = Field(
+        default=0.85,
+        description="Similaridade de Jaccard estimada mínima para reaproveitar uma classificação"
+    )
+
+    near_duplicate_num_perm: int = Field(
+        default=128,
+        description="Número de permutações MinHash por assinatura"
+    )
+
+    near_duplicate_bands: int = Field(
+        default=16,
+        description="Número de faixas LSH (num_perm deve ser múltiplo)"
+    )
+
+    near_duplicate_min_shingles: int = Field(
+        default=5,
+        description="Shingles mínimos para indexar ou consultar um texto (textos curtos/vazios não são comparados)"
+    )
+
+    near_duplicate_max_candidates: int = Field(
+        default=32,
+        description="Candidatos por faixa LSH avaliados em uma consulta (os mais recentes do bucket)"
+    )
+
 
 # Instância global de configuração
 _config: Optional[VerbaFlowConfig] = None
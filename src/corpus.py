@@ -0,0 +1,397 @@
+"""
+Corpus empacotado: um único arquivo JSONL com índice de offsets.
+
+Cada linha é um documento {"id", "category", "text"}. O índice lateral
+(<corpus>.idx) guarda id, categoria e offset de cada linha; se estiver
+ausente ou desatualizado, é reconstruído em uma leitura sequencial. Os
+documentos são lidos do arquivo mapeado em memória (mmap), com acesso
+aleatório por id e por categoria. Copiar ou ler um conjunto de 100 mil
+documentos é uma única operação sequencial, em vez de 100 mil open().
+
+Documentos são referenciados como "<corpus>.jsonl#<id>": get_text_from_file
+e extract_ground_truth_from_filename (src/utils.py) aceitam essas
+referências no lugar de caminhos de arquivo.
+
+Uso:
+    python -m src.corpus export-newsgroups [--output data/corpus/20newsgroups.jsonl]
+    python -m src.corpus pack --dir data/samples --output data/corpus/samples.jsonl
+    python -m src.corpus stats [--corpus data/corpus/20newsgroups.jsonl]
+"""
+import argparse
+import json
+import mmap
+import os
+import random
+import threading
+import zlib
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from src.config import get_config
+
+
+REF_SEPARATOR = "#"
+CORPUS_SUFFIX = ".jsonl"
+_INDEX_VERSION = 1
+_TAIL_BYTES = 65536
+
+
+def make_ref(corpus_path: str, doc_id: str) -> str:
+    """Referência "<corpus>.jsonl#<id>" de um documento."""
+    return f"{corpus_path}{REF_SEPARATOR}{doc_id}"
+
+
+def parse_ref(path: str) -> Optional[Tuple[str, str]]:
+    """
+    Separa uma referência de documento de corpus.
+
+    Args:
+        path: Caminho de arquivo ou referência "<corpus>.jsonl#<id>"
+
+    Returns:
+        (caminho do corpus, id) ou None se não for uma referência
+    """
+    corpus_path, separator, doc_id = path.rpartition(REF_SEPARATOR)
+    if not separator or not corpus_path.endswith(CORPUS_SUFFIX):
+        return None
+    return corpus_path, doc_id
+
+
+def _signature(path: str) -> dict:
+    # Tamanho + CRC do final do arquivo: sobrevive a cópias (mtime muda) e
+    # detecta reescritas e documentos acrescentados
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        f.seek(max(size - _TAIL_BYTES, 0))
+        tail = zlib.crc32(f.read())
+    return {"size": size, "tail_crc": tail}
+
+
+class CorpusWriter:
+    """
+    Grava um corpus empacotado (context manager). A escrita é atômica: o
+    arquivo final só aparece ao sair do bloco sem erro.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._tmp = f"{path}.tmp"
+        self._ids: List[str] = []
+        self._categories: List[str] = []
+        self._offsets: List[int] = []
+        self._seen = set()
+        self._file = None
+
+    def __enter__(self) -> "CorpusWriter":
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self._tmp, "wb")
+        return self
+
+    def write(self, doc_id: str, text: str, category: str = "", **metadata):
+        """
+        Acrescenta um documento.
+
+        Raises:
+            ValueError: Se o id se repetir ou contiver o separador de referência
+        """
+        if doc_id in self._seen or REF_SEPARATOR in doc_id:
+            raise ValueError(f"Id de documento inválido ou repetido: {doc_id!r}")
+        self._seen.add(doc_id)
+        line = json.dumps({"id": doc_id, "category": category, "text": text, **metadata}, ensure_ascii=False)
+        self._ids.append(doc_id)
+        self._categories.append(category)
+        self._offsets.append(self._file.tell())
+        self._file.write(line.encode("utf-8") + b"\n")
+
+    def __exit__(self, exc_type, exc, tb):
+        self._file.close()
+        if exc_type is not None:
+            os.remove(self._tmp)
+            return False
+        os.replace(self._tmp, self.path)
+        _write_index(self.path, self._ids, self._categories, self._offsets)
+        return False
+
+
+def _index_path(path: str) -> str:
+    return f"{path}.idx"
+
+
+def _write_index(path: str, ids: List[str], categories: List[str], offsets: List[int]):
+    index = {
+        "version": _INDEX_VERSION,
+        **_signature(path),
+        "ids": ids,
+        "categories": categories,
+        "offsets": offsets
+    }
+    tmp = f"{_index_path(path)}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, _index_path(path))
+
+
+def _build_index(path: str):
+    """Reconstrói o índice lateral com uma leitura sequencial do corpus."""
+    ids, categories, offsets = [], [], []
+    offset = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                ids.append(record["id"])
+                categories.append(record.get("category", ""))
+                offsets.append(offset)
+            offset += len(line)
+    _write_index(path, ids, categories, offsets)
+
+
+class PackedCorpus:
+    """Leitor de corpus empacotado com acesso aleatório via mmap."""
+
+    def __init__(self, path: str):
+        self.path = path
+        index = self._load_index()
+        self.ids: List[str] = index["ids"]
+        self._categories: List[str] = index["categories"]
+        self._offsets: List[int] = index["offsets"]
+        self._size = index["size"]
+        self._positions = {doc_id: position for position, doc_id in enumerate(self.ids)}
+        self._by_category: Dict[str, List[int]] = {}
+        for position, category in enumerate(self._categories):
+            self._by_category.setdefault(category, []).append(position)
+
+        self._file = open(path, "rb")
+        # mmap não aceita arquivos vazios
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self._size else None
+
+    def _load_index(self) -> dict:
+        try:
+            with open(_index_path(self.path), encoding="utf-8") as f:
+                index = json.load(f)
+            if index.get("version") == _INDEX_VERSION and \
+                    {key: index.get(key) for key in ("size", "tail_crc")} == _signature(self.path):
+                return index
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+        print(f"Reconstruindo índice do corpus {self.path}...")
+        _build_index(self.path)
+        with open(_index_path(self.path), encoding="utf-8") as f:
+            return json.load(f)
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._positions
+
+    def get(self, doc_id: str) -> dict:
+        """
+        Lê um documento pelo id.
+
+        Raises:
+            KeyError: Se o id não existir no corpus
+        """
+        position = self._positions[doc_id]
+        end = self._offsets[position + 1] if position + 1 < len(self._offsets) else self._size
+        return json.loads(self._map[self._offsets[position]:end])
+
+    def text(self, doc_id: str) -> str:
+        return self.get(doc_id)["text"]
+
+    def category(self, doc_id: str) -> str:
+        """Categoria do documento (do índice, sem ler o texto)."""
+        return self._categories[self._positions[doc_id]]
+
+    def categories(self) -> Dict[str, int]:
+        """Número de documentos por categoria."""
+        return {category: len(positions) for category, positions in sorted(self._by_category.items())}
+
+    def ids_by_category(self, category: str) -> List[str]:
+        return [self.ids[position] for position in self._by_category.get(category, [])]
+
+    def __iter__(self) -> Iterator[dict]:
+        """Percorre os documentos em ordem (leitura sequencial do mapeamento)."""
+        for doc_id in self.ids:
+            yield self.get(doc_id)
+
+    def stratified_sample(
+        self,
+        n: Optional[int] = None,
+        per_category: Optional[int] = None,
+        categories: Optional[List[str]] = None,
+        seed: Optional[int] = None
+    ) -> List[str]:
+        """
+        Sorteia ids equilibrados entre as categorias.
+
+        Args:
+            n: Total de documentos, distribuído em rodízio entre as categorias
+            per_category: Documentos por categoria (alternativa a n)
+            categories: Restringir a estas categorias
+            seed: Semente do sorteio
+
+        Returns:
+            Lista de ids sem repetições
+        """
+        rng = random.Random(seed)
+        pools = {
+            category: positions for category, positions in self._by_category.items()
+            if categories is None or category in categories
+        }
+        quotas: Counter = Counter()
+        if per_category is not None:
+            quotas.update({category: min(per_category, len(positions)) for category, positions in pools.items()})
+        else:
+            remaining = min(n or 0, sum(len(positions) for positions in pools.values()))
+            order = list(pools)
+            rng.shuffle(order)
+            while remaining:
+                for category in order:
+                    if remaining and quotas[category] < len(pools[category]):
+                        quotas[category] += 1
+                        remaining -= 1
+        sample = [
+            self.ids[position]
+            for category, quota in quotas.items()
+            for position in rng.sample(pools[category], quota)
+        ]
+        rng.shuffle(sample)
+        return sample
+
+
+_open: Dict[str, PackedCorpus] = {}
+_open_lock = threading.Lock()
+
+
+def open_corpus(path: Optional[str] = None) -> PackedCorpus:
+    """
+    Retorna o leitor do corpus (um por arquivo no processo; reaberto se o
+    arquivo mudar de tamanho).
+
+    Args:
+        path: Caminho do corpus (padrão: corpus_path da configuração)
+
+    Raises:
+        FileNotFoundError: Se o corpus não existir
+    """
+    path = os.path.abspath(path or get_config().corpus_path)
+    size = os.path.getsize(path)
+    with _open_lock:
+        corpus = _open.get(path)
+        if corpus is None or corpus._size != size:
+            if corpus is not None:
+                corpus.close()
+            corpus = _open[path] = PackedCorpus(path)
+        return corpus
+
+
+def read_ref(ref: str) -> dict:
+    """
+    Lê o documento de uma referência "<corpus>.jsonl#<id>".
+
+    Raises:
+        ValueError: Se não for uma referência de corpus
+        KeyError: Se o id não existir no corpus
+    """
+    parsed = parse_ref(ref)
+    if parsed is None:
+        raise ValueError(f"Referência de corpus inválida: {ref}")
+    corpus_path, doc_id = parsed
+    return open_corpus(corpus_path).get(doc_id)
+
+
+def sample_refs(num_samples: int = 5, path: Optional[str] = None, seed: Optional[int] = None) -> List[str]:
+    """Sorteio estratificado de referências de documentos do corpus."""
+    path = path or get_config().corpus_path
+    corpus = open_corpus(path)
+    return [make_ref(path, doc_id) for doc_id in corpus.stratified_sample(n=num_samples, seed=seed)]
+
+
+def export_newsgroups(output: Optional[str] = None, subset: str = "all") -> int:
+    """
+    Exporta o dataset 20 Newsgroups para um corpus empacotado.
+
+    Args:
+        output: Caminho do corpus (padrão: corpus_path da configuração)
+        subset: "train", "test" ou "all"
+
+    Returns:
+        Número de documentos exportados
+    """
+    from sklearn.datasets import fetch_20newsgroups
+
+    output = output or get_config().corpus_path
+    newsgroups = fetch_20newsgroups(subset=subset, remove=('headers', 'footers', 'quotes'))
+    counters: Counter = Counter()
+    with CorpusWriter(output) as writer:
+        for text, target in zip(newsgroups.data, newsgroups.target):
+            category = newsgroups.target_names[target]
+            counters[category] += 1
+            # Mesmo formato de nome das amostras em arquivo (categoria___N)
+            writer.write(f"{category}___{counters[category]}", text, category)
+    return sum(counters.values())
+
+
+def pack_directory(directory: str, output: str) -> int:
+    """
+    Empacota um diretório de amostras (listado pelo índice de src/samples.py).
+
+    Args:
+        directory: Diretório de amostras
+        output: Caminho do corpus
+
+    Returns:
+        Número de documentos empacotados
+    """
+    from src.samples import get_sample_index
+    from src.utils import read_text_window
+
+    index = get_sample_index()
+    index.ensure_fresh(directory)
+    root = os.path.abspath(directory)
+    count = 0
+    with CorpusWriter(output) as writer:
+        for entry in index.entries(directory):
+            doc_id = os.path.relpath(entry.path, root).replace(os.sep, "/")
+            writer.write(doc_id, read_text_window(entry.path), entry.category)
+            count += 1
+    return count
+
+
+def main():
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Corpus empacotado do VerbaFlow")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export-newsgroups", help="Exportar o 20 Newsgroups")
+    export_parser.add_argument("--output", default=None)
+    export_parser.add_argument("--subset", default="all", choices=["train", "test", "all"])
+
+    pack_parser = subparsers.add_parser("pack", help="Empacotar um diretório de amostras")
+    pack_parser.add_argument("--dir", default="data/samples")
+    pack_parser.add_argument("--output", required=True)
+
+    stats_parser = subparsers.add_parser("stats", help="Documentos por categoria")
+    stats_parser.add_argument("--corpus", default=None)
+
+    args = parser.parse_args()
+    if args.command == "export-newsgroups":
+        print(f"{export_newsgroups(args.output, args.subset)} documentos exportados")
+    elif args.command == "pack":
+        print(f"{pack_directory(args.dir, args.output)} documentos empacotados em {args.output}")
+    else:
+        corpus = open_corpus(args.corpus)
+        print(json.dumps({"documents": len(corpus), "categories": corpus.categories()}, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
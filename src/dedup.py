@@ -0,0 +1,270 @@
+"""
+Detecção de quase-duplicatas com MinHash + LSH.
+Reaproveita classificações de textos quase idênticos (cross-posts, reposts,
+respostas com muitas citações) sem chamar o Analista novamente.
+"""
+import hashlib
+import json
+import sqlite3
+import struct
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+from src.config import get_config
+
+
+# Primo de Mersenne 2^61 - 1 para o hashing universal (a*x + b) mod p.
+# Com x, a e b < 2^32 o produto cabe em uint64 sem overflow.
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def _hash32(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=4).digest(), "big")
+
+
+def shingle_hashes(text: str, size: int = 3) -> set:
+    """
+    Gera os hashes dos shingles de palavras do texto.
+
+    Args:
+        text: Texto já limpo (saída de clean_text)
+        size: Número de palavras por shingle
+
+    Returns:
+        Conjunto de hashes de 32 bits
+    """
+    words = text.split()
+    if len(words) <= size:
+        return {_hash32(" ".join(words))} if words else set()
+    return {_hash32(" ".join(words[i:i + size])) for i in range(len(words) - size + 1)}
+
+
+class MinHasher:
+    """Calcula assinaturas MinHash com permutações determinísticas."""
+
+    def __init__(self, num_perm: int = 128, seed: int = 1):
+        self.num_perm = num_perm
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+    def signature(self, hashes: set) -> tuple:
+        """
+        Calcula a assinatura MinHash de um conjunto de shingles.
+
+        Args:
+            hashes: Hashes dos shingles
+
+        Returns:
+            Tupla com num_perm valores mínimos (32 bits cada)
+        """
+        if not hashes:
+            return tuple([int(_MAX_HASH)] * self.num_perm)
+        values = np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+        permuted = (np.outer(values, self._a) + self._b) % _MERSENNE_PRIME & _MAX_HASH
+        return tuple(permuted.min(axis=0).tolist())
+
+
+def estimate_similarity(sig_a: tuple, sig_b: tuple) -> float:
+    """Estimativa de similaridade de Jaccard pela fração de posições iguais."""
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+
+class NearDuplicateIndex:
+    """
+    Índice LSH persistente (SQLite) de assinaturas MinHash.
+
+    A assinatura é dividida em `bands` faixas; documentos que coincidem em
+    pelo menos uma faixa são candidatos e têm a similaridade estimada
+    comparando as assinaturas completas. Buckets ficam em uma tabela indexada
+    e cada faixa contribui com no máximo `max_candidates` entradas (as mais
+    recentes), então o custo de uma consulta é de `bands` buscas por índice e
+    uma leitura das assinaturas, independente do número de entradas. Textos
+    com menos de `min_shingles` shingles (vazios, uma linha) não entram no
+    índice nem são consultados: suas assinaturas coincidem por acaso.
+    """
+
+    # Limite de parâmetros por consulta (SQLITE_MAX_VARIABLE_NUMBER antigo)
+    _MAX_PARAMS = 900
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        threshold: Optional[float] = None,
+        num_perm: Optional[int] = None,
+        bands: Optional[int] = None,
+        min_shingles: Optional[int] = None,
+        max_candidates: Optional[int] = None
+    ):
+        config = get_config()
+        self.db_path = db_path or config.near_duplicate_db_path
+        self.threshold = threshold if threshold is not None else config.near_duplicate_threshold
+        num_perm = num_perm or config.near_duplicate_num_perm
+        self.bands = bands or config.near_duplicate_bands
+        if num_perm % self.bands != 0:
+            raise ValueError("num_perm deve ser múltiplo de bands")
+        self.rows = num_perm // self.bands
+        self.hasher = MinHasher(num_perm)
+        self.min_shingles = config.near_duplicate_min_shingles if min_shingles is None else min_shingles
+        self.max_candidates = max_candidates or config.near_duplicate_max_candidates
+
+        self.lookups = 0
+        self.hits = 0
+
+        if self.db_path != ":memory:":
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS entries (
+                id INTEGER PRIMARY KEY,
+                signature BLOB NOT NULL,
+                payload TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS buckets (
+                band INTEGER NOT NULL,
+                key INTEGER NOT NULL,
+                entry_id INTEGER NOT NULL
+            );
+            DROP INDEX IF EXISTS idx_buckets;
+            CREATE INDEX IF NOT EXISTS idx_buckets_entry ON buckets (band, key, entry_id);
+        """)
+
+    def _signature(self, text: str) -> Optional[tuple]:
+        hashes = shingle_hashes(text)
+        if len(hashes) < max(self.min_shingles, 1):
+            return None
+        return self.hasher.signature(hashes)
+
+    def _band_keys(self, signature: tuple) -> list:
+        keys = []
+        for band in range(self.bands):
+            chunk = signature[band * self.rows:(band + 1) * self.rows]
+            digest = hashlib.blake2b(struct.pack(f"<{self.rows}I", *chunk), digest_size=8).digest()
+            # Inteiro com sinal de 64 bits (tipo INTEGER do SQLite)
+            keys.append(int.from_bytes(digest, "big", signed=True))
+        return keys
+
+    def lookup(self, text: str) -> Optional[dict]:
+        """
+        Procura um documento quase idêntico já indexado.
+
+        Args:
+            text: Texto limpo
+
+        Returns:
+            {"payload", "similarity", "entry_id"} da melhor correspondência acima
+            do limiar, ou None
+        """
+        signature = self._signature(text)
+
+        with self._lock:
+            self.lookups += 1
+            if signature is None:
+                return None
+            candidates = set()
+            for band, key in enumerate(self._band_keys(signature)):
+                # Bucket muito populoso: só as entradas mais recentes (varredura do índice)
+                rows = self._conn.execute(
+                    "SELECT entry_id FROM buckets WHERE band = ? AND key = ? ORDER BY entry_id DESC LIMIT ?",
+                    (band, key, self.max_candidates)
+                ).fetchall()
+                candidates.update(row[0] for row in rows)
+
+            best = None
+            ids = sorted(candidates)
+            for start in range(0, len(ids), self._MAX_PARAMS):
+                chunk = ids[start:start + self._MAX_PARAMS]
+                rows = self._conn.execute(
+                    f"SELECT id, signature FROM entries WHERE id IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for entry_id, blob in rows:
+                    candidate_sig = struct.unpack(f"<{len(signature)}I", blob)
+                    similarity = estimate_similarity(signature, candidate_sig)
+                    if similarity >= self.threshold and (best is None or similarity > best["similarity"]):
+                        best = {"similarity": similarity, "entry_id": entry_id}
+
+            if best is None:
+                return None
+            self.hits += 1
+            # Só o payload da melhor correspondência é lido
+            payload = self._conn.execute(
+                "SELECT payload FROM entries WHERE id = ?", (best["entry_id"],)
+            ).fetchone()[0]
+
+        best["payload"] = json.loads(payload)
+        return best
+
+    def add(self, text: str, payload: dict) -> Optional[int]:
+        """
+        Indexa um documento com o payload a reaproveitar (ex: ClassificationOutput).
+
+        Args:
+            text: Texto limpo
+            payload: Dados serializáveis em JSON
+
+        Returns:
+            ID da entrada criada, ou None se o texto for curto demais para o índice
+        """
+        signature = self._signature(text)
+        if signature is None:
+            return None
+        keys = self._band_keys(signature)
+        blob = struct.pack(f"<{len(signature)}I", *signature)
+
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO entries (signature, payload) VALUES (?, ?)",
+                (blob, json.dumps(payload, ensure_ascii=False))
+            )
+            entry_id = cursor.lastrowid
+            self._conn.executemany(
+                "INSERT INTO buckets (band, key, entry_id) VALUES (?, ?, ?)",
+                [(band, key, entry_id) for band, key in enumerate(keys)]
+            )
+            self._conn.commit()
+        return entry_id
+
+    def stats(self) -> dict:
+        """Métricas do índice: consultas, acertos, taxa de acerto e número de entradas."""
+        with self._lock:
+            # MAX(id) em vez de COUNT(*): O(1) pela chave primária (entradas nunca são removidas)
+            entries = self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM entries").fetchone()[0]
+            return {
+                "entries": entries,
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "misses": self.lookups - self.hits,
+                "hit_rate": self.hits / self.lookups if self.lookups else 0.0
+            }
+
+
+_indexes: Dict[str, NearDuplicateIndex] = {}
+_index_lock = threading.Lock()
+
+
+def get_near_duplicate_index(namespace: str = "20newsgroups") -> NearDuplicateIndex:
+    """
+    Retorna o índice de quase-duplicatas do processo para um label set.
+
+    Cada label set tem seu próprio arquivo, para que uma classificação nunca
+    seja reaproveitada com categorias de outro conjunto.
+
+    Args:
+        namespace: Nome do label set
+
+    Returns:
+        NearDuplicateIndex configurado
+    """
+    with _index_lock:
+        if namespace not in _indexes:
+            base = Path(get_config().near_duplicate_db_path)
+            slug = hashlib.sha1(namespace.encode("utf-8")).hexdigest()[:8] if namespace != "20newsgroups" else ""
+            path = base.with_name(f"{base.stem}-{slug}{base.suffix}") if slug else base
+            _indexes[namespace] = NearDuplicateIndex(db_path=str(path))
+        return _indexes[namespace]
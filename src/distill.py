@@ -0,0 +1,440 @@
+"""
+Destilação: classificador local treinado com os rótulos pagos do LLM.
+
+Cada classificação aceita (confiança em distill_accept_confidence e, quando
+há ground truth, correta) é guardada com o texto limpo em um conjunto de
+treino SQLite. A cada distill_retrain_every exemplos novos, um modelo linear
+sobre features com hashing (HashingVectorizer + SGDClassifier) é atualizado
+com partial_fit e salvo como um artefato versionado. Quando a acurácia no
+holdout passa do mínimo configurado, textos em que o modelo local está
+confiante são classificados sem chamar o LLM.
+
+Uso:
+    python -m src.distill train [--label-set 20newsgroups] [--full]
+    python -m src.distill stats [--label-set 20newsgroups]
+"""
+import argparse
+import hashlib
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import joblib
+import numpy as np
+from sklearn import config_context
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+
+from src.config import get_config
+from src.labels import LabelSet, NEWSGROUPS_LABEL_SET, get_label_set
+
+
+# Exemplos com id múltiplo de HOLDOUT_EVERY nunca entram no treino (avaliação)
+HOLDOUT_EVERY = 5
+_TRAIN_CHUNK = 1000
+
+
+class TrainingStore:
+    """Conjunto de treino (SQLite): texto limpo e rótulo aceito, por label set."""
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or get_config().distill_db_path
+        if self.db_path != ":memory:":
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS examples (
+                id INTEGER PRIMARY KEY,
+                label_set TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                text TEXT NOT NULL,
+                label TEXT NOT NULL,
+                confidence TEXT,
+                created_at TEXT NOT NULL,
+                UNIQUE (label_set, text_hash)
+            );
+            CREATE INDEX IF NOT EXISTS idx_examples_label_set ON examples (label_set, id);
+        """)
+
+    def add(self, label_set: str, text: str, label: str, confidence: str = "") -> bool:
+        """
+        Guarda um exemplo rotulado (textos repetidos mantêm o rótulo mais recente).
+
+        Args:
+            label_set: Nome do label set
+            text: Texto limpo
+            label: Categoria canônica
+            confidence: Confiança declarada pelo LLM
+
+        Returns:
+            True se o exemplo for novo
+        """
+        text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE examples SET label = ?, confidence = ? WHERE label_set = ? AND text_hash = ?",
+                (label, confidence, label_set, text_hash)
+            )
+            if cursor.rowcount == 0:
+                self._conn.execute(
+                    "INSERT INTO examples (label_set, text_hash, text, label, confidence, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (label_set, text_hash, text, label, confidence, datetime.now().isoformat())
+                )
+            self._conn.commit()
+            return cursor.rowcount == 0
+
+    def examples(self, label_set: str, after_id: int = 0, holdout: Optional[bool] = None) -> List[tuple]:
+        """
+        Lista (id, texto, rótulo) em ordem de inserção.
+
+        Args:
+            label_set: Nome do label set
+            after_id: Apenas exemplos com id maior (atualizações incrementais)
+            holdout: True só holdout, False só treino, None todos
+
+        Returns:
+            Lista de tuplas (id, text, label)
+        """
+        query = "SELECT id, text, label FROM examples WHERE label_set = ? AND id > ?"
+        if holdout is True:
+            query += f" AND id % {HOLDOUT_EVERY} = 0"
+        elif holdout is False:
+            query += f" AND id % {HOLDOUT_EVERY} != 0"
+        with self._lock:
+            return self._conn.execute(query + " ORDER BY id", (label_set, after_id)).fetchall()
+
+    def count(self, label_set: str, after_id: int = 0) -> int:
+        with self._lock:
+            return self._conn.execute(
+                f"SELECT COUNT(*) FROM examples WHERE label_set = ? AND id > ? AND id % {HOLDOUT_EVERY} != 0",
+                (label_set, after_id)
+            ).fetchone()[0]
+
+
+class LocalClassifier:
+    """Modelo linear sobre features com hashing (sem vocabulário: atualizável online)."""
+
+    def __init__(self, labels: List[str]):
+        self.labels = list(labels)
+        self.vectorizer = HashingVectorizer(
+            n_features=2 ** 18, ngram_range=(1, 2), alternate_sign=False, norm="l2"
+        )
+        self.model = SGDClassifier(loss="log_loss", alpha=1e-5, random_state=0)
+        self._weights: Optional[np.ndarray] = None
+
+    def __getstate__(self) -> dict:
+        # A cópia transposta dos pesos é recriada ao carregar (não vai para o artefato)
+        return {**self.__dict__, "_weights": None}
+
+    def partial_fit(self, texts: List[str], labels: List[str]):
+        self.model.partial_fit(self.vectorizer.transform(texts), labels, classes=self.labels)
+        self._weights = None
+
+    def predict_proba(self, texts: List[str]) -> np.ndarray:
+        """Probabilidades por texto, colunas na ordem de self.model.classes_."""
+        if self._weights is None:
+            # predict_proba do sklearn copia coef_.T a cada chamada (n_features x classes);
+            # a cópia contígua é feita uma vez e a inferência vira um produto esparso
+            self._weights = np.ascontiguousarray(self.model.coef_.T)
+        # Validações de parâmetros do sklearn custam mais que a inferência em si
+        with config_context(skip_parameter_validation=True, assume_finite=True):
+            features = self.vectorizer.transform(texts)
+        scores = features @ self._weights + self.model.intercept_
+        # Mesma normalização one-vs-rest do SGDClassifier(loss="log_loss")
+        probabilities = 1.0 / (1.0 + np.exp(-scores))
+        return probabilities / probabilities.sum(axis=1, keepdims=True)
+
+    def accuracy(self, texts: List[str], labels: List[str]) -> Optional[float]:
+        if not texts:
+            return None
+        return float((self.model.predict(self.vectorizer.transform(texts)) == np.array(labels)).mean())
+
+
+def _model_dir(label_set_name: str) -> Path:
+    base = Path(get_config().distill_model_dir)
+    slug = label_set_name if label_set_name == NEWSGROUPS_LABEL_SET.name else (
+        hashlib.sha1(label_set_name.encode("utf-8")).hexdigest()[:8]
+    )
+    return base / slug
+
+
+def load_manifest(label_set_name: str) -> dict:
+    """Manifesto das versões de um label set ({"label_set", "versions": [...]})."""
+    path = _model_dir(label_set_name) / "manifest.json"
+    if not path.exists():
+        return {"label_set": label_set_name, "versions": []}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _load_version(label_set_name: str, entry: dict) -> LocalClassifier:
+    return joblib.load(_model_dir(label_set_name) / entry["file"])
+
+
+def train(label_set: Optional[LabelSet] = None, full: bool = False, store: Optional[TrainingStore] = None) -> Optional[dict]:
+    """
+    Treina uma nova versão do classificador local.
+
+    Sem full, a última versão é carregada e atualizada com partial_fit apenas
+    nos exemplos novos; com full (ou sem versão anterior), o modelo é
+    treinado do zero com todos os exemplos.
+
+    Args:
+        label_set: Conjunto de categorias (padrão: 20 Newsgroups)
+        full: Retreinar do zero
+        store: Conjunto de treino (padrão: o do processo)
+
+    Returns:
+        Entrada do manifesto da nova versão ou None se não houver exemplos novos
+    """
+    config = get_config()
+    label_set = label_set or NEWSGROUPS_LABEL_SET
+    store = store or get_training_store()
+    manifest = load_manifest(label_set.name)
+    latest = manifest["versions"][-1] if manifest["versions"] else None
+
+    if latest and not full:
+        classifier = _load_version(label_set.name, latest)
+        after_id = latest["last_example_id"]
+        epochs = 1
+    else:
+        classifier = LocalClassifier(label_set.labels)
+        after_id = 0
+        epochs = config.distill_epochs
+
+    new_rows = store.examples(label_set.name, after_id=after_id, holdout=False)
+    # Rótulos fora do label set (ex: CSV com categorias alteradas) são ignorados
+    rows = [row for row in new_rows if row[2] in classifier.labels]
+    if not rows:
+        return None
+
+    rng = np.random.RandomState(len(manifest["versions"]))
+    for _ in range(epochs):
+        order = rng.permutation(len(rows))
+        for start in range(0, len(order), _TRAIN_CHUNK):
+            chunk = [rows[i] for i in order[start:start + _TRAIN_CHUNK]]
+            classifier.partial_fit([text for _, text, _ in chunk], [label for _, _, label in chunk])
+
+    holdout = [row for row in store.examples(label_set.name, holdout=True) if row[2] in classifier.labels]
+    version = (latest["version"] if latest else 0) + 1
+    entry = {
+        "version": version,
+        "file": f"v{version:04d}.joblib",
+        "mode": "incremental" if after_id else "full",
+        # Exemplos distintos vistos pelo modelo (épocas não contam)
+        "examples": (latest["examples"] if after_id else 0) + len(rows),
+        "last_example_id": new_rows[-1][0],
+        "holdout_examples": len(holdout),
+        "holdout_accuracy": classifier.accuracy([text for _, text, _ in holdout], [label for _, _, label in holdout]),
+        "created_at": datetime.now().isoformat()
+    }
+
+    directory = _model_dir(label_set.name)
+    directory.mkdir(parents=True, exist_ok=True)
+    # Pesos de features nunca vistas são zero: o artefato comprime bem
+    joblib.dump(classifier, directory / entry["file"], compress=3)
+    manifest["versions"].append(entry)
+    # Escrita atômica: leitores nunca veem um manifesto parcial
+    tmp = directory / "manifest.json.tmp"
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    tmp.replace(directory / "manifest.json")
+    return entry
+
+
+_store: Optional[TrainingStore] = None
+_store_lock = threading.Lock()
+_training_locks: Dict[str, threading.Lock] = {}
+_served: Dict[str, tuple] = {}
+_served_lock = threading.Lock()
+# Manifesto em memória por label set: (mtime_ns e tamanho do arquivo, manifesto)
+_manifests: Dict[str, tuple] = {}
+# Exemplos novos desde a última versão, por label set: (last_example_id da versão, contagem)
+_pending: Dict[str, tuple] = {}
+
+
+def cached_manifest(label_set_name: str) -> dict:
+    """
+    Manifesto de um label set, relido do disco só quando o arquivo muda
+    (chave: mtime e tamanho). Usado no caminho quente de serving e coleta.
+    """
+    path = _model_dir(label_set_name) / "manifest.json"
+    try:
+        stat = path.stat()
+        signature = (stat.st_mtime_ns, stat.st_size)
+    except FileNotFoundError:
+        signature = None
+    with _served_lock:
+        cached = _manifests.get(label_set_name)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+    manifest = load_manifest(label_set_name)
+    with _served_lock:
+        _manifests[label_set_name] = (signature, manifest)
+    return manifest
+
+
+def get_training_store() -> TrainingStore:
+    """Retorna o conjunto de treino do processo."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = TrainingStore()
+        return _store
+
+
+def _retrain_in_background(label_set: LabelSet):
+    with _store_lock:
+        lock = _training_locks.setdefault(label_set.name, threading.Lock())
+    if not lock.acquire(blocking=False):
+        # Já há um treino em andamento para este label set
+        return
+
+    def run():
+        try:
+            entry = train(label_set)
+            if entry:
+                print(f"🎓 Classificador local {label_set.name} v{entry['version']} "
+                      f"(acurácia no holdout: {entry['holdout_accuracy']})")
+        except Exception as e:
+            print(f"⚠️ Falha ao treinar o classificador local: {e}")
+        finally:
+            lock.release()
+
+    threading.Thread(target=run, name="verbaflow-distill", daemon=True).start()
+
+
+def collect(text: str, classification: Optional[dict], label_set: LabelSet, ground_truth: str = "") -> bool:
+    """
+    Guarda uma classificação do LLM no conjunto de treino, se aceita, e
+    dispara o retreino quando houver exemplos novos suficientes.
+
+    Args:
+        text: Texto limpo
+        classification: Classificação (formato de ClassificationOutput)
+        label_set: Conjunto de categorias
+        ground_truth: Categoria real, se conhecida (rótulos errados são descartados)
+
+    Returns:
+        True se o exemplo foi guardado
+    """
+    config = get_config()
+    if not config.distill_enabled or not classification or not text:
+        return False
+
+    label = label_set.normalize(str(classification.get("final_category", "")))
+    confidence = str(classification.get("confidence", "")).lower()
+    accepted = {level.strip().lower() for level in config.distill_accept_confidence.split(",") if level.strip()}
+    if not label or confidence not in accepted:
+        return False
+    if ground_truth and label.lower() != ground_truth.lower():
+        return False
+
+    store = get_training_store()
+    added = store.add(label_set.name, text, label, confidence)
+
+    versions = cached_manifest(label_set.name)["versions"]
+    after_id = versions[-1]["last_example_id"] if versions else 0
+    with _served_lock:
+        pending = _pending.get(label_set.name)
+        if pending is None or pending[0] != after_id:
+            # Primeira coleta ou versão nova: conta uma vez no banco, depois só incrementa
+            pending = None
+        elif added:
+            pending = (after_id, pending[1] + 1)
+    if pending is None:
+        pending = (after_id, store.count(label_set.name, after_id))
+    with _served_lock:
+        _pending[label_set.name] = pending
+    if pending[1] >= config.distill_retrain_every:
+        _retrain_in_background(label_set)
+    return True
+
+
+def _serving_model(label_set: LabelSet) -> Optional[tuple]:
+    config = get_config()
+    versions = cached_manifest(label_set.name)["versions"]
+    if not versions:
+        return None
+    latest = versions[-1]
+    if latest["examples"] < config.distill_min_examples or (latest["holdout_accuracy"] or 0) < config.distill_min_accuracy:
+        return None
+    with _served_lock:
+        cached = _served.get(label_set.name)
+        if cached is None or cached[0]["version"] != latest["version"]:
+            cached = (latest, _load_version(label_set.name, latest))
+            _served[label_set.name] = cached
+        return cached
+
+
+def classify_locally(text: str, label_set: Optional[LabelSet] = None) -> Optional[dict]:
+    """
+    Classifica com o modelo local, se ele estiver apto e confiante.
+
+    Args:
+        text: Texto limpo
+        label_set: Conjunto de categorias (padrão: 20 Newsgroups)
+
+    Returns:
+        Classificação no formato de ClassificationOutput (com probabilities e
+        confidence_score) ou None se o texto deve ir para o LLM
+    """
+    config = get_config()
+    label_set = label_set or NEWSGROUPS_LABEL_SET
+    served = _serving_model(label_set)
+    if served is None:
+        return None
+
+    entry, classifier = served
+    probabilities = classifier.predict_proba([text])[0]
+    ranked = sorted(zip(classifier.model.classes_, probabilities), key=lambda item: item[1], reverse=True)
+    final_category, probability = ranked[0]
+    if probability < config.distill_serve_threshold:
+        return None
+
+    return {
+        "final_category": str(final_category),
+        "confidence": "alta",
+        "confidence_score": float(probability),
+        "probabilities": {str(label): float(score) for label, score in ranked},
+        "candidate_categories": [str(label) for label, _ in ranked[:3]],
+        "contextual_reasoning": f"Classificador local v{entry['version']} "
+                                f"(destilado de {entry['examples']} rótulos do LLM)",
+        "method": "local"
+    }
+
+
+def main():
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Classificador local destilado do VerbaFlow")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    train_parser = subparsers.add_parser("train", help="Treinar uma nova versão")
+    train_parser.add_argument("--label-set", default=None, help="20newsgroups (padrão) ou CSV de LABEL_SET_DIR")
+    train_parser.add_argument("--full", action="store_true", help="Retreinar do zero com todos os exemplos")
+
+    stats_parser = subparsers.add_parser("stats", help="Exemplos e versões treinadas")
+    stats_parser.add_argument("--label-set", default=None)
+
+    args = parser.parse_args()
+    label_set = get_label_set(args.label_set)
+    if args.command == "train":
+        entry = train(label_set, full=args.full)
+        print(json.dumps(entry, ensure_ascii=False, indent=2) if entry else "Nenhum exemplo novo para treinar")
+    else:
+        store = get_training_store()
+        print(json.dumps({
+            "label_set": label_set.name,
+            "train_examples": store.count(label_set.name),
+            "versions": load_manifest(label_set.name)["versions"]
+        }, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Ensemble de autoconsistência para documentos ambíguos.
+
+Quando a classificação sai com confiança baixa, K chamadas do Analista rodam
+em paralelo, alternando modelos e temperaturas. A categoria final é decidida
+por voto (a classificação inicial conta como o primeiro voto) e a fração de
+votos da vencedora vira a confiança. As chamadas são concorrentes, então o
+tempo de parede fica próximo ao de uma chamada, e só a minoria ambígua paga
+o custo extra.
+"""
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from src.config import get_config
+from src.hedging import create_stage_llm
+from src.labels import LabelSet, NEWSGROUPS_LABEL_SET
+from src.session import SessionContext
+
+
+# Peso de desempate de cada voto pela confiança declarada pelo membro
+CONFIDENCE_WEIGHTS = {"alta": 1.0, "média": 0.66, "baixa": 0.33}
+
+
+def _split(value: str) -> List[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def ensemble_members(model_name: Optional[str] = None) -> List[Tuple[str, float]]:
+    """
+    Define modelo e temperatura de cada membro do ensemble.
+
+    Args:
+        model_name: Modelo da execução (usado se ensemble_models estiver vazio)
+
+    Returns:
+        Lista de (modelo, temperatura), alternando as listas configuradas
+    """
+    config = get_config()
+    models = _split(config.ensemble_models) or [model_name or config.groq_model]
+    temperatures = [float(t) for t in _split(config.ensemble_temperatures)] or [config.temperature]
+    return [
+        (models[i % len(models)], temperatures[i % len(temperatures)])
+        for i in range(config.ensemble_size)
+    ]
+
+
+def needs_ensemble(classification: Optional[dict]) -> bool:
+    """
+    Verifica se uma classificação é ambígua o bastante para o ensemble.
+
+    Args:
+        classification: Classificação (formato de ClassificationOutput)
+
+    Returns:
+        True se o ensemble estiver habilitado e a confiança estiver entre os
+        níveis de ensemble_trigger_confidence
+    """
+    config = get_config()
+    if not config.ensemble_enabled or not classification or config.ensemble_size < 1:
+        return False
+    if classification.get("ensemble_members"):
+        # Já decidida por voto
+        return False
+    confidence = str(classification.get("confidence", "")).strip().lower()
+    triggers = {level.lower() for level in _split(config.ensemble_trigger_confidence)}
+    return confidence in triggers
+
+
+def _confidence_level(agreement: float) -> str:
+    if agreement >= 0.8:
+        return "alta"
+    if agreement >= 0.5:
+        return "média"
+    return "baixa"
+
+
+def _ask_member(
+    messages: List[dict],
+    model: str,
+    temperature: float,
+    session: Optional[SessionContext] = None
+) -> Optional[dict]:
+    from src.agents import get_llm
+    from src.pipeline import parse_classification_json
+
+    # Cada membro tem o prazo da etapa de classificação
+    llm = create_stage_llm(get_llm(model_name=model, temperature=temperature, session=session), "classify", model)
+    return parse_classification_json(str(llm.call(messages)))
+
+
+def vote(ballots: List[Tuple[dict, dict]], label_set: LabelSet) -> Optional[dict]:
+    """
+    Decide a categoria por maioria.
+
+    Args:
+        ballots: Lista de (classificação, {"model", "temperature"}) de cada membro
+        label_set: Conjunto de categorias válidas
+
+    Returns:
+        Classificação da vencedora com confidence_score = concordância,
+        probabilities = fração de votos por categoria e ensemble_members;
+        None se nenhum voto tiver categoria válida
+    """
+    valid = []
+    for classification, member in ballots:
+        category = label_set.normalize(str(classification.get("final_category", "")))
+        if category:
+            valid.append((category, classification, member))
+    if not valid:
+        return None
+
+    counts = Counter(category for category, _, _ in valid)
+    weights: Dict[str, float] = Counter()
+    for category, classification, _ in valid:
+        weights[category] += CONFIDENCE_WEIGHTS.get(str(classification.get("confidence", "")).lower(), 0.0)
+
+    # Empate na contagem: vence a categoria votada com mais confiança
+    winner = max(counts, key=lambda category: (counts[category], weights[category]))
+    agreement = counts[winner] / len(valid)
+
+    result = dict(next(classification for category, classification, _ in valid if category == winner))
+    result.update(
+        final_category=winner,
+        confidence=_confidence_level(agreement),
+        confidence_score=agreement,
+        probabilities={category: count / len(valid) for category, count in counts.items()},
+        candidate_categories=[category for category, _ in counts.most_common(3)],
+        method="ensemble",
+        ensemble_members=[
+            {
+                **member,
+                "final_category": category,
+                "confidence": classification.get("confidence", "")
+            }
+            for category, classification, member in valid
+        ]
+    )
+    return result
+
+
+def run_ensemble(
+    messages: List[dict],
+    first: dict,
+    label_set: Optional[LabelSet] = None,
+    model_name: Optional[str] = None,
+    session: Optional[SessionContext] = None
+) -> dict:
+    """
+    Executa os membros do ensemble em paralelo e decide a categoria por voto.
+
+    Args:
+        messages: Mensagens do Analista (mesmo prompt para todos os membros)
+        first: Classificação inicial (conta como o primeiro voto)
+        label_set: Conjunto de categorias válidas (padrão: 20 Newsgroups)
+        model_name: Modelo da execução
+        session: Credenciais da sessão (repassadas a cada membro)
+
+    Returns:
+        Classificação decidida por voto, ou a inicial se nenhum membro responder
+    """
+    config = get_config()
+    label_set = label_set or NEWSGROUPS_LABEL_SET
+    members = ensemble_members(model_name)
+    ballots = [(first, {"model": model_name or config.groq_model, "temperature": config.temperature})]
+
+    with ThreadPoolExecutor(max_workers=len(members)) as executor:
+        futures = [
+            (executor.submit(_ask_member, messages, model, temperature, session), {"model": model, "temperature": temperature})
+            for model, temperature in members
+        ]
+        for future, member in futures:
+            try:
+                classification = future.result()
+            except Exception as e:
+                print(f"⚠️ Membro do ensemble ({member['model']}, t={member['temperature']}) falhou: {e}")
+                continue
+            if classification:
+                ballots.append((classification, member))
+
+    if len(ballots) == 1:
+        # Nenhum membro respondeu: sem voto, mantém a classificação inicial
+        return first
+    return vote(ballots, label_set) or first
@@ -0,0 +1,253 @@
+"""
+Prazos por etapa e requisições duplicadas (hedging) para as chamadas LLM.
+
+Cada etapa do pipeline recebe um StageLLM com orçamento de tempo próprio,
+contado a partir da primeira chamada da etapa. As chamadas rodam como tasks
+em um event loop do processo: quando o prazo expira, ou quando uma requisição
+duplicada vence a corrida, a task perdedora é cancelada e a requisição HTTP
+em andamento é abortada.
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+from crewai.llms.base_llm import BaseLLM
+from pydantic import PrivateAttr
+
+from src.config import get_config
+from src.session import DEFAULT_SESSION, SessionContext
+
+
+class LatencyTracker:
+    """Janela das últimas latências bem-sucedidas por etapa."""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float):
+        with self._lock:
+            self._samples.setdefault(stage, deque(maxlen=self.window)).append(seconds)
+
+    def quantile(self, stage: str, q: float, min_samples: int = 1) -> Optional[float]:
+        """
+        Quantil das latências observadas da etapa.
+
+        Args:
+            stage: Etapa do pipeline
+            q: Quantil (0-1)
+            min_samples: Amostras mínimas para a estimativa
+
+        Returns:
+            Latência em segundos ou None se não houver amostras suficientes
+        """
+        with self._lock:
+            samples = sorted(self._samples.get(stage, ()))
+        if len(samples) < max(min_samples, 1):
+            return None
+        return samples[min(int(q * len(samples)), len(samples) - 1)]
+
+
+_tracker = LatencyTracker()
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+# Métricas do processo (atualizadas pelo event loop e pelas threads chamadoras)
+hedge_stats = {"calls": 0, "hedged": 0, "hedge_wins": 0, "timeouts": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(metric: str):
+    with _stats_lock:
+        hedge_stats[metric] += 1
+
+
+def get_hedge_stats() -> dict:
+    """Cópia consistente das métricas de hedging."""
+    with _stats_lock:
+        return dict(hedge_stats)
+
+
+def get_latency_tracker() -> LatencyTracker:
+    return _tracker
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    # Um único loop em thread daemon: os clientes HTTP assíncronos ficam
+    # sempre presos ao mesmo loop, independente da thread chamadora
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="verbaflow-llm-loop", daemon=True).start()
+        return _loop
+
+
+class StageLLM(BaseLLM):
+    """
+    LLM de uma etapa: aplica o prazo da etapa e, opcionalmente, hedging.
+
+    Com hedging, se a chamada principal passar do quantil configurado das
+    latências da etapa, a mesma requisição é enviada ao LLM alternativo (outro
+    modelo ou outra chave) e a primeira resposta bem-sucedida vence.
+    """
+
+    llm_type: str = "stage"
+    _primary: BaseLLM = PrivateAttr()
+    _hedge: Optional[BaseLLM] = PrivateAttr(default=None)
+    _stage: str = PrivateAttr()
+    _deadline: float = PrivateAttr(default=0.0)
+    _deadline_at: Optional[float] = PrivateAttr(default=None)
+
+    def __init__(self, primary: BaseLLM, stage: str, deadline: float, hedge: Optional[BaseLLM] = None, **kwargs: Any):
+        super().__init__(model=primary.model, temperature=primary.temperature, **kwargs)
+        self._primary = primary
+        self._hedge = hedge
+        self._stage = stage
+        self._deadline = deadline
+        self._deadline_at = None
+
+    def _remaining(self) -> Optional[float]:
+        if not self._deadline:
+            return None
+        if self._deadline_at is None:
+            self._deadline_at = time.monotonic() + self._deadline
+        remaining = self._deadline_at - time.monotonic()
+        if remaining <= 0:
+            _count("timeouts")
+            raise TimeoutError(f"Prazo da etapa '{self._stage}' excedido ({self._deadline:g}s)")
+        return remaining
+
+    async def _timed(self, llm: BaseLLM, args: tuple, kwargs: dict) -> Any:
+        llm.stop = list(self.stop)
+        start = time.monotonic()
+        result = await llm.acall(*args, **kwargs)
+        _tracker.record(self._stage, time.monotonic() - start)
+        return result
+
+    async def _race(self, remaining: Optional[float], args: tuple, kwargs: dict) -> Any:
+        config = get_config()
+        started = time.monotonic()
+        deadline_at = None if remaining is None else started + remaining
+        primary = asyncio.ensure_future(self._timed(self._primary, args, kwargs))
+        tasks = {primary}
+        pending = set(tasks)
+        last_error: Optional[BaseException] = None
+
+        hedge_after = None
+        if self._hedge is not None:
+            hedge_after = _tracker.quantile(self._stage, config.hedge_quantile, config.hedge_min_samples)
+
+        try:
+            while pending:
+                now = time.monotonic()
+                timeout = None if deadline_at is None else deadline_at - now
+                hedge_pending = hedge_after is not None and len(tasks) == 1
+                if hedge_pending:
+                    hedge_in = started + hedge_after - now
+                    timeout = hedge_in if timeout is None else min(timeout, hedge_in)
+
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(timeout, 0) if timeout is not None else None,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            _count("hedge_wins")
+                        return task.result()
+                    last_error = task.exception()
+
+                if deadline_at is not None and time.monotonic() >= deadline_at:
+                    _count("timeouts")
+                    raise TimeoutError(f"Prazo da etapa '{self._stage}' excedido ({self._deadline:g}s)")
+
+                # Principal lenta (ou com erro): dispara a duplicata no LLM alternativo
+                if hedge_pending and (pending or last_error is not None):
+                    _count("hedged")
+                    hedge = asyncio.ensure_future(self._timed(self._hedge, args, kwargs))
+                    tasks.add(hedge)
+                    pending.add(hedge)
+
+            raise last_error
+        finally:
+            # Cancela a perdedora: a requisição HTTP em andamento é abortada
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None,
+             from_task=None, from_agent=None, response_model=None):
+        _count("calls")
+        remaining = self._remaining()
+        args = (messages,)
+        kwargs = dict(tools=tools, callbacks=callbacks, available_functions=available_functions,
+                      from_task=from_task, from_agent=from_agent, response_model=response_model)
+        future = asyncio.run_coroutine_threadsafe(self._race(remaining, args, kwargs), _get_loop())
+        try:
+            return future.result()
+        except BaseException:
+            future.cancel()
+            raise
+
+    def supports_stop_words(self) -> bool:
+        return self._primary.supports_stop_words()
+
+    # Capacidades consultadas pelo CrewAI (ex: tool calling nativo do Pesquisador)
+    # seguem as do LLM envolvido; BaseLLM não define supports_function_calling
+    def supports_function_calling(self) -> bool:
+        probe = getattr(self._primary, "supports_function_calling", None)
+        return bool(probe and probe())
+
+    def supports_multimodal(self) -> bool:
+        return self._primary.supports_multimodal()
+
+    def get_context_window_size(self) -> int:
+        return self._primary.get_context_window_size()
+
+
+def create_stage_llm(
+    llm: BaseLLM,
+    stage: str,
+    model_name: Optional[str] = None,
+    hedge: bool = False,
+    session: Optional[SessionContext] = None
+) -> BaseLLM:
+    """
+    Envolve o LLM de uma etapa com o prazo configurado (e hedging, se pedido).
+
+    Args:
+        llm: LLM base da execução
+        stage: Etapa do pipeline ("classify", "enrich" ou "report")
+        model_name: Modelo da execução (usado para criar o LLM alternativo)
+        hedge: Se True e hedge_enabled, permite requisições duplicadas
+        session: SessionContext da execução (credenciais do LLM alternativo)
+
+    Returns:
+        StageLLM novo (o prazo vale por execução) ou o próprio llm se não houver prazo nem hedging
+    """
+    from src.agents import get_llm
+    from src.providers import get_router
+
+    config = get_config()
+    session = session or DEFAULT_SESSION
+    deadline = getattr(config, f"{stage}_deadline", 0.0)
+    hedge_llm = None
+    if hedge and config.hedge_enabled:
+        primary_model = session.resolve_model(model_name)
+        hedge_model = config.hedge_model or primary_model
+        if hedge_model != primary_model:
+            hedge_llm = get_llm(model_name=hedge_model, session=session)
+        elif len(get_router(session.resolve_groq_key()).endpoints) > 1:
+            # Mesmo modelo: a duplicata só vale em outra chave/endpoint, nunca
+            # no que já atende a chamada principal
+            hedge_llm = get_llm(model_name=hedge_model, session=session, idle_only=True)
+        # Uma única chave e o mesmo modelo: duplicar só dobraria custo e rate limit
+
+    if not deadline and hedge_llm is None:
+        return llm
+    return StageLLM(llm, stage, deadline, hedge=hedge_llm)
@@ -0,0 +1,234 @@
+"""
+Fila de jobs persistente (SQLite) para execuções do VerbaFlow.
+A interface submete um job e acompanha suas etapas; workers independentes
+(src/worker.py) consomem a fila e gravam o execution_record final.
+"""
+import json
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+from src.config import get_config
+
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    stage TEXT,
+    payload TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    worker_id TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    heartbeat_at REAL,
+    finished_at REAL,
+    attempts INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at);
+"""
+
+
+class JobQueue:
+    """
+    Fila de jobs persistente baseada em SQLite (modo WAL).
+
+    Cada operação abre sua própria conexão, então a mesma instância pode ser
+    usada por várias threads e o arquivo pode ser compartilhado entre processos.
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or get_config().job_db_path
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            # Bancos criados antes do limite de tentativas
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "attempts" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+
+    @contextmanager
+    def _connect(self):
+        # Autocommit: transações explícitas apenas onde é preciso atomicidade
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def submit(self, payload: dict) -> str:
+        """
+        Enfileira um novo job.
+
+        Args:
+            payload: Parâmetros da execução (serializáveis em JSON)
+
+        Returns:
+            ID do job
+        """
+        job_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, stage, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, JOB_QUEUED, "⏳ Aguardando worker...", json.dumps(payload), time.time())
+            )
+        return job_id
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """
+        Retorna o estado atual de um job.
+
+        Args:
+            job_id: ID do job
+
+        Returns:
+            Dicionário com status, stage, payload, result e error, ou None se não existir
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def claim(self, worker_id: str) -> Optional[dict]:
+        """
+        Reserva atomicamente o job mais antigo da fila.
+
+        Args:
+            worker_id: Identificador do worker
+
+        Returns:
+            Job reservado ou None se a fila estiver vazia
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1",
+                    (JOB_QUEUED,)
+                ).fetchone()
+                if row is not None:
+                    now = time.time()
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, worker_id = ?, started_at = ?, heartbeat_at = ?, "
+                        "attempts = attempts + 1 WHERE id = ?",
+                        (JOB_RUNNING, worker_id, now, now, row["id"])
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+        if row is None:
+            return None
+
+        job = self._row_to_job(row)
+        job["status"] = JOB_RUNNING
+        job["worker_id"] = worker_id
+        job["attempts"] += 1
+        return job
+
+    # As escritas de um worker só valem enquanto ele é o dono do job: depois de
+    # reenfileirado, o job pertence ao worker que o reservou de novo
+
+    def heartbeat(self, job_id: str, worker_id: str) -> bool:
+        """
+        Renova o heartbeat de um job em execução.
+
+        Returns:
+            False se o job não pertence mais a este worker (reenfileirado)
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND worker_id = ? AND status = ?",
+                (time.time(), job_id, worker_id, JOB_RUNNING)
+            )
+            return cursor.rowcount > 0
+
+    def update_stage(self, job_id: str, worker_id: str, stage: str):
+        """Registra a etapa atual do job (também serve de heartbeat)."""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET stage = ?, heartbeat_at = ? WHERE id = ? AND worker_id = ? AND status = ?",
+                (stage, time.time(), job_id, worker_id, JOB_RUNNING)
+            )
+
+    def complete(self, job_id: str, worker_id: str, result: dict) -> bool:
+        """
+        Marca o job como concluído e grava o execution_record.
+
+        Returns:
+            False se o job não pertence mais a este worker (resultado descartado)
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, stage = ?, result = ?, finished_at = ? "
+                "WHERE id = ? AND worker_id = ? AND status = ?",
+                (JOB_DONE, "✅ Análise completa!", json.dumps(result), time.time(), job_id, worker_id, JOB_RUNNING)
+            )
+            return cursor.rowcount > 0
+
+    def fail(self, job_id: str, worker_id: str, error: str) -> bool:
+        """
+        Marca o job como falho.
+
+        Returns:
+            False se o job não pertence mais a este worker
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ? AND worker_id = ? AND status = ?",
+                (JOB_FAILED, error, time.time(), job_id, worker_id, JOB_RUNNING)
+            )
+            return cursor.rowcount > 0
+
+    def requeue_stale(self, timeout: Optional[float] = None, max_attempts: Optional[int] = None) -> int:
+        """
+        Devolve à fila jobs cujo worker parou de enviar heartbeat. Jobs que já
+        esgotaram as tentativas (ex: derrubam o worker) são marcados como falhos.
+
+        Args:
+            timeout: Segundos sem heartbeat para considerar o worker morto
+            max_attempts: Execuções máximas de um job (padrão: job_max_attempts)
+
+        Returns:
+            Número de jobs reenfileirados
+        """
+        config = get_config()
+        timeout = timeout if timeout is not None else config.job_stale_timeout
+        max_attempts = max_attempts if max_attempts is not None else config.job_max_attempts
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, worker_id = NULL, error = ?, finished_at = ? "
+                    "WHERE status = ? AND heartbeat_at < ? AND attempts >= ?",
+                    (JOB_FAILED, f"Worker interrompido em {max_attempts} tentativas", now,
+                     JOB_RUNNING, now - timeout, max_attempts)
+                )
+                cursor = conn.execute(
+                    "UPDATE jobs SET status = ?, worker_id = NULL, stage = ? WHERE status = ? AND heartbeat_at < ?",
+                    (JOB_QUEUED, "⏳ Reenfileirado após falha do worker...", JOB_RUNNING, now - timeout)
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            return cursor.rowcount
+
+    @staticmethod
+    def _row_to_job(row: sqlite3.Row) -> dict:
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
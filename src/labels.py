@@ -0,0 +1,164 @@
+"""
+Conjuntos de rótulos (label sets) plugáveis para a classificação.
+Cada fonte de dados declara suas categorias; prompts e parsing listam apenas
+os rótulos relevantes.
+"""
+import os
+import threading
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+from src.config import get_config
+from src.utils import load_custom_csv
+
+
+class LabelSet(BaseModel):
+    """Conjunto de categorias válidas para uma fonte de dados."""
+    name: str = Field(description="Identificador (nome registrado ou caminho do CSV)")
+    labels: List[str] = Field(description="Categorias válidas, na ordem canônica")
+    groups: Dict[str, List[str]] = Field(
+        default_factory=dict,
+        description="Agrupamento opcional das categorias para exibição no prompt"
+    )
+    domain: str = Field(
+        default="",
+        description="Descrição curta do domínio dos textos (usada nos prompts)"
+    )
+
+    def prompt_listing(self) -> str:
+        """Lista as categorias para inclusão em prompts (agrupadas, se houver grupos)."""
+        if self.groups:
+            return "\n".join(
+                f"**{group}:** {', '.join(labels)}" for group, labels in self.groups.items()
+            )
+        return ", ".join(self.labels)
+
+    def normalize(self, category: str) -> Optional[str]:
+        """
+        Mapeia uma categoria (case-insensitive) para a forma canônica.
+
+        Args:
+            category: Categoria retornada pelo modelo
+
+        Returns:
+            Categoria canônica ou None se não pertencer ao conjunto
+        """
+        lookup = category.strip().lower()
+        for label in self.labels:
+            if label.lower() == lookup:
+                return label
+        return None
+
+
+NEWSGROUPS_LABEL_SET = LabelSet(
+    name="20newsgroups",
+    labels=[
+        'alt.atheism', 'comp.graphics', 'comp.os.ms-windows.misc',
+        'comp.sys.ibm.pc.hardware', 'comp.sys.mac.hardware', 'comp.windows.x',
+        'misc.forsale', 'rec.autos', 'rec.motorcycles',
+        'rec.sport.baseball', 'rec.sport.hockey', 'sci.crypt',
+        'sci.electronics', 'sci.med', 'sci.space',
+        'soc.religion.christian', 'talk.politics.guns',
+        'talk.politics.mideast', 'talk.politics.misc', 'talk.religion.misc'
+    ],
+    groups={
+        "Computação": ['comp.graphics', 'comp.os.ms-windows.misc', 'comp.sys.ibm.pc.hardware',
+                       'comp.sys.mac.hardware', 'comp.windows.x'],
+        "Ciência": ['sci.crypt', 'sci.electronics', 'sci.med', 'sci.space'],
+        "Recreação": ['rec.autos', 'rec.motorcycles', 'rec.sport.baseball', 'rec.sport.hockey'],
+        "Religião/Sociedade": ['alt.atheism', 'soc.religion.christian', 'talk.religion.misc'],
+        "Política": ['talk.politics.guns', 'talk.politics.mideast', 'talk.politics.misc'],
+        "Diversos": ['misc.forsale'],
+    },
+    domain="posts de newsgroups da Usenet em inglês (anos 90)"
+)
+
+DEFAULT_CSV_PATH = "data/raw/Base_dados_textos_6_classes.csv"
+
+_csv_label_sets: Dict[str, LabelSet] = {}
+_csv_lock = threading.Lock()
+
+
+def load_csv_label_set(
+    csv_path: str = DEFAULT_CSV_PATH,
+    category_col: str = "Categoria",
+    code_col: str = "Classe"
+) -> LabelSet:
+    """
+    Lê as categorias de um CSV com uma coluna de código (ex: 'Classe') e uma de nome (ex: 'Categoria').
+
+    Args:
+        csv_path: Caminho do CSV
+        category_col: Coluna com o nome da categoria
+        code_col: Coluna com o código numérico da classe (opcional no arquivo)
+
+    Returns:
+        LabelSet com as categorias ordenadas pelo código da classe
+
+    Raises:
+        ValueError: Se o CSV não tiver a coluna de categoria
+    """
+    with _csv_lock:
+        if csv_path in _csv_label_sets:
+            return _csv_label_sets[csv_path]
+
+        df = load_custom_csv(csv_path)
+        if category_col not in df.columns:
+            raise ValueError(f"Coluna '{category_col}' não encontrada em {csv_path}")
+
+        if code_col in df.columns and code_col != category_col:
+            pairs = df[[code_col, category_col]].drop_duplicates().sort_values(code_col)
+            labels = list(dict.fromkeys(str(label) for label in pairs[category_col]))
+        else:
+            labels = sorted(str(label) for label in df[category_col].dropna().unique())
+
+        label_set = LabelSet(
+            name=csv_path,
+            labels=labels,
+            domain="textos jornalísticos em português brasileiro (pt-BR)"
+        )
+        _csv_label_sets[csv_path] = label_set
+        return label_set
+
+
+def _csv_label_set_paths() -> Dict[str, str]:
+    """CSVs do diretório de label sets, pelo caminho relativo e pelo nome do arquivo."""
+    directory = get_config().label_set_dir
+    try:
+        filenames = sorted(os.listdir(directory))
+    except OSError:
+        return {}
+    paths = {}
+    for filename in filenames:
+        if filename.lower().endswith(".csv"):
+            path = os.path.join(directory, filename)
+            paths[path] = path
+            paths[filename] = path
+    return paths
+
+
+def get_label_set(name: Optional[str] = None) -> LabelSet:
+    """
+    Resolve um label set pelo nome registrado ou por um CSV do diretório de
+    label sets (label_set_dir). O nome vem de requisições externas (API,
+    payload de jobs): só é comparado com os arquivos listados no diretório,
+    nunca usado como caminho.
+
+    Args:
+        name: "20newsgroups" (padrão), nome de um CSV de label_set_dir (ex:
+            "Base_dados_textos_6_classes.csv") ou o caminho relativo dele
+            (ex: "data/raw/Base_dados_textos_6_classes.csv")
+
+    Returns:
+        LabelSet correspondente
+
+    Raises:
+        ValueError: Se o nome não for reconhecido
+    """
+    if not name or name == NEWSGROUPS_LABEL_SET.name:
+        return NEWSGROUPS_LABEL_SET
+    path = _csv_label_set_paths().get(name)
+    if path is None:
+        raise ValueError(f"Label set '{name}' não encontrado")
+    return load_csv_label_set(path)
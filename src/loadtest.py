@@ -0,0 +1,907 @@
+"""
+Teste de carga do app Streamlit com sessões simultâneas.
+
+Sobe um `streamlit run app.py` apontado para um backend simulado local (API
+OpenAI-compatível via GROQ_BASE_URL e busca do Tavily via TAVILY_BASE_URL,
+com latência configurável) e conduz N sessões headless pelo mesmo protocolo
+do navegador (websocket + protobuf). Cada sessão repete fluxos realistas
+(carregar amostras, selecionar, executar, abrir o histórico) e, para cada
+nível de concorrência, o relatório mostra CPU e RSS do servidor (total e por
+sessão), latência dos reruns e execuções concluídas por minuto.
+
+Uso:
+    python -m src.loadtest run --concurrency 1,2,4,8 --duration 60
+    python -m src.loadtest run --url http://host:8501 --server-pid 1234
+    python -m src.loadtest mock --port 8765
+"""
+import argparse
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import zlib
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import requests
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+
+APP_ROOT = Path(__file__).resolve().parent.parent
+
+# Resposta final no formato ReAct (aceita também como texto simples)
+FINAL_ANSWER_PREFIX = "Thought: I now can give a great answer\nFinal Answer: "
+
+# Widgets cujo rótulo identifica a ação do fluxo
+WIDGET_TYPES = ("button", "selectbox", "radio", "text_input", "checkbox")
+
+SOURCE_RADIO = "Selecione a fonte de dados:"
+NEWSGROUPS_SOURCE = "20 Newsgroups (Amostras)"
+CSV_SOURCE = "CSV Customizado (6 Classes)"
+RUN_BUTTON = "🚀 Executar VerbaFlow"
+HISTORY_BUTTON = "Ver detalhes completos"
+RUN_DONE_MARKERS = ("Classificação Correta", "Classificação Incorreta")
+
+
+# ---------------------------------------------------------------------------
+# Backend simulado (LLM OpenAI-compatível + busca do Tavily)
+# ---------------------------------------------------------------------------
+
+def _labels(prompt: str) -> List[str]:
+    """Categorias listadas no prompt da task (schema completo, compacto ou lote)."""
+    match = (re.search(r"CATEGORIAS VÁLIDAS[^\n]*\n\s*([^\n]+)", prompt)
+             or re.search(r"categorias(?: válidas)?:\s*\n\s*([^\n]+)", prompt, re.IGNORECASE))
+    if not match:
+        return []
+    return [label.strip() for label in match.group(1).split(",") if label.strip()]
+
+
+def _pick(options: List[str], seed: str) -> str:
+    # Determinístico por texto: o mesmo documento recebe sempre a mesma categoria
+    return options[zlib.crc32(seed.encode("utf-8")) % len(options)] if options else "unknown"
+
+
+def mock_reply(prompt: str) -> str:
+    """
+    Monta a resposta simulada de acordo com a etapa identificada no prompt.
+
+    Args:
+        prompt: Conteúdo das mensagens do usuário
+
+    Returns:
+        Texto da resposta (classificação, lote, pesquisa ou relatório)
+    """
+    category = _pick(_labels(prompt), prompt)
+
+    if "full_report_markdown" in prompt:
+        content = json.dumps({
+            "executive_summary": f"Texto classificado como {category} com base nas entidades identificadas.",
+            "classification_analysis": {
+                "category": category,
+                "methodology": "Análise de entidades, raciocínio contextual, hipóteses e conclusão.",
+                "confidence": "alta",
+                "justification": "Termos característicos da categoria."
+            },
+            "web_context": {
+                "historical_evolution": "Tópico discutido desde os anos 90.",
+                "current_relevance": "Segue relevante.",
+                "key_findings": ["Descoberta simulada 1", "Descoberta simulada 2"]
+            },
+            "conclusions": {
+                "summary": "Classificação consistente.",
+                "implications": "Nenhuma.",
+                "value": "Contexto adicional para o leitor."
+            },
+            "full_report_markdown": (
+                "# Relatório de Classificação e Enriquecimento\n## 1. Resumo Executivo\n"
+                f"Categoria: {category}\n## 2. Análise de Classificação\nSimulada.\n"
+                "## 3. Contexto e Enriquecimento Web\nSimulado.\n## 4. Conclusões\nSimuladas."
+            )
+        }, ensure_ascii=False)
+    elif "Lista JSON com" in prompt:
+        labels = _labels(prompt)
+        count = int(re.search(r"Lista JSON com (\d+)", prompt).group(1))
+        content = json.dumps([
+            {"id": i, "final_category": _pick(labels, f"{prompt}{i}"), "confidence": "alta"}
+            for i in range(count)
+        ], ensure_ascii=False)
+    elif "PESQUISA WEB" in prompt:
+        content = json.dumps({
+            "historical_context": "Tópico ativo nos anos 90.",
+            "evolution": "Ampliado desde então.",
+            "current_relevance": "Segue em discussão.",
+            "key_findings": ["Descoberta simulada 1", "Descoberta simulada 2"],
+            "sources_summary": "Resultados simulados da busca."
+        }, ensure_ascii=False)
+    elif '"cat"' in prompt:
+        content = json.dumps({
+            "cat": category, "conf": "A", "cands": [category], "ents": ["entidade"], "why": "Termos característicos."
+        }, ensure_ascii=False)
+    else:
+        decision = {"final_category": category, "confidence": "alta"}
+        reasoning = {
+            "entity_analysis": {"organizations": [], "technical_terms": ["termo"], "knowledge_domains": ["domínio"]},
+            "contextual_reasoning": "Termos característicos da categoria.",
+            "candidate_categories": [category],
+            "exclusion_reasoning": "Demais categorias sem evidências.",
+            "reasoning_steps": [
+                {"step_number": 1, "step_name": "Análise", "reasoning": "Entidades."},
+                {"step_number": 2, "step_name": "Raciocínio", "reasoning": "Contexto."},
+                {"step_number": 3, "step_name": "Hipótese", "reasoning": "Candidatas."},
+                {"step_number": 4, "step_name": "Conclusão", "reasoning": "Decisão."}
+            ]
+        }
+        # Mesma ordem de campos pedida no prompt (decisão primeiro no streaming)
+        decision_first = prompt.find('"final_category"') < prompt.find('"entity_analysis"')
+        ordered = {**decision, **reasoning} if decision_first else {**reasoning, **decision}
+        content = json.dumps(ordered, ensure_ascii=False)
+    return FINAL_ANSWER_PREFIX + content
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    backend: "MockBackend" = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _json(self, payload: dict, status: int = 200):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._json({"status": "ok", "requests": dict(self.backend.requests)})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if self.path.endswith("/chat/completions"):
+            self.backend.count("chat")
+            self._chat(body)
+        elif self.path.endswith("/search"):
+            self.backend.count("search")
+            time.sleep(self.backend.search_latency)
+            self._json({
+                "query": body.get("query", ""),
+                "results": [
+                    {
+                        "title": f"Resultado simulado {i + 1}",
+                        "url": f"https://example.com/{i + 1}",
+                        "content": f"Conteúdo simulado sobre {body.get('query', '')}.",
+                        "score": round(0.9 - i * 0.1, 2)
+                    }
+                    for i in range(min(int(body.get("max_results") or 5), 5))
+                ],
+                "response_time": self.backend.search_latency
+            })
+        else:
+            self._json({"error": "not found"}, status=404)
+
+    def _chat(self, body: dict):
+        messages = body.get("messages") or []
+        prompt = "\n".join(str(m.get("content") or "") for m in messages if m.get("role") == "user")
+        model = body.get("model", "mock")
+        time.sleep(self.backend.latency)
+
+        tool_call = None
+        logprobs = None
+        if body.get("tools") and not any(m.get("role") == "tool" for m in messages):
+            # Primeira chamada do Pesquisador: pede a busca
+            self.backend.count("tool_call")
+            tool_call = {
+                "id": f"call_{zlib.crc32(prompt.encode('utf-8')):x}",
+                "type": "function",
+                "function": {
+                    "name": body["tools"][0]["function"]["name"],
+                    "arguments": json.dumps({"query": "evolução do tópico desde os anos 90"})
+                }
+            }
+            content = None
+        elif "Letra da categoria" in prompt:
+            codes = re.findall(r"^([A-Z]): ", prompt, re.MULTILINE) or ["A"]
+            content = _pick(codes, prompt)
+            if body.get("logprobs"):
+                top = [{"token": content, "logprob": -0.05, "bytes": None}] + [
+                    {"token": code, "logprob": -4.0, "bytes": None} for code in codes if code != content
+                ][:max(int(body.get("top_logprobs") or 5) - 1, 0)]
+                logprobs = {"content": [{"token": content, "logprob": -0.05, "bytes": None, "top_logprobs": top}]}
+        else:
+            content = mock_reply(prompt)
+
+        if body.get("stream"):
+            self._stream(model, content, tool_call)
+            return
+
+        message = {"role": "assistant", "content": content}
+        if tool_call:
+            message["tool_calls"] = [tool_call]
+        tokens = len(content or "") // 4
+        self._json({
+            "id": "chatcmpl-mock",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": message,
+                "logprobs": logprobs,
+                "finish_reason": "tool_calls" if tool_call else "stop"
+            }],
+            "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": tokens,
+                      "total_tokens": len(prompt) // 4 + tokens}
+        })
+
+    def _stream(self, model: str, content: Optional[str], tool_call: Optional[dict]):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def chunk(delta: dict, finish_reason: Optional[str] = None) -> bytes:
+            payload = {
+                "id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            }
+            return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8")
+
+        try:
+            if tool_call:
+                self.wfile.write(chunk({"role": "assistant", "tool_calls": [{"index": 0, **tool_call}]}))
+                self.wfile.write(chunk({}, "tool_calls"))
+            else:
+                for start in range(0, len(content), 16):
+                    self.wfile.write(chunk({"content": content[start:start + 16]}))
+                    self.wfile.flush()
+                    time.sleep(self.backend.chunk_delay)
+                self.wfile.write(chunk({}, "stop"))
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # Cliente fechou o stream (resultado antecipado)
+            pass
+
+
+class MockBackend:
+    """Servidor HTTP local que simula a API do Groq (OpenAI-compatível) e a busca do Tavily."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.5,
+        search_latency: float = 0.3,
+        chunk_delay: float = 0.01
+    ):
+        self.latency = latency
+        self.search_latency = search_latency
+        self.chunk_delay = chunk_delay
+        self.requests: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        handler = type("MockHandler", (_MockHandler,), {"backend": self})
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="verbaflow-mock", daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, kind: str):
+        with self._lock:
+            self.requests[kind] = self.requests.get(kind, 0) + 1
+
+    def start(self) -> "MockBackend":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+# ---------------------------------------------------------------------------
+# Servidor do app e monitoramento
+# ---------------------------------------------------------------------------
+
+def start_app(
+    mock_url: str,
+    port: int,
+    extra_env: Optional[Dict[str, str]] = None,
+    log_path: Optional[str] = None
+) -> subprocess.Popen:
+    """
+    Inicia `streamlit run app.py` apontado para o backend simulado.
+
+    Args:
+        mock_url: URL do MockBackend
+        port: Porta do servidor Streamlit
+        extra_env: Variáveis adicionais (sobrescrevem as padrão do teste)
+        log_path: Arquivo para a saída do servidor (None descarta)
+
+    Returns:
+        Processo do servidor
+    """
+    env = dict(
+        os.environ,
+        GROQ_API_KEY="mock",
+        GROQ_API_KEYS="",
+        LLM_ENDPOINTS="[]",
+        GROQ_BASE_URL=f"{mock_url}/v1",
+        TAVILY_API_KEY="mock",
+        TAVILY_BASE_URL=mock_url,
+        CASSETTE_MODE="off",
+        # Textos repetidos entre sessões não devem cair no atalho de duplicatas nem no cache de etapas
+        NEAR_DUPLICATE_ENABLED="false",
+        STAGE_CACHE_ENABLED="false"
+    )
+    env.update(extra_env or {})
+    output = open(log_path, "ab") if log_path else subprocess.DEVNULL
+    return subprocess.Popen(
+        [
+            sys.executable, "-m", "streamlit", "run", "app.py",
+            "--server.headless", "true",
+            "--server.port", str(port),
+            "--server.fileWatcherType", "none",
+            "--browser.gatherUsageStats", "false"
+        ],
+        cwd=str(APP_ROOT),
+        env=env,
+        stdout=output,
+        stderr=subprocess.STDOUT
+    )
+
+
+def wait_for_app(url: str, timeout: float = 120.0):
+    """Aguarda o health check do Streamlit responder."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"{url}/_stcore/health", timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"Servidor Streamlit não respondeu em {timeout:.0f}s: {url}")
+
+
+def _process_usage(pid: int) -> Tuple[float, int]:
+    """CPU acumulada (s) e RSS (bytes) de um processo (psutil ou /proc)."""
+    if PSUTIL_AVAILABLE:
+        process = psutil.Process(pid)
+        times = process.cpu_times()
+        return times.user + times.system, process.memory_info().rss
+
+    with open(f"/proc/{pid}/stat") as f:
+        # Campos após o nome do executável: utime e stime são o 12º e 13º
+        fields = f.read().rsplit(")", 1)[1].split()
+    cpu = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    rss = 0
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                rss = int(line.split()[1]) * 1024
+                break
+    return cpu, rss
+
+
+class ServerMonitor:
+    """Amostra periodicamente CPU e RSS do processo do servidor."""
+
+    def __init__(self, pid: int, interval: float = 0.5):
+        self.pid = pid
+        self.interval = interval
+        self.samples: List[Tuple[float, float, int]] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="verbaflow-loadtest-monitor", daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                cpu, rss = _process_usage(self.pid)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Monitoramento do servidor interrompido: {e}")
+                return
+            self.samples.append((time.monotonic(), cpu, rss))
+            self._stop.wait(self.interval)
+
+    def start(self) -> "ServerMonitor":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def window(self, start: float, end: float) -> Optional[dict]:
+        """CPU média (% de um núcleo) e RSS final/pico entre dois instantes."""
+        points = [sample for sample in self.samples if start <= sample[0] <= end]
+        if len(points) < 2:
+            return None
+        (t0, cpu0, _), (t1, cpu1, rss1) = points[0], points[-1]
+        return {
+            "cpu_percent": round(100 * (cpu1 - cpu0) / (t1 - t0), 1) if t1 > t0 else 0.0,
+            "rss_mb": round(rss1 / 1024 / 1024, 1),
+            "rss_peak_mb": round(max(rss for _, _, rss in points) / 1024 / 1024, 1)
+        }
+
+    def rss_mb(self) -> Optional[float]:
+        return round(self.samples[-1][2] / 1024 / 1024, 1) if self.samples else None
+
+
+# ---------------------------------------------------------------------------
+# Sessão headless (protocolo websocket do Streamlit)
+# ---------------------------------------------------------------------------
+
+class Session:
+    """
+    Sessão do navegador simulada: envia reruns com o estado dos widgets e lê
+    os elementos renderizados até o fim do script.
+    """
+
+    def __init__(self, url: str, timeout: float = 300.0):
+        from websockets.sync.client import connect
+
+        self.timeout = timeout
+        self._stack = ExitStack()
+        self._ws = self._stack.enter_context(connect(
+            re.sub(r"^http", "ws", url.rstrip("/")) + "/_stcore/stream",
+            subprotocols=["streamlit"],
+            max_size=None,
+            open_timeout=timeout
+        ))
+        self.page_script_hash = ""
+        self.values: Dict[str, object] = {}
+        self.widgets: Dict[str, List[Tuple[str, object]]] = {}
+        self.texts: List[str] = []
+        self.errors: List[str] = []
+        self.timings: List[Tuple[str, float]] = []
+
+    def close(self):
+        self._stack.close()
+
+    def rerun(self, action: str, trigger: Optional[str] = None) -> float:
+        """
+        Executa um rerun (como uma interação do usuário) e aguarda o fim do script.
+
+        Args:
+            action: Nome da ação (agrupa as latências no relatório)
+            trigger: ID do botão acionado neste rerun
+
+        Returns:
+            Latência do rerun em segundos
+        """
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        message = BackMsg()
+        state = message.rerun_script
+        state.query_string = ""
+        state.page_script_hash = self.page_script_hash
+        state.widget_states.widgets.extend(self.values.values())
+        if trigger:
+            state.widget_states.widgets.append(WidgetState(id=trigger, trigger_value=True))
+
+        start = time.perf_counter()
+        self._ws.send(message.SerializeToString())
+        widgets: Dict[str, List[Tuple[str, object]]] = {}
+        texts: List[str] = []
+        errors: List[str] = []
+
+        while True:
+            raw = self._ws.recv(timeout=self.timeout)
+            if isinstance(raw, str):
+                continue
+            forward = ForwardMsg()
+            forward.ParseFromString(raw)
+            kind = forward.WhichOneof("type")
+            if kind == "new_session":
+                self.page_script_hash = forward.new_session.page_script_hash
+                # Novo script (inclusive após st.rerun): vale o que ele renderizar
+                widgets, texts = {}, []
+            elif kind == "delta" and forward.delta.WhichOneof("type") == "new_element":
+                self._collect(forward.delta.new_element, widgets, texts, errors)
+            elif kind == "script_finished":
+                if forward.script_finished == ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    continue
+                break
+
+        elapsed = time.perf_counter() - start
+        self.widgets, self.texts = widgets, texts
+        self.errors.extend(errors)
+        # Como o navegador, só mantém o estado dos widgets ainda na tela
+        live = {widget.id for items in widgets.values() for _, widget in items}
+        self.values = {widget_id: value for widget_id, value in self.values.items() if widget_id in live}
+        self.timings.append((action, elapsed))
+        return elapsed
+
+    @staticmethod
+    def _collect(element, widgets: dict, texts: list, errors: list):
+        kind = element.WhichOneof("type")
+        if kind in WIDGET_TYPES:
+            widget = getattr(element, kind)
+            widgets.setdefault(widget.label, []).append((kind, widget))
+        elif kind == "markdown":
+            texts.append(element.markdown.body)
+        elif kind == "alert":
+            texts.append(element.alert.body)
+            if element.alert.format == element.alert.ERROR:
+                errors.append(element.alert.body[:200])
+        elif kind == "exception":
+            errors.append(f"{element.exception.type}: {element.exception.message}"[:200])
+
+    def widget(self, label: str):
+        if label not in self.widgets:
+            raise LookupError(f"Widget não encontrado na tela: {label!r}")
+        return self.widgets[label][0][1]
+
+    def click(self, label: str, action: str) -> float:
+        """Clica no botão com o rótulo informado."""
+        return self.rerun(action, trigger=self.widget(label).id)
+
+    def choose(self, label: str, action: str, option: Optional[str] = None, rng: Optional[random.Random] = None):
+        """
+        Seleciona uma opção de selectbox/radio (aleatória se option for None).
+        Não faz rerun se a opção já estiver selecionada, como no navegador.
+        """
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        widget = self.widget(label)
+        options = list(widget.options)
+        option = option if option is not None else (rng or random).choice(options)
+        current = self.values.get(widget.id)
+        selected = current.string_value if current is not None else options[widget.default]
+        if option == selected:
+            return None
+        self.values[widget.id] = WidgetState(id=widget.id, string_value=option)
+        return self.rerun(action)
+
+    def run_completed(self) -> bool:
+        return any(marker in text for text in self.texts for marker in RUN_DONE_MARKERS)
+
+
+def _run_and_review(session: Session) -> bool:
+    session.click(RUN_BUTTON, "run")
+    completed = session.run_completed()
+    if completed and HISTORY_BUTTON in session.widgets:
+        session.click(HISTORY_BUTTON, "history")
+    return completed
+
+
+def newsgroups_flow(session: Session, rng: random.Random) -> bool:
+    """Carregar amostras → selecionar uma → executar → abrir o histórico."""
+    session.choose(SOURCE_RADIO, "source", NEWSGROUPS_SOURCE)
+    session.click("🔄 Carregar Amostras Aleatórias", "load")
+    session.choose("Selecione uma amostra:", "select", rng=rng)
+    return _run_and_review(session)
+
+
+def csv_flow(session: Session, rng: random.Random) -> bool:
+    """Fonte CSV → selecionar um registro → executar → abrir o histórico."""
+    session.choose(SOURCE_RADIO, "source", CSV_SOURCE)
+    session.choose("Selecione um registro:", "select", rng=rng)
+    return _run_and_review(session)
+
+
+FLOWS: Dict[str, Callable[[Session, random.Random], bool]] = {
+    "newsgroups": newsgroups_flow,
+    "csv": csv_flow
+}
+
+
+# ---------------------------------------------------------------------------
+# Rampa de concorrência
+# ---------------------------------------------------------------------------
+
+@dataclass
+class SessionResult:
+    runs: int = 0
+    failed_runs: int = 0
+    timings: List[Tuple[str, float]] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+
+
+def _session_worker(
+    url: str,
+    flows: List[str],
+    deadline: float,
+    result: SessionResult,
+    seed: int,
+    think_time: float,
+    timeout: float
+):
+    rng = random.Random(seed)
+    session = None
+    iteration = seed
+    while time.monotonic() < deadline:
+        try:
+            if session is None:
+                session = Session(url, timeout)
+                session.rerun("open")
+            flow = flows[iteration % len(flows)]
+            iteration += 1
+            if FLOWS[flow](session, rng):
+                result.runs += 1
+            else:
+                result.failed_runs += 1
+        except Exception as e:
+            result.failed_runs += 1
+            result.errors.append(f"{type(e).__name__}: {e}"[:200])
+            if session is not None:
+                result.timings.extend(session.timings)
+                result.errors.extend(session.errors)
+                session.close()
+            # Reconecta (nova sessão), como um usuário que recarrega a página
+            session = None
+            time.sleep(1.0)
+            continue
+        time.sleep(rng.uniform(0, 2 * think_time))
+
+    if session is not None:
+        result.timings.extend(session.timings)
+        result.errors.extend(session.errors)
+        session.close()
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    if len(values) == 1:
+        return round(values[0], 3)
+    return round(statistics.quantiles(values, n=100, method="inclusive")[int(q) - 1], 3)
+
+
+def run_stage(
+    url: str,
+    concurrency: int,
+    duration: float,
+    flows: List[str],
+    monitor: Optional[ServerMonitor] = None,
+    think_time: float = 1.0,
+    timeout: float = 300.0
+) -> dict:
+    """
+    Executa um nível da rampa: N sessões simultâneas durante `duration` segundos.
+
+    RSS por sessão = (RSS ao fim do nível - RSS antes do nível) / N, com as
+    sessões ainda abertas (estado e históricos retidos pelo servidor).
+
+    Returns:
+        Métricas do nível (latências, execuções/min, CPU, RSS e erros)
+    """
+    rss_before = monitor.rss_mb() if monitor else None
+    results = [SessionResult() for _ in range(concurrency)]
+    start = time.monotonic()
+    deadline = start + duration
+    threads = [
+        threading.Thread(
+            target=_session_worker,
+            args=(url, flows, deadline, results[i], i, think_time, timeout),
+            name=f"verbaflow-loadtest-{i}",
+            daemon=True
+        )
+        for i in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+
+    timings = [timing for result in results for timing in result.timings]
+    runs = [seconds for action, seconds in timings if action == "run"]
+    reruns = [seconds for action, seconds in timings if action not in ("run", "open")]
+    completed = sum(result.runs for result in results)
+    errors = [error for result in results for error in result.errors]
+
+    stage = {
+        "concurrency": concurrency,
+        "elapsed": round(elapsed, 1),
+        "runs_completed": completed,
+        "runs_failed": sum(result.failed_runs for result in results),
+        "runs_per_minute": round(completed / elapsed * 60, 2),
+        "rerun_p50": _percentile(reruns, 50),
+        "rerun_p95": _percentile(reruns, 95),
+        "run_p50": _percentile(runs, 50),
+        "run_p95": _percentile(runs, 95),
+        "latency_by_action": {
+            action: {"count": len(values), "p50": _percentile(values, 50), "p95": _percentile(values, 95)}
+            for action in sorted({action for action, _ in timings})
+            for values in [[seconds for name, seconds in timings if name == action]]
+        },
+        "errors": len(errors),
+        "error_samples": sorted(set(errors))[:5]
+    }
+    if monitor:
+        usage = monitor.window(start, time.monotonic())
+        if usage:
+            stage.update(usage)
+            if rss_before is not None:
+                stage["rss_per_session_mb"] = round((usage["rss_mb"] - rss_before) / concurrency, 1)
+    return stage
+
+
+def _fmt(value, suffix: str = "") -> str:
+    return "-" if value is None else f"{value}{suffix}"
+
+
+def print_report(report: dict):
+    """Imprime a tabela por nível de concorrência."""
+    header = f"{'sessões':>7} {'CPU %':>7} {'RSS MB':>8} {'RSS/sess':>8} {'rerun p50':>9} {'rerun p95':>9} " \
+             f"{'exec p50':>8} {'exec p95':>8} {'exec/min':>8} {'erros':>5}"
+    print(header)
+    print("-" * len(header))
+    for stage in report["stages"]:
+        print(
+            f"{stage['concurrency']:>7} {_fmt(stage.get('cpu_percent')):>7} {_fmt(stage.get('rss_mb')):>8} "
+            f"{_fmt(stage.get('rss_per_session_mb')):>8} {_fmt(stage['rerun_p50'], 's'):>9} "
+            f"{_fmt(stage['rerun_p95'], 's'):>9} {_fmt(stage['run_p50'], 's'):>8} {_fmt(stage['run_p95'], 's'):>8} "
+            f"{stage['runs_per_minute']:>8} {stage['errors']:>5}"
+        )
+        for error in stage["error_samples"]:
+            print(f"        ⚠️ {error}")
+
+    best = max(report["stages"], key=lambda stage: stage["runs_per_minute"], default=None)
+    if best and best["runs_per_minute"]:
+        print(f"\nVazão máxima: {best['runs_per_minute']} execuções/min com {best['concurrency']} sessões")
+
+
+def run_load_test(
+    concurrency: List[int],
+    duration: float,
+    flows: List[str],
+    url: Optional[str] = None,
+    server_pid: Optional[int] = None,
+    port: int = 8599,
+    latency: float = 0.5,
+    search_latency: float = 0.3,
+    think_time: float = 1.0,
+    timeout: float = 300.0,
+    extra_env: Optional[Dict[str, str]] = None,
+    app_log: Optional[str] = None
+) -> dict:
+    """
+    Executa a rampa de concorrência.
+
+    Sem `url`, sobe o backend simulado e um servidor Streamlit próprio (e os
+    encerra ao final). Com `url`, usa um servidor já rodando (que deve estar
+    apontado para um backend simulado); as métricas do servidor exigem
+    `server_pid`.
+
+    Returns:
+        Relatório com a configuração e as métricas de cada nível
+    """
+    backend = None
+    app = None
+    monitor = None
+    try:
+        if url is None:
+            backend = MockBackend(latency=latency, search_latency=search_latency).start()
+            app = start_app(backend.url, port, extra_env, app_log)
+            url = f"http://127.0.0.1:{port}"
+            server_pid = app.pid
+        wait_for_app(url)
+        if server_pid:
+            monitor = ServerMonitor(server_pid).start()
+
+        # Primeira execução do script paga imports (CrewAI) e caches: fora das medições
+        warmup = Session(url, timeout)
+        startup = warmup.rerun("open")
+        warmup.close()
+        baseline_rss = monitor.rss_mb() if monitor else None
+        print(f"Servidor pronto em {url} (primeiro script: {startup:.1f}s)")
+
+        stages = []
+        for level in concurrency:
+            print(f"→ {level} sessões por {duration:.0f}s...")
+            stages.append(run_stage(url, level, duration, flows, monitor, think_time, timeout))
+        return {
+            "url": url,
+            "flows": flows,
+            "duration": duration,
+            "think_time": think_time,
+            "mock": {"latency": latency, "search_latency": search_latency,
+                     "requests": dict(backend.requests)} if backend else None,
+            "startup_seconds": round(startup, 2),
+            "baseline_rss_mb": baseline_rss,
+            "stages": stages
+        }
+    finally:
+        if monitor:
+            monitor.stop()
+        if app:
+            app.terminate()
+            try:
+                app.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                app.kill()
+        if backend:
+            backend.stop()
+
+
+def main():
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Teste de carga do app Streamlit do VerbaFlow")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Rampa de sessões simultâneas")
+    run_parser.add_argument("--concurrency", default="1,2,4,8", help="Níveis de sessões simultâneas (ex: 1,2,4,8)")
+    run_parser.add_argument("--duration", type=float, default=60.0, help="Segundos por nível")
+    run_parser.add_argument("--flows", default="newsgroups,csv", help=f"Fluxos alternados: {', '.join(FLOWS)}")
+    run_parser.add_argument("--url", default=None, help="Usar um servidor já rodando (padrão: sobe um próprio)")
+    run_parser.add_argument("--server-pid", type=int, default=None, help="PID do servidor (métricas com --url)")
+    run_parser.add_argument("--port", type=int, default=8599, help="Porta do servidor próprio")
+    run_parser.add_argument("--latency", type=float, default=0.5, help="Latência simulada do LLM (s)")
+    run_parser.add_argument("--search-latency", type=float, default=0.3, help="Latência simulada da busca (s)")
+    run_parser.add_argument("--think-time", type=float, default=1.0, help="Pausa média entre fluxos (s)")
+    run_parser.add_argument("--timeout", type=float, default=300.0, help="Tempo máximo de um rerun (s)")
+    run_parser.add_argument("--env", action="append", default=[], help="KEY=VALUE extra para o servidor próprio")
+    run_parser.add_argument("--app-log", default=None, help="Arquivo para a saída do servidor próprio")
+    run_parser.add_argument("--output", default=None, help="Gravar o relatório JSON neste arquivo")
+
+    mock_parser = subparsers.add_parser("mock", help="Apenas o backend simulado (LLM + busca)")
+    mock_parser.add_argument("--port", type=int, default=8765)
+    mock_parser.add_argument("--latency", type=float, default=0.5)
+    mock_parser.add_argument("--search-latency", type=float, default=0.3)
+
+    args = parser.parse_args()
+
+    if args.command == "mock":
+        backend = MockBackend(port=args.port, latency=args.latency, search_latency=args.search_latency).start()
+        print(f"Backend simulado em {backend.url} (GROQ_BASE_URL={backend.url}/v1, TAVILY_BASE_URL={backend.url})")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            backend.stop()
+        return
+
+    flows = [flow.strip() for flow in args.flows.split(",") if flow.strip()]
+    unknown = [flow for flow in flows if flow not in FLOWS]
+    if unknown:
+        parser.error(f"Fluxos desconhecidos: {', '.join(unknown)}")
+
+    report = run_load_test(
+        concurrency=[int(level) for level in args.concurrency.split(",") if level.strip()],
+        duration=args.duration,
+        flows=flows,
+        url=args.url,
+        server_pid=args.server_pid,
+        port=args.port,
+        latency=args.latency,
+        search_latency=args.search_latency,
+        think_time=args.think_time,
+        timeout=args.timeout,
+        extra_env=dict(item.split("=", 1) for item in args.env),
+        app_log=args.app_log
+    )
+    print()
+    print_report(report)
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"\nRelatório gravado em {args.output}")
+
+
+if __name__ == "__main__":
+    main()
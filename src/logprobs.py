@@ -0,0 +1,179 @@
+"""
+Classificação rápida por logprobs (modo "logprob").
+
+Cada categoria do label set recebe uma letra (A, B, C...) e o modelo responde
+com um único token. As probabilidades das letras no top_logprobs do primeiro
+token formam a distribuição sobre as categorias, sem Chain of Thought. Se o
+endpoint não suportar logprobs, a resposta de uma letra ainda é usada como
+saída restrita (distribuição concentrada na letra escolhida).
+"""
+import math
+import string
+from typing import Dict, List, Optional
+
+from src.cassette import replay_or_record
+from src.config import get_config
+from src.labels import LabelSet, NEWSGROUPS_LABEL_SET
+from src.models import ClassificationOutput
+from src.providers import Endpoint, get_router, openai_client
+from src.session import DEFAULT_SESSION, SessionContext
+
+
+# Endpoints (base_url) que rejeitaram o parâmetro logprobs
+_logprobs_unsupported = set()
+
+
+def label_codes(label_set: LabelSet) -> Dict[str, str]:
+    """
+    Atribui uma letra (token único) a cada categoria.
+
+    Args:
+        label_set: Conjunto de categorias
+
+    Returns:
+        Dicionário letra -> categoria, na ordem canônica do label set
+
+    Raises:
+        ValueError: Se houver mais categorias que letras disponíveis
+    """
+    if len(label_set.labels) > len(string.ascii_uppercase):
+        raise ValueError(f"Modo logprob suporta até {len(string.ascii_uppercase)} categorias")
+    return dict(zip(string.ascii_uppercase, label_set.labels))
+
+
+def build_messages(text: str, label_set: LabelSet, codes: Dict[str, str]) -> List[dict]:
+    """Prompt mínimo: lista de categorias com letras e o texto, pedindo uma única letra."""
+    config = get_config()
+    listing = "\n".join(f"{code}: {label}" for code, label in codes.items())
+    return [
+        {
+            "role": "system",
+            "content": "Você é um classificador de textos. Responda APENAS com a letra da categoria, sem explicação."
+        },
+        {
+            "role": "user",
+            "content": f"Domínio: {label_set.domain or 'textos gerais'}\n"
+                       f"Categorias:\n{listing}\n\n"
+                       f"Texto:\n{text[:config.logprob_max_chars]}\n\n"
+                       f"Letra da categoria:"
+        }
+    ]
+
+
+def _request(endpoint: Endpoint, model: str, messages: List[dict], num_labels: int) -> dict:
+    client = openai_client(endpoint, get_config().classify_deadline or None)
+    params = dict(
+        model=endpoint.model or model,
+        messages=messages,
+        max_tokens=1,
+        temperature=0
+    )
+
+    if endpoint.base_url not in _logprobs_unsupported:
+        try:
+            response = client.chat.completions.create(
+                **params, logprobs=True, top_logprobs=min(max(num_labels, 5), 20)
+            )
+        except Exception as e:
+            # 400 por parâmetro não suportado: lembrar e cair para saída restrita
+            if "logprob" not in str(e).lower():
+                raise
+            print(f"⚠️ Endpoint {endpoint.base_url} não suporta logprobs; usando saída restrita")
+            _logprobs_unsupported.add(endpoint.base_url)
+        else:
+            choice = response.choices[0]
+            top = []
+            if choice.logprobs and choice.logprobs.content:
+                top = [[item.token, item.logprob] for item in choice.logprobs.content[0].top_logprobs]
+            return {"content": choice.message.content or "", "top_logprobs": top}
+
+    response = client.chat.completions.create(**params)
+    return {"content": response.choices[0].message.content or "", "top_logprobs": []}
+
+
+def distribution_from_response(response: dict, codes: Dict[str, str]) -> Dict[str, float]:
+    """
+    Converte a resposta em distribuição de probabilidade sobre as categorias.
+
+    Args:
+        response: {"content", "top_logprobs": [[token, logprob], ...]}
+        codes: Mapeamento letra -> categoria
+
+    Returns:
+        Probabilidades normalizadas por categoria (todas as categorias presentes)
+    """
+    scores = {label: 0.0 for label in codes.values()}
+    for token, logprob in response.get("top_logprobs", []):
+        code = token.strip().upper()
+        if code in codes:
+            # Variações do mesmo token (" A", "A") somam probabilidade
+            scores[codes[code]] += math.exp(logprob)
+
+    total = sum(scores.values())
+    if total == 0:
+        # Sem logprobs: saída restrita de uma letra
+        code = response.get("content", "").strip().upper()[:1]
+        if code in codes:
+            scores[codes[code]] = 1.0
+            total = 1.0
+        else:
+            return scores
+    return {label: score / total for label, score in scores.items()}
+
+
+def _confidence_level(probability: float) -> str:
+    if probability >= 0.8:
+        return "alta"
+    if probability >= 0.5:
+        return "média"
+    return "baixa"
+
+
+def classify_with_logprobs(
+    text: str,
+    label_set: Optional[LabelSet] = None,
+    model_name: Optional[str] = None,
+    session: Optional[SessionContext] = None
+) -> ClassificationOutput:
+    """
+    Classifica um texto com uma única chamada de 1 token de saída.
+
+    Args:
+        text: Texto já limpo
+        label_set: Conjunto de categorias (padrão: 20 Newsgroups)
+        model_name: Modelo a usar (None usa o da sessão ou o padrão da configuração)
+        session: Credenciais da sessão (None usa configuração e ambiente)
+
+    Returns:
+        ClassificationOutput com final_category, probabilities e confidence_score
+        (sem os campos de raciocínio)
+
+    Raises:
+        ValueError: Se o modelo não retornar uma categoria válida
+    """
+    label_set = label_set or NEWSGROUPS_LABEL_SET
+    session = session or DEFAULT_SESSION
+    model = session.resolve_model(model_name)
+    codes = label_codes(label_set)
+    messages = build_messages(text, label_set, codes)
+
+    def fetch() -> dict:
+        router = get_router(session.resolve_groq_key())
+        return router.run(lambda endpoint: _request(endpoint, model, messages, len(codes)))
+
+    response = replay_or_record("logprob", {"model": model, "messages": messages}, fetch)
+
+    probabilities = distribution_from_response(response, codes)
+    ranked = sorted(probabilities.items(), key=lambda item: item[1], reverse=True)
+    final_category, probability = ranked[0]
+    if probability == 0:
+        raise ValueError(f"Resposta sem categoria válida no modo logprob: {response.get('content')!r}")
+
+    return ClassificationOutput(
+        final_category=final_category,
+        confidence=_confidence_level(probability),
+        confidence_score=probability,
+        probabilities=probabilities,
+        candidate_categories=[label for label, score in ranked[:3] if score > 0],
+        method="logprob"
+    )
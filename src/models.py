@@ -2,8 +2,8 @@
 Modelos Pydantic para Structured Output do VerbaFlow.
 Garante que o LLM sempre retorne dados no formato esperado.
 """
-from typing import List, Optional
-from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Literal, Optional
+from pydantic import BaseModel, Field, field_validator
 
 
 class EntityAnalysis(BaseModel):
@@ -40,19 +40,23 @@ class ClassificationOutput(BaseModel):
     """
     # Análise de entidades (Passo 1)
     entity_analysis: EntityAnalysis = Field(
+        default_factory=EntityAnalysis,
         description="Análise de entidades, organizações e termos técnicos"
     )
     
     # Raciocínio contextual (Passo 2)
     contextual_reasoning: str = Field(
+        default="",
         description="Conexão das entidades às definições das 20 categorias Newsgroups"
     )
     
     # Hipótese com exclusões (Passo 3)
     candidate_categories: List[str] = Field(
+        default_factory=list,
         description="Lista de 2-3 categorias candidatas"
     )
     exclusion_reasoning: str = Field(
+        default="",
         description="Explicação de por que outras categorias foram excluídas"
     )
     
@@ -68,6 +72,25 @@ class ClassificationOutput(BaseModel):
         description="Lista de passos do raciocínio Chain of Thought"
     )
     
+    # Modo rápido (logprobs) e ensemble: distribuição sobre as categorias
+    probabilities: Optional[Dict[str, float]] = Field(
+        default=None,
+        description="Probabilidade de cada categoria (modo logprob; no ensemble, fração de votos)"
+    )
+    confidence_score: Optional[float] = Field(
+        default=None,
+        description="Probabilidade da categoria final (0-1; no ensemble, fração de votos da vencedora)"
+    )
+    ensemble_members: Optional[List[Dict[str, Any]]] = Field(
+        default=None,
+        description="Votos do ensemble: modelo, temperatura, categoria e confiança de cada membro"
+    )
+    # Origem da classificação (usada na metodologia do relatório)
+    method: Optional[str] = Field(
+        default=None,
+        description="Como a classificação foi produzida: 'compact', 'full', 'local', 'logprob' ou 'ensemble'"
+    )
+    
     class Config:
         json_schema_extra = {
             "example": {
@@ -89,6 +112,69 @@ class ClassificationOutput(BaseModel):
         }
 
 
+# Códigos curtos de confiança do schema compacto
+CONFIDENCE_CODES = {"A": "alta", "M": "média", "B": "baixa"}
+
+
+class CompactClassificationOutput(BaseModel):
+    """
+    Variante compacta da classificação: o raciocínio é escrito uma única vez,
+    com chaves curtas, confiança em código de uma letra e campos limitados.
+    Convertida para ClassificationOutput antes de chegar à interface.
+    """
+    # Decisão primeiro: no streaming, o resultado antecipado sai nos primeiros tokens
+    cat: str = Field(description="Categoria final (exatamente uma das categorias válidas)")
+    conf: Literal["A", "M", "B"] = Field(
+        default="M",
+        description="Confiança: A (alta), M (média) ou B (baixa)"
+    )
+    cands: List[str] = Field(
+        default_factory=list,
+        description="Até 3 categorias candidatas"
+    )
+    ents: List[str] = Field(
+        default_factory=list,
+        description="Até 6 entidades/termos-chave do texto"
+    )
+    why: str = Field(
+        default="",
+        description="Justificativa única (máx. 300 caracteres), incluindo exclusões"
+    )
+
+    @field_validator("ents", mode="before")
+    @classmethod
+    def _limit_ents(cls, value):
+        return list(value or [])[:6]
+
+    @field_validator("cands", mode="before")
+    @classmethod
+    def _limit_cands(cls, value):
+        return list(value or [])[:3]
+
+    @field_validator("why", mode="before")
+    @classmethod
+    def _limit_why(cls, value):
+        return str(value or "")[:300]
+
+    @field_validator("conf", mode="before")
+    @classmethod
+    def _normalize_conf(cls, value):
+        # Aceita também "alta"/"média"/"baixa" por extenso
+        code = str(value or "M").strip().upper()[:1]
+        return code if code in CONFIDENCE_CODES else "M"
+
+    def to_classification_output(self) -> ClassificationOutput:
+        """Expande para o schema completo (compatível com classification_data da UI)."""
+        return ClassificationOutput(
+            entity_analysis=EntityAnalysis(technical_terms=self.ents),
+            contextual_reasoning=self.why,
+            candidate_categories=self.cands,
+            final_category=self.cat,
+            confidence=CONFIDENCE_CODES[self.conf],
+            method="compact"
+        )
+
+
 class EnrichmentOutput(BaseModel):
     """Saída estruturada do enriquecimento web."""
     historical_context: str = Field(
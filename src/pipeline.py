@@ -0,0 +1,936 @@
+"""
+Pipeline de execução do VerbaFlow, independente da interface.
+Usado pela aplicação Streamlit (execução inline) e pelos workers da fila de jobs.
+"""
+import re
+import sys
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from contextvars import ContextVar
+from io import StringIO
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from crewai import Crew, Process
+from pydantic import ValidationError
+from src.agents import (
+    get_llm,
+    create_analyst_agent,
+    create_researcher_agent,
+    create_editor_agent
+)
+from src.tasks import (
+    ENRICHMENT_CONTEXT_FIELDS,
+    create_classification_task,
+    create_batch_classification_task,
+    create_enrichment_task,
+    create_reporting_task,
+    project_context
+)
+from src.utils import cap_text, clean_text
+from src.config import get_config
+from src.hedging import create_stage_llm
+from src.profiling import RunProfiler, should_profile
+from src.logprobs import classify_with_logprobs
+from src.streaming import build_messages as build_stream_messages, stream_classification
+from src.dedup import get_near_duplicate_index
+from src.distill import classify_locally, collect as collect_label
+from src.ensemble import ensemble_members, needs_ensemble, run_ensemble
+from src.labels import LabelSet, NEWSGROUPS_LABEL_SET
+from src.models import CompactClassificationOutput, EnrichmentOutput
+from src.report import parse_enrichment, render_report
+from src.stagecache import get_stage_cache
+from src.session import DEFAULT_SESSION, SessionContext
+
+
+# Etapas do pipeline (cada uma inclui as anteriores)
+STAGE_CLASSIFY = "classify"
+STAGE_ENRICH = "enrich"
+STAGE_REPORT = "report"
+STAGES = (STAGE_CLASSIFY, STAGE_ENRICH, STAGE_REPORT)
+
+
+def is_rate_limit_error(error) -> bool:
+    """
+    Verifica se um erro (ou sua mensagem) indica rate limit do provider.
+
+    Args:
+        error: Exceção ou string de erro
+
+    Returns:
+        True se for rate limit
+    """
+    error_str = str(error).lower()
+    return "429" in error_str or "rate limit" in error_str or "rate_limit" in error_str
+
+
+def extract_category_robust(text: str, label_set: Optional[LabelSet] = None) -> str:
+    """
+    Extrai a categoria do output do modelo com parsing robusto.
+    Tenta múltiplos padrões regex para encontrar 'Category: <nome>'.
+    Também procura no relatório final por "Categoria Identificada:".
+
+    Args:
+        text: Texto do output do modelo
+        label_set: Conjunto de categorias válidas (padrão: 20 Newsgroups)
+
+    Returns:
+        Categoria extraída ou string vazia
+    """
+    if not text:
+        return ""
+
+    label_set = label_set or NEWSGROUPS_LABEL_SET
+
+    # Padrões regex para tentar (em ordem de especificidade)
+    patterns = [
+        r'Category:\s*([^\n\r]+)',  # Padrão básico
+        r'Category\s*:\s*([^\n\r]+)',  # Com espaços variáveis
+        r'Categoria\s+Identificada:\s*([^\n\r]+)',  # Do relatório final
+        r'Categoria:\s*([^\n\r]+)',  # Em português
+        r'Category\s*=\s*([^\n\r]+)',  # Com igual
+        r'Final\s+Category:\s*([^\n\r]+)',  # Com prefixo
+        r'Classified\s+as:\s*([^\n\r]+)',  # Alternativo
+        r'categoria\s+identificada[:\s]+([^\n\r]+)',  # Case insensitive
+    ]
+
+    for pattern in patterns:
+        match = re.search(pattern, text, re.IGNORECASE | re.MULTILINE)
+        if match:
+            category = match.group(1).strip()
+            # Limpar pontuação extra no final e aspas
+            category = re.sub(r'[.,;:!?"\']+$', '', category)
+            category = category.strip('"\'')
+            # Verificar se a categoria extraída corresponde a uma válida
+            canonical = label_set.normalize(category)
+            if canonical:
+                return canonical
+            # Se não corresponder exatamente, retornar mesmo assim (pode ser variação)
+            if category:
+                return category
+
+    return ""
+
+
+def _expand_compact(data: dict) -> Optional[dict]:
+    """Converte o JSON do schema compacto (chave "cat") para o formato de ClassificationOutput."""
+    try:
+        return CompactClassificationOutput.model_validate(data).to_classification_output().model_dump()
+    except ValidationError:
+        return None
+
+
+def parse_classification_json(text: str) -> Optional[dict]:
+    """
+    Procura no texto um objeto JSON de classificação (com final_category, ou
+    "cat" no schema compacto, que é expandido para o formato completo).
+
+    Args:
+        text: Saída do modelo
+
+    Returns:
+        Dicionário da classificação ou None
+    """
+    # Objeto completo primeiro: o JSON da classificação tem objetos aninhados
+    start = text.find('{')
+    end = text.rfind('}')
+    if start != -1 and end > start:
+        try:
+            data = json.loads(text[start:end + 1])
+            if isinstance(data, dict) and 'final_category' in data:
+                # Objeto aninhado do schema completo do Analista
+                if 'entity_analysis' in data or 'reasoning_steps' in data:
+                    data.setdefault('method', 'full')
+                return data
+            if isinstance(data, dict) and 'cat' in data:
+                return _expand_compact(data)
+        except json.JSONDecodeError:
+            pass
+
+    # Schema compacto é plano: um objeto sem aninhamento com a chave "cat"
+    compact_match = re.search(r'\{[^{}]*"cat"\s*:[^{}]*\}', text, re.DOTALL)
+    if compact_match:
+        try:
+            expanded = _expand_compact(json.loads(compact_match.group(0)))
+            if expanded:
+                return expanded
+        except json.JSONDecodeError:
+            pass
+
+    json_patterns = [
+        r'\{[^{}]*"final_category"[^{}]*"confidence"[^{}]*\}',  # JSON com final_category e confidence
+        r'\{[^{}]*"final_category"[^{}]*\}',  # JSON com final_category
+        r'\{.*?"entity_analysis".*?"final_category".*?\}',  # JSON completo
+    ]
+
+    for pattern in json_patterns:
+        json_match = re.search(pattern, text, re.DOTALL | re.IGNORECASE)
+        if json_match:
+            try:
+                data = json.loads(json_match.group(0))
+                if 'final_category' in data:
+                    return data
+            except json.JSONDecodeError:
+                continue
+    return None
+
+
+def extract_classification(result, label_set: Optional[LabelSet] = None) -> tuple:
+    """
+    Extrai a categoria prevista e os dados estruturados da classificação.
+    Tenta JSON estruturado primeiro e cai para parsing por regex.
+
+    Args:
+        result: Resultado do crew.kickoff()
+        label_set: Conjunto de categorias válidas (padrão: 20 Newsgroups)
+
+    Returns:
+        Tupla (categoria_prevista, classification_data ou None)
+    """
+    label_set = label_set or NEWSGROUPS_LABEL_SET
+    result_str = str(result)
+    predicted_category = ""
+    classification_data = None
+
+    # A saída da Task 1 contém o JSON da classificação; o resultado final do
+    # crew pode ser o relatório (etapas de enriquecimento/relatório)
+    candidates = []
+    if getattr(result, 'tasks_output', None):
+        candidates.append(str(result.tasks_output[0]))
+    candidates.append(result_str)
+
+    # Tentar parsear JSON estruturado primeiro (método preferido)
+    for candidate in candidates:
+        classification_data = parse_classification_json(candidate)
+        if classification_data:
+            predicted_category = str(classification_data['final_category'])
+            predicted_category = label_set.normalize(predicted_category) or predicted_category
+            break
+
+    # Fallback: parsing robusto tradicional
+    if not predicted_category:
+        predicted_category = extract_category_robust(result_str, label_set)
+
+        # Se não encontrou, tentar buscar no output da task1 diretamente
+        if not predicted_category and hasattr(result, 'tasks_output'):
+            for task_output in result.tasks_output:
+                predicted_category = extract_category_robust(str(task_output), label_set)
+                if predicted_category:
+                    break
+
+        # Se ainda não encontrou, buscar no texto completo com padrões mais flexíveis
+        if not predicted_category:
+            category_pattern = r'\b(' + '|'.join(re.escape(cat) for cat in label_set.labels) + r')\b'
+            match = re.search(category_pattern, result_str, re.IGNORECASE)
+            if match:
+                predicted_category = label_set.normalize(match.group(1))
+
+    return predicted_category, classification_data
+
+
+def extract_report_markdown(result_str: str) -> Optional[str]:
+    """
+    Extrai o campo full_report_markdown do resultado, se presente.
+
+    Args:
+        result_str: Resultado do crew em texto
+
+    Returns:
+        Markdown do relatório ou None
+    """
+    # Objeto completo primeiro: o ReportOutput tem objetos aninhados
+    start = result_str.find('{')
+    end = result_str.rfind('}')
+    if start != -1 and end > start:
+        try:
+            data = json.loads(result_str[start:end + 1])
+            if isinstance(data, dict) and data.get('full_report_markdown'):
+                return data['full_report_markdown']
+        except json.JSONDecodeError:
+            pass
+
+    json_pattern = r'\{[^{}]*"full_report_markdown"[^{}]*\}'
+    json_match = re.search(json_pattern, result_str, re.DOTALL | re.IGNORECASE)
+    if not json_match:
+        return None
+
+    try:
+        data = json.loads(json_match.group(0))
+        return data.get('full_report_markdown')
+    except json.JSONDecodeError:
+        # Tentar buscar JSON completo
+        json_full_pattern = r'\{.*?"full_report_markdown".*?\}'
+        json_full_match = re.search(json_full_pattern, result_str, re.DOTALL | re.IGNORECASE)
+        if json_full_match:
+            try:
+                return json.loads(json_full_match.group(0)).get('full_report_markdown')
+            except json.JSONDecodeError:
+                pass
+    return None
+
+
+class _ContextStdout:
+    """
+    sys.stdout que desvia a escrita de cada execução em captura para o buffer
+    dela (ContextVar: vale também para os handlers de eventos do CrewAI, que
+    rodam em threads do event bus com o contexto copiado); o restante continua
+    no stdout original. Permite capturar o trace de execuções concorrentes.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def _target(self):
+        return _capture_buffer.get() or self._stream
+
+    def write(self, data):
+        return self._target().write(data)
+
+    def flush(self):
+        self._target().flush()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+_capture_buffer: ContextVar[Optional[StringIO]] = ContextVar("verbaflow_capture_buffer", default=None)
+_stdout_lock = threading.Lock()
+
+
+@contextmanager
+def capture_stdout():
+    """Captura em um StringIO o stdout da execução atual (e dos handlers que ela dispara)."""
+    with _stdout_lock:
+        if not isinstance(sys.stdout, _ContextStdout):
+            sys.stdout = _ContextStdout(sys.stdout)
+    buffer = StringIO()
+    token = _capture_buffer.set(buffer)
+    try:
+        yield buffer
+    finally:
+        _capture_buffer.reset(token)
+
+
+def build_few_shot_examples(history: list, label_set: Optional[LabelSet] = None) -> List[dict]:
+    """
+    Monta exemplos few-shot a partir do histórico de execuções.
+
+    Args:
+        history: Lista de execution_records
+        label_set: Considerar apenas execuções deste label set (padrão: 20 Newsgroups)
+
+    Returns:
+        Lista de exemplos (até 3, dos mais recentes)
+    """
+    label_set_name = (label_set or NEWSGROUPS_LABEL_SET).name
+    history = [h for h in (history or []) if h.get('label_set', NEWSGROUPS_LABEL_SET.name) == label_set_name]
+    few_shot_examples = []
+    for hist in history[-3:]:  # Últimos 3
+        category = hist.get('predicted') or hist.get('category')
+        if 'text_sample' in hist and category:
+            few_shot_examples.append({
+                'text': hist['text_sample'],
+                'category': category,
+                'reasoning': hist.get('reasoning', f"Classificado como {category}")
+            })
+    return few_shot_examples
+
+
+def build_classification_request(
+    cleaned_text: str,
+    label_set: LabelSet,
+    model_name: str,
+    few_shot_examples: Optional[list] = None
+) -> dict:
+    """Campos que determinam a classificação (chave da etapa no cache de etapas)."""
+    config = get_config()
+    return {
+        'text': cleaned_text,
+        'label_set': label_set.name,
+        'model': model_name,
+        'mode': config.classification_mode,
+        'schema': config.classification_schema,
+        'few_shot': few_shot_examples or []
+    }
+
+
+def classification_cached(
+    raw_text: str,
+    label_set: LabelSet,
+    model_name: str,
+    few_shot_examples: Optional[list] = None
+) -> bool:
+    """
+    Indica se a classificação do texto já está no cache de etapas.
+
+    Args:
+        raw_text: Texto bruto (limpo aqui como em run_pipeline)
+        label_set: Conjunto de categorias
+        model_name: Modelo já resolvido da execução
+        few_shot_examples: Exemplos few-shot da execução
+
+    Returns:
+        True se run_pipeline encontraria a classificação pronta
+    """
+    stage_cache = get_stage_cache()
+    if stage_cache is None:
+        return False
+    request = build_classification_request(clean_text(cap_text(raw_text)), label_set, model_name, few_shot_examples)
+    return stage_cache.get(STAGE_CLASSIFY, request) is not None
+
+
+def run_pipeline(
+    raw_text: str,
+    ground_truth: str = "",
+    model_name: Optional[str] = None,
+    few_shot_examples: Optional[list] = None,
+    on_stage: Optional[Callable[[str], None]] = None,
+    stage: str = STAGE_REPORT,
+    llm=None,
+    capture_trace: bool = True,
+    label_set: Optional[LabelSet] = None,
+    on_classification: Optional[Callable[[dict], None]] = None,
+    profile: Optional[bool] = None,
+    session: Optional[SessionContext] = None
+) -> dict:
+    """
+    Executa o pipeline até a etapa pedida (classificação, enriquecimento ou relatório).
+
+    Args:
+        raw_text: Texto bruto a classificar
+        ground_truth: Categoria real (opcional, para validação)
+        model_name: Modelo Groq a usar (None usa o da sessão ou o padrão da configuração)
+        few_shot_examples: Exemplos few-shot (opcional)
+        on_stage: Callback chamado com o rótulo de cada etapa
+        stage: Última etapa a executar: "classify", "enrich" ou "report" (completo)
+        llm: LLM já configurado (ex: de um pool); se None, usa get_llm(model_name)
+        capture_trace: Capturar o stdout verboso do CrewAI no record (apenas o
+            da thread desta execução)
+        label_set: Conjunto de categorias válidas (padrão: 20 Newsgroups)
+        on_classification: Com stream_classification, chamado com a classificação
+            antecipada assim que categoria e confiança chegam no stream
+        profile: Perfilar a execução (CPU, memória, pilhas). None segue
+            profiling_enabled/profiling_sample_rate da configuração
+        session: Credenciais e modelo da sessão (None usa configuração e ambiente)
+
+    Returns:
+        execution_record com predição, relatório e metadados (e "profile" com
+        o resumo e o diretório dos artefatos, se perfilada)
+
+    Raises:
+        ValueError: Se o rate limit for atingido ao configurar o LLM
+    """
+    if stage not in STAGES:
+        raise ValueError(f"Etapa '{stage}' inválida. Use uma de: {', '.join(STAGES)}")
+
+    if should_profile(profile):
+        with RunProfiler(f"pipeline-{stage}") as profiler:
+            record = run_pipeline(
+                raw_text, ground_truth=ground_truth, model_name=model_name,
+                few_shot_examples=few_shot_examples, on_stage=on_stage, stage=stage, llm=llm,
+                capture_trace=capture_trace, label_set=label_set,
+                on_classification=on_classification, profile=False, session=session
+            )
+        record['profile'] = profiler.summary
+        return record
+
+    label_set = label_set or NEWSGROUPS_LABEL_SET
+    session = session or DEFAULT_SESSION
+    model_name = session.resolve_model(model_name)
+
+    def notify(label: str):
+        if on_stage:
+            on_stage(label)
+
+    # Step 1: Preparação (entradas enormes são limitadas ao início e ao final)
+    notify("🔄 Limpando e preparando texto...")
+    raw_text = cap_text(raw_text)
+    cleaned_text = clean_text(raw_text)
+
+    # Step 2: Configuração LLM
+    notify("⚙️ Configurando LLM (Groq)...")
+    try:
+        llm = llm or get_llm(model_name=model_name, session=session)
+    except Exception as e:
+        if is_rate_limit_error(e):
+            raise ValueError(
+                f"Rate limit do Groq atingido: {e}\n\n"
+                "💡 **Soluções:**\n"
+                "1. Troque para modelo menor (llama-3.1-8b-instant) na sidebar - consome ~10x menos tokens\n"
+                "2. Aguarde o reset do limite (geralmente à meia-noite UTC)\n"
+                "3. Faça upgrade para Dev Tier: https://console.groq.com/settings/billing"
+            )
+        raise
+
+    # Quase-duplicatas: reaproveitar a classificação de um texto já visto
+    near_duplicate = None
+    if get_config().near_duplicate_enabled:
+        near_duplicate = get_near_duplicate_index(label_set.name).lookup(cleaned_text)
+
+    config = get_config()
+    stage_cache = get_stage_cache()
+    # Chave da classificação no cache de etapas (o pré-carregamento especulativo grava nela)
+    classification_request = build_classification_request(cleaned_text, label_set, model_name, few_shot_examples)
+
+    def learn(classification: Optional[dict]):
+        """Rótulos pagos do LLM alimentam o classificador local (src/distill.py) e o cache de etapas."""
+        if not near_duplicate and not served_locally and not cached_classification:
+            collect_label(cleaned_text, classification, label_set, ground_truth)
+            if stage_cache and classification:
+                stage_cache.put(STAGE_CLASSIFY, classification_request, classification)
+
+    def resolve_ambiguous(classification: Optional[dict]) -> Optional[dict]:
+        """Classificação ambígua: decide por voto de vários Analistas em paralelo."""
+        if not needs_ensemble(classification):
+            return classification
+        notify(f"🗳️ Confiança {classification.get('confidence') or 'indefinida'}: "
+               f"consultando {len(ensemble_members(model_name))} analistas em paralelo...")
+        analyst = create_analyst_agent(llm, label_set)
+        task = create_classification_task(analyst, cleaned_text, few_shot_examples or None, label_set)
+        return run_ensemble(
+            build_stream_messages(analyst, task), classification, label_set, model_name, session=session
+        )
+
+    # Classificação já disponível sem o Analista (quase-duplicata, cache, modelo local ou modo logprob)
+    precomputed = near_duplicate['payload'] if near_duplicate else None
+    served_locally = False
+    cached_classification = False
+    if precomputed is None and stage_cache:
+        precomputed = stage_cache.get(STAGE_CLASSIFY, classification_request)
+        if precomputed:
+            notify("⚡ Classificação já pronta no cache (pré-carregada)...")
+            cached_classification = True
+    if precomputed is None and config.distill_serve:
+        precomputed = classify_locally(cleaned_text, label_set)
+        if precomputed:
+            notify("🎓 Classificado pelo modelo local destilado (sem chamada ao LLM)...")
+            served_locally = True
+    if precomputed is None and config.classification_mode == "logprob":
+        notify("⚡ Classificando por logprobs (modo rápido)...")
+        precomputed = resolve_ambiguous(
+            classify_with_logprobs(cleaned_text, label_set, model_name, session=session).model_dump()
+        )
+        if config.near_duplicate_enabled:
+            get_near_duplicate_index(label_set.name).add(cleaned_text, precomputed)
+
+    streaming = precomputed is None and config.stream_classification
+    # Relatório pelo Editor Chefe só no modo "llm"; no modo "template" ele é montado localmente
+    editor_report = stage == STAGE_REPORT and config.report_mode == "llm"
+
+    def enrichment_request(classification_result: str) -> dict:
+        """Chave do enriquecimento: só o contexto projetado que o Pesquisador recebe."""
+        return {
+            'context': project_context(classification_result, ENRICHMENT_CONTEXT_FIELDS),
+            'model': model_name
+        }
+    analyst_llm = create_stage_llm(llm, STAGE_CLASSIFY, model_name, hedge=True, session=session)
+
+    def announce(partial: dict):
+        notify(f"🏷️ Categoria antecipada: {partial.get('final_category')} (confiança {partial.get('confidence')})")
+        if on_classification:
+            on_classification(partial)
+
+    if streaming and stage == STAGE_CLASSIFY:
+        # Só classificação: o stream é fechado assim que categoria e confiança chegam
+        notify("🕵️ Analisando texto (streaming)...")
+        analyst = create_analyst_agent(analyst_llm, label_set)
+        task1 = create_classification_task(
+            analyst, cleaned_text, few_shot_examples or None, label_set, decision_first=True
+        )
+        streamed = stream_classification(
+            build_stream_messages(analyst, task1), model_name,
+            on_early_result=announce, cancel_on_result=True, session=session
+        )
+        if streamed['classification'] is None:
+            raise ValueError("Classificação não encontrada na resposta do modelo")
+        precomputed = resolve_ambiguous(streamed['classification'])
+
+    if precomputed and stage == STAGE_CLASSIFY:
+        if near_duplicate:
+            notify("♻️ Quase-duplicata encontrada: reaproveitando classificação...")
+        category = str(precomputed.get('final_category', ''))
+        learn(precomputed)
+        return _build_record(
+            raw_text, ground_truth, stage, label_set,
+            predicted_category=label_set.normalize(category) or category,
+            classification_data=precomputed,
+            result_str=json.dumps(precomputed, ensure_ascii=False),
+            near_duplicate=near_duplicate
+        )
+
+    def run_crew(classification: Optional[dict], final_stage: Optional[str] = None) -> tuple:
+        """
+        Monta e executa a crew até final_stage (padrão: a etapa pedida); com
+        classificação pronta, o Analista é pulado, e com o enriquecimento no
+        cache de etapas, o Pesquisador também.
+        """
+        final_stage = final_stage or stage
+        enrich = final_stage in (STAGE_ENRICH, STAGE_REPORT)
+        editor = editor_report and final_stage == STAGE_REPORT
+        classification_result = json.dumps(classification, ensure_ascii=False) if classification else None
+        cached_enrichment = None
+        if classification_result and stage_cache and enrich:
+            cached_enrichment = stage_cache.get(STAGE_ENRICH, enrichment_request(classification_result))
+            if isinstance(cached_enrichment, EnrichmentOutput):
+                cached_enrichment = cached_enrichment.model_dump_json()
+            if cached_enrichment is not None:
+                notify("♻️ Contexto web reaproveitado do cache de etapas...")
+                if not editor:
+                    return cached_enrichment, ""
+
+        # Step 3: Criar agentes
+        notify("🤖 Criando agentes especializados...")
+        agents = []
+        if not classification:
+            # Analista: prazo da etapa + hedging opcional acima do p95 observado
+            analyst = create_analyst_agent(analyst_llm, label_set)
+            agents.append(analyst)
+        if enrich and cached_enrichment is None:
+            researcher = create_researcher_agent(
+                create_stage_llm(llm, STAGE_ENRICH, model_name, session=session),
+                focus=classification.get('final_category') if classification else None,
+                session=session
+            )
+            agents.append(researcher)
+        if editor:
+            editor_agent = create_editor_agent(create_stage_llm(llm, STAGE_REPORT, model_name, session=session))
+            agents.append(editor_agent)
+
+        # Step 4: Criar tasks
+        notify("📋 Criando tasks e pipeline...")
+        tasks = []
+        task1 = None
+        task2 = None
+        if not classification:
+            task1 = create_classification_task(analyst, cleaned_text, few_shot_examples or None, label_set)
+            tasks.append(task1)
+        if enrich and cached_enrichment is None:
+            task2 = create_enrichment_task(researcher, task1, classification_result=classification_result)
+            tasks.append(task2)
+        if editor:
+            tasks.append(create_reporting_task(
+                editor_agent, task1, task2,
+                classification_result=classification_result, enrichment_result=cached_enrichment
+            ))
+
+        crew = Crew(
+            agents=agents,
+            tasks=tasks,
+            process=Process.sequential,
+            verbose=capture_trace,
+            tracing=capture_trace  # Ativar tracing do CrewAI
+        )
+
+        # Step 5: Executar crew capturando o output verboso do tracing
+        if cached_enrichment is not None:
+            notify(f"✍️ [Task 1/{len(tasks)}] Redigindo relatório executivo...")
+        elif near_duplicate:
+            notify(f"♻️ Quase-duplicata encontrada: [Task 1/{len(tasks)}] Pesquisando contexto web...")
+        elif classification:
+            notify(f"🌐 [Task 1/{len(tasks)}] Pesquisando contexto web...")
+        else:
+            notify(f"🕵️ [Task 1/{len(tasks)}] Analisando texto com Chain of Thought...")
+        trace_output = ""
+        if capture_trace:
+            with capture_stdout() as buffer:
+                crew_result = crew.kickoff()
+            trace_output = buffer.getvalue()
+        else:
+            crew_result = crew.kickoff()
+
+        if crew_result is None:
+            raise RuntimeError("Execução falhou sem resultado")
+
+        # Só enriquecimentos estruturados entram no cache (como EnrichmentOutput)
+        enrichment = parse_enrichment(task2.output.raw) if task2 is not None and task2.output is not None else None
+        if stage_cache and enrichment:
+            context = classification_result or (task1.output.raw if task1.output is not None else "")
+            stage_cache.put(STAGE_ENRICH, enrichment_request(context), enrichment)
+        return crew_result, trace_output
+
+    if streaming:
+        # Etapas seguintes começam assim que categoria e confiança chegam no stream;
+        # o restante da classificação continua chegando em paralelo
+        notify("🕵️ Analisando texto (streaming)...")
+        analyst = create_analyst_agent(analyst_llm, label_set)
+        task1 = create_classification_task(
+            analyst, cleaned_text, few_shot_examples or None, label_set, decision_first=True
+        )
+        # O stream roda em outra thread; a crew fica na thread chamadora (callbacks de UI)
+        early = {}
+        early_ready = threading.Event()
+
+        def capture_early(partial: dict):
+            early['partial'] = partial
+            early_ready.set()
+
+        # Sem o bloco with: ao sair, a thread do stream não é aguardada (com o
+        # prazo excedido ela pode estar presa; o timeout do cliente a encerra)
+        executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            stream_future = executor.submit(
+                stream_classification, build_stream_messages(analyst, task1), model_name,
+                on_early_result=capture_early, cancel_on_result=False, session=session
+            )
+            stream_future.add_done_callback(lambda _: early_ready.set())
+            stream_timeout = config.classify_deadline or None
+            if not early_ready.wait(timeout=stream_timeout):
+                raise TimeoutError(
+                    f"Prazo da etapa '{STAGE_CLASSIFY}' excedido ({config.classify_deadline:g}s) "
+                    "aguardando o stream da classificação"
+                )
+
+            if 'partial' in early:
+                announce(early['partial'])
+                # Resultado antecipado ambíguo: o voto decide antes das etapas seguintes
+                decided = resolve_ambiguous(early['partial'])
+                result, trace_output = run_crew(decided)
+                try:
+                    classification_data = (
+                        stream_future.result(timeout=stream_timeout)['classification'] or early['partial']
+                    )
+                except Exception as e:
+                    print(f"⚠️ Stream da classificação interrompido após o resultado antecipado: {e!r}")
+                    classification_data = early['partial']
+                if decided is not early['partial']:
+                    classification_data = decided
+            else:
+                # Stream sem categoria/confiança: a crew completa classifica de novo
+                classification_data = resolve_ambiguous(stream_future.result()['classification'])
+                result, trace_output = run_crew(classification_data)
+        finally:
+            executor.shutdown(wait=False)
+
+        if classification_data:
+            category = str(classification_data.get('final_category', ''))
+            predicted_category = label_set.normalize(category) or category
+            if config.near_duplicate_enabled:
+                get_near_duplicate_index(label_set.name).add(cleaned_text, classification_data)
+        else:
+            predicted_category, classification_data = extract_classification(result, label_set)
+    elif precomputed is None and config.ensemble_enabled and stage != STAGE_CLASSIFY:
+        # Classificação em uma crew própria: se ambígua, o voto decide antes que
+        # o Pesquisador e o Editor trabalhem sobre a categoria
+        result, trace_output = run_crew(None, final_stage=STAGE_CLASSIFY)
+        predicted_category, classification_data = extract_classification(result, label_set)
+        if classification_data:
+            classification_data = resolve_ambiguous(classification_data)
+            category = str(classification_data.get('final_category') or predicted_category)
+            predicted_category = label_set.normalize(category) or category
+            if config.near_duplicate_enabled:
+                get_near_duplicate_index(label_set.name).add(cleaned_text, classification_data)
+        # Sem JSON estruturado: as etapas seguintes usam ao menos a categoria extraída
+        result, next_trace = run_crew(
+            classification_data or ({'final_category': predicted_category} if predicted_category else None)
+        )
+        trace_output += next_trace
+    else:
+        result, trace_output = run_crew(precomputed)
+
+        if precomputed:
+            classification_data = precomputed
+            category = str(classification_data.get('final_category', ''))
+            predicted_category = label_set.normalize(category) or category
+        else:
+            predicted_category, classification_data = extract_classification(result, label_set)
+            # Só classificação: o voto corrige a categoria
+            classification_data = resolve_ambiguous(classification_data)
+            if classification_data:
+                category = str(classification_data.get('final_category') or predicted_category)
+                predicted_category = label_set.normalize(category) or category
+            # Indexar apenas classificações estruturadas completas
+            if classification_data and config.near_duplicate_enabled:
+                get_near_duplicate_index(label_set.name).add(cleaned_text, classification_data)
+
+    result_str = str(result)
+    report_markdown = None
+    if stage == STAGE_REPORT and not editor_report:
+        # Relatório a partir das saídas estruturadas (sem a chamada do Editor Chefe)
+        notify("📝 Montando relatório executivo...")
+        report = render_report(
+            classification_data or {'final_category': predicted_category, 'confidence': ''},
+            enrichment_text=result_str
+        )
+        result_str = report.model_dump_json(indent=2)
+        report_markdown = report.full_report_markdown
+
+    learn(classification_data)
+    return _build_record(
+        raw_text, ground_truth, stage, label_set,
+        predicted_category=predicted_category,
+        classification_data=classification_data,
+        result_str=result_str,
+        trace_output=trace_output,
+        near_duplicate=near_duplicate,
+        report_markdown=report_markdown
+    )
+
+
+def _build_record(
+    raw_text: str,
+    ground_truth: str,
+    stage: str,
+    label_set: LabelSet,
+    predicted_category: str,
+    classification_data: Optional[dict],
+    result_str: str,
+    trace_output: str = "",
+    near_duplicate: Optional[dict] = None,
+    report_markdown: Optional[str] = None
+) -> dict:
+    """Monta o execution_record retornado por run_pipeline."""
+    is_correct = predicted_category.lower() == ground_truth.lower() if predicted_category and ground_truth else False
+
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'stage': stage,
+        'label_set': label_set.name,
+        'ground_truth': ground_truth,
+        'predicted': predicted_category,
+        'is_correct': is_correct,
+        'report': result_str,
+        'report_markdown': report_markdown or extract_report_markdown(result_str),
+        'text_sample': raw_text[:200],  # Primeiros 200 caracteres
+        'llm_provider': "Groq",
+        'classification_data': classification_data,
+        'trace_output': trace_output,
+        'near_duplicate_similarity': near_duplicate['similarity'] if near_duplicate else None
+    }
+
+
+def parse_batch_classification(text: str, count: int, label_set: LabelSet) -> List[dict]:
+    """
+    Interpreta a lista JSON retornada por uma task de classificação em lote.
+
+    Args:
+        text: Saída do modelo
+        count: Número de textos do lote
+        label_set: Conjunto de categorias válidas
+
+    Returns:
+        Lista com {"predicted", "confidence"} por texto, na ordem do lote
+        (predicted vazio para itens ausentes ou inválidos)
+    """
+    results = [{'predicted': '', 'confidence': ''} for _ in range(count)]
+    start = text.find('[')
+    end = text.rfind(']')
+    if start == -1 or end <= start:
+        return results
+
+    try:
+        items = json.loads(text[start:end + 1])
+    except json.JSONDecodeError:
+        return results
+
+    for position, item in enumerate(items):
+        if not isinstance(item, dict):
+            continue
+        index = item.get('id', position)
+        if not isinstance(index, int) or not 0 <= index < count:
+            continue
+        category = str(item.get('final_category', ''))
+        results[index] = {
+            'predicted': label_set.normalize(category) or category,
+            'confidence': item.get('confidence', '')
+        }
+    return results
+
+
+def run_batch_classification(
+    texts: List[str],
+    label_set: Optional[LabelSet] = None,
+    model_name: Optional[str] = None,
+    llm=None,
+    batch_size: Optional[int] = None,
+    max_workers: Optional[int] = None,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    session: Optional[SessionContext] = None,
+    ground_truths: Optional[List[str]] = None
+) -> List[dict]:
+    """
+    Classifica muitos textos agrupando-os em lotes por chamada e executando
+    os lotes concorrentemente. Quase-duplicatas já indexadas são resolvidas
+    sem chamar o LLM. Só os rótulos dados pelo LLM nesta chamada alimentam o
+    classificador local e o índice de quase-duplicatas.
+
+    Args:
+        texts: Textos brutos
+        label_set: Conjunto de categorias válidas (padrão: 20 Newsgroups)
+        model_name: Modelo Groq a usar (None usa o padrão da configuração)
+        llm: LLM já configurado (opcional)
+        batch_size: Textos por chamada (None usa a configuração)
+        max_workers: Lotes simultâneos (None usa a configuração)
+        on_progress: Callback (concluídos, total) chamado a cada texto resolvido
+        session: Credenciais e modelo da sessão (None usa configuração e ambiente)
+        ground_truths: Categorias reais por texto, se conhecidas (rótulos do LLM
+            que as contradizem não vão para o classificador local)
+
+    Returns:
+        Lista com {"predicted", "confidence"} por texto (e "error" se o lote falhou)
+    """
+    config = get_config()
+    label_set = label_set or NEWSGROUPS_LABEL_SET
+    batch_size = batch_size or config.batch_size
+    max_workers = max_workers or config.batch_max_workers
+    llm = llm or get_llm(model_name=model_name, session=session)
+
+    cleaned = [clean_text(cap_text(text)) for text in texts]
+    results: List[Optional[dict]] = [None] * len(texts)
+    done = 0
+
+    def progress(count: int):
+        nonlocal done
+        done += count
+        if on_progress:
+            on_progress(done, len(texts))
+
+    # Quase-duplicatas e textos em que o modelo local está confiante resolvidos localmente
+    pending = []
+    for i, text in enumerate(cleaned):
+        match = get_near_duplicate_index(label_set.name).lookup(text) if config.near_duplicate_enabled else None
+        local = classify_locally(text, label_set) if config.distill_serve and not match else None
+        if match:
+            results[i] = {
+                'predicted': match['payload'].get('final_category', ''),
+                'confidence': match['payload'].get('confidence', ''),
+                'near_duplicate_similarity': match['similarity']
+            }
+        elif local:
+            results[i] = {
+                'predicted': local['final_category'],
+                'confidence': local['confidence'],
+                'local_model': True
+            }
+        else:
+            pending.append(i)
+    if len(pending) < len(texts):
+        progress(len(texts) - len(pending))
+
+    def classify_batch(indexes: List[int]) -> List[dict]:
+        analyst = create_analyst_agent(llm, label_set)
+        task = create_batch_classification_task(analyst, [cleaned[i] for i in indexes], label_set)
+        crew = Crew(agents=[analyst], tasks=[task], process=Process.sequential, verbose=False)
+        return parse_batch_classification(str(crew.kickoff()), len(indexes), label_set)
+
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(classify_batch, batch): batch for batch in batches}
+        for future in as_completed(futures):
+            batch = futures[future]
+            try:
+                batch_results = future.result()
+            except Exception as e:
+                batch_results = [{'predicted': '', 'confidence': '', 'error': str(e)} for _ in batch]
+            for i, item in zip(batch, batch_results):
+                results[i] = item
+                if item.get('error') or not item.get('predicted'):
+                    continue
+                labelled = {'final_category': item['predicted'], 'confidence': item['confidence']}
+                collect_label(cleaned[i], labelled, label_set, ground_truths[i] if ground_truths else "")
+                if config.near_duplicate_enabled:
+                    get_near_duplicate_index(label_set.name).add(cleaned[i], labelled)
+            progress(len(batch))
+
+    return results
@@ -0,0 +1,246 @@
+"""
+Pré-carregamento especulativo da classificação.
+
+Assim que uma amostra é selecionada na interface, a limpeza e a etapa de
+classificação rodam em segundo plano; o resultado vai para o cache de
+etapas (src/stagecache.py), e o clique em "Executar VerbaFlow" encontra a
+classificação pronta. Cada sessão tem no máximo uma especulação: escolher
+outra amostra cancela a anterior. Só especulações em andamento ficam em
+memória (até prefetch_max_sessions, descartando as mais antigas); uma
+amostra já classificada no cache não é especulada de novo, e sem o cache de
+etapas (STAGE_CACHE_ENABLED=false) nada é especulado: o resultado não teria
+onde ficar. O cancelamento é cooperativo, verificado
+a cada etapa do pipeline (on_stage); uma chamada ao LLM já iniciada termina
+dentro do prazo da etapa de classificação e o resultado fica no cache.
+"""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional
+
+from src.cassette import fingerprint
+from src.config import get_config
+from src.labels import LabelSet
+from src.session import SessionContext
+from src.stagecache import get_stage_cache
+
+
+class PrefetchCancelled(Exception):
+    """Especulação abandonada (amostra trocada ou orçamento de tempo esgotado)."""
+
+
+class _Speculation:
+    def __init__(self, key: str):
+        self.key = key
+        self.started = time.monotonic()
+        self.cancelled = threading.Event()
+        self.future: Optional[Future] = None
+
+
+class Prefetcher:
+    """Executa classificações especulativas em um pool limitado, uma por sessão."""
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        budget: Optional[float] = None,
+        max_sessions: Optional[int] = None
+    ):
+        config = get_config()
+        self.budget = config.prefetch_budget if budget is None else budget
+        self.max_sessions = max_sessions or config.prefetch_max_sessions
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or config.prefetch_max_workers,
+            thread_name_prefix="verbaflow-prefetch"
+        )
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, _Speculation]" = OrderedDict()
+        self.started = 0
+        self.skipped = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.failed = 0
+
+    @staticmethod
+    def speculation_key(
+        raw_text: str,
+        label_set: LabelSet,
+        model_name: Optional[str] = None,
+        few_shot_examples: Optional[List[dict]] = None
+    ) -> str:
+        return fingerprint("prefetch", {
+            "text": raw_text,
+            "label_set": label_set.name,
+            "model": model_name,
+            "few_shot": few_shot_examples or []
+        })
+
+    def speculate(
+        self,
+        session_id: str,
+        raw_text: str,
+        label_set: LabelSet,
+        model_name: Optional[str] = None,
+        few_shot_examples: Optional[List[dict]] = None,
+        session: Optional[SessionContext] = None,
+        ground_truth: str = ""
+    ) -> Optional[Future]:
+        """
+        Inicia (ou mantém) a classificação especulativa da amostra selecionada.
+
+        Args:
+            session_id: Identificador da sessão da interface
+            raw_text: Texto bruto selecionado
+            label_set: Conjunto de categorias da fonte de dados
+            model_name: Modelo da execução (o mesmo do clique, para acertar o cache)
+            few_shot_examples: Exemplos few-shot da execução
+            session: Credenciais da sessão (as mesmas do clique)
+            ground_truth: Categoria real da amostra, se conhecida (o rótulo
+                especulativo só alimenta o classificador local se concordar)
+
+        Returns:
+            Future com o execution_record da etapa de classificação, ou None
+            se a classificação já está no cache de etapas ou o cache está desativado
+        """
+        # Import tardio: o pipeline importa CrewAI e os agentes
+        from src.pipeline import classification_cached
+
+        if get_stage_cache() is None:
+            # A execução real não encontraria o resultado
+            return None
+
+        key = self.speculation_key(raw_text, label_set, model_name, few_shot_examples)
+        with self._lock:
+            previous = self._sessions.get(session_id)
+            if previous is not None and previous.key == key:
+                self._sessions.move_to_end(session_id)
+                return previous.future
+        if classification_cached(raw_text, label_set, model_name, few_shot_examples):
+            with self._lock:
+                self.skipped += 1
+            return None
+        evicted = []
+        with self._lock:
+            previous = self._sessions.pop(session_id, None)
+            speculation = _Speculation(key)
+            self._sessions[session_id] = speculation
+            while len(self._sessions) > self.max_sessions:
+                evicted.append(self._sessions.popitem(last=False)[1])
+            self.started += 1
+            speculation.future = self._executor.submit(
+                self._run, speculation, raw_text, label_set, model_name, few_shot_examples, session, ground_truth
+            )
+        # Fora do lock: cancelar um future na fila chama os callbacks na hora
+        for stale in ([previous] if previous is not None else []) + evicted:
+            self._cancel(stale)
+        speculation.future.add_done_callback(lambda future: self._finished(session_id, speculation, future))
+        return speculation.future
+
+    def settle(
+        self,
+        session_id: str,
+        raw_text: str,
+        label_set: LabelSet,
+        model_name: Optional[str] = None,
+        few_shot_examples: Optional[List[dict]] = None
+    ) -> bool:
+        """
+        Aguarda a especulação em andamento da mesma amostra (até o fim do
+        orçamento), para que a execução real encontre a classificação no cache
+        em vez de repetir a chamada ao LLM.
+
+        Returns:
+            True se havia uma especulação da mesma amostra e ela terminou
+        """
+        key = self.speculation_key(raw_text, label_set, model_name, few_shot_examples)
+        with self._lock:
+            current = self._sessions.get(session_id)
+            if current is None or current.key != key or current.future is None:
+                return False
+            # Consumida pela execução real
+            del self._sessions[session_id]
+        remaining = max(0.0, current.started + self.budget - time.monotonic())
+        try:
+            current.future.result(timeout=remaining)
+            return True
+        except Exception:
+            return False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "started": self.started,
+                "skipped": self.skipped,
+                "completed": self.completed,
+                "cancelled": self.cancelled,
+                "failed": self.failed,
+                "in_flight": sum(1 for s in self._sessions.values() if s.future and not s.future.done())
+            }
+
+    def _cancel(self, speculation: _Speculation):
+        speculation.cancelled.set()
+        if speculation.future is not None:
+            # Ainda na fila: nem começa
+            speculation.future.cancel()
+
+    def _run(
+        self,
+        speculation: _Speculation,
+        raw_text: str,
+        label_set: LabelSet,
+        model_name: Optional[str],
+        few_shot_examples: Optional[List[dict]],
+        session: Optional[SessionContext],
+        ground_truth: str
+    ) -> dict:
+        # Import tardio: o pipeline importa CrewAI e os agentes
+        from src.pipeline import STAGE_CLASSIFY, run_pipeline
+
+        def checkpoint(_label: str):
+            if speculation.cancelled.is_set():
+                raise PrefetchCancelled("amostra trocada")
+            if time.monotonic() - speculation.started > self.budget:
+                raise PrefetchCancelled(f"orçamento de {self.budget:.0f}s esgotado")
+
+        checkpoint("")
+        return run_pipeline(
+            raw_text,
+            ground_truth=ground_truth,
+            model_name=model_name,
+            few_shot_examples=few_shot_examples,
+            on_stage=checkpoint,
+            stage=STAGE_CLASSIFY,
+            capture_trace=False,
+            label_set=label_set,
+            profile=False,
+            session=session
+        )
+
+    def _finished(self, session_id: str, speculation: _Speculation, future: Future):
+        with self._lock:
+            if future.cancelled():
+                self.cancelled += 1
+            elif isinstance(future.exception(), PrefetchCancelled):
+                self.cancelled += 1
+            elif future.exception() is not None:
+                self.failed += 1
+                print(f"⚠️ Classificação especulativa falhou: {future.exception()}")
+            else:
+                self.completed += 1
+            # O resultado já está no cache de etapas: a entrada não é mais necessária
+            if self._sessions.get(session_id) is speculation:
+                del self._sessions[session_id]
+
+
+_prefetcher: Optional[Prefetcher] = None
+_prefetcher_lock = threading.Lock()
+
+
+def get_prefetcher() -> Prefetcher:
+    """Pool de especulação do processo."""
+    global _prefetcher
+    with _prefetcher_lock:
+        if _prefetcher is None:
+            _prefetcher = Prefetcher()
+        return _prefetcher
@@ -0,0 +1,268 @@
+"""
+Perfilamento de execuções (CPU, memória e pilhas amostradas).
+
+Uma execução perfilada grava, em um diretório próprio dentro de
+profiling_dir:
+    profile.pstats      cProfile da thread da execução (snakeviz, pstats)
+    profile.txt         funções com maior tempo acumulado
+    stacks.collapsed    pilhas amostradas no formato collapsed
+                        (flamegraph.pl, speedscope, inferno)
+    memory.txt          maiores alocações (tracemalloc) e pico de memória
+
+As pilhas são amostradas da thread da execução e das threads de apoio
+(event loop dos LLMs, streaming, ensemble). Cada amostra é atribuída a
+VerbaFlow (parsing, prompts, UI), CrewAI/LiteLLM, rede ou espera, o que
+indica para onde foi o tempo.
+"""
+import cProfile
+import io
+import pstats
+import random
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from src.config import get_config
+
+
+# Regras de atribuição, da folha para a raiz: o primeiro frame reconhecido decide
+_NETWORK_MARKERS = ("/socket.py", "/ssl.py", "/selectors.py", "/httpcore/", "/httpx/", "/h11/", "/anyio/",
+                    "/urllib3/", "/requests/", "/http/client.py")
+_WAIT_MARKERS = ("/threading.py", "/concurrent/futures/", "/queue.py")
+_FRAMEWORK_MARKERS = ("/crewai/", "/crewai_tools/", "/litellm/", "/openai/", "/langchain", "/tavily/")
+_OWN_MARKERS = ("/src/", "/app.py")
+
+BUCKETS = ("verbaflow", "crewai", "rede", "espera", "outros")
+
+
+def should_profile(enabled: Optional[bool] = None, sample: bool = False) -> bool:
+    """
+    Decide se uma execução deve ser perfilada.
+
+    Args:
+        enabled: True/False força a decisão (ex: switch da sidebar); None segue
+            profiling_enabled da configuração, com amostragem
+        sample: Aplicar profiling_sample_rate mesmo com enabled explícito
+            (ex: execuções em lote)
+
+    Returns:
+        True se a execução deve ser perfilada
+    """
+    config = get_config()
+    if enabled is None:
+        enabled, sample = config.profiling_enabled, True
+    if not enabled:
+        return False
+    return not sample or random.random() < config.profiling_sample_rate
+
+
+def _frame_name(frame) -> str:
+    filename = frame.f_code.co_filename.replace("\\", "/")
+    if "site-packages/" in filename:
+        filename = filename.split("site-packages/", 1)[1]
+    else:
+        cwd = str(Path.cwd()).replace("\\", "/") + "/"
+        filename = filename[len(cwd):] if filename.startswith(cwd) else filename.rsplit("/", 1)[-1]
+    # ';' separa frames no formato collapsed
+    return f"{filename}:{frame.f_code.co_name}".replace(";", ":")
+
+
+def _classify(frame) -> str:
+    while frame is not None:
+        filename = frame.f_code.co_filename.replace("\\", "/")
+        if any(marker in filename for marker in _NETWORK_MARKERS):
+            return "rede"
+        if any(marker in filename for marker in _WAIT_MARKERS):
+            return "espera"
+        if any(marker in filename for marker in _FRAMEWORK_MARKERS):
+            return "crewai"
+        if "site-packages/" not in filename and any(marker in filename for marker in _OWN_MARKERS):
+            return "verbaflow"
+        frame = frame.f_back
+    return "outros"
+
+
+class StackSampler:
+    """Amostra periodicamente as pilhas da thread perfilada e das threads de apoio."""
+
+    def __init__(self, target_ident: int, interval: float):
+        self.target_ident = target_ident
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.buckets: Counter = Counter()
+        self.samples = 0
+        self._known = {thread.ident for thread in threading.enumerate()}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="verbaflow-profiler", daemon=True)
+
+    def _tracked(self) -> Dict[int, str]:
+        # Thread da execução, threads do VerbaFlow e threads criadas durante a execução
+        return {
+            thread.ident: thread.name for thread in threading.enumerate()
+            if thread.ident == self.target_ident
+            or (thread.name.startswith("verbaflow-") and thread.name != "verbaflow-profiler")
+            or thread.ident not in self._known
+        }
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            tracked = self._tracked()
+            frames = sys._current_frames()
+            tick = {}
+            for ident, name in tracked.items():
+                frame = frames.get(ident)
+                if frame is None or ident == own:
+                    continue
+                names = []
+                current = frame
+                while current is not None:
+                    names.append(_frame_name(current))
+                    current = current.f_back
+                self.stacks[";".join([name] + names[::-1])] += 1
+                tick[ident] = _classify(frame)
+            self._attribute(tick)
+
+    def _attribute(self, tick: Dict[int, str]):
+        bucket = tick.get(self.target_ident)
+        if bucket is None:
+            return
+        self.samples += 1
+        if bucket == "espera":
+            # Execução bloqueada esperando outras threads: a amostra é dividida
+            # entre o que as threads ocupadas estão fazendo
+            others = [
+                other for ident, other in tick.items()
+                if ident != self.target_ident and other not in ("espera", "outros")
+            ]
+            if others:
+                for other in others:
+                    self.buckets[other] += 1 / len(others)
+                return
+        self.buckets[bucket] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class RunProfiler:
+    """
+    Context manager que perfila uma execução e grava os artefatos.
+
+    Após o bloco, `summary` contém o diretório dos artefatos, tempos, pico de
+    memória, a distribuição das amostras por origem e as funções mais caras.
+    """
+
+    def __init__(self, label: str, output_dir: Optional[str] = None):
+        config = get_config()
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        self.label = label
+        self.directory = Path(output_dir or config.profiling_dir) / f"{stamp}-{label}-{uuid.uuid4().hex[:6]}"
+        self.interval = config.profiling_interval
+        self.memory = config.profiling_memory
+        self.summary: Optional[dict] = None
+        self._profiler: Optional[cProfile.Profile] = None
+        self._sampler: Optional[StackSampler] = None
+        self._started_tracemalloc = False
+
+    def __enter__(self) -> "RunProfiler":
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+            self._started_tracemalloc = True
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+
+        self._profiler = cProfile.Profile()
+        try:
+            self._profiler.enable()
+        except ValueError:
+            # Outro profiler já ativo no processo (ex: execução aninhada)
+            print("⚠️ cProfile indisponível (outro profiler ativo); gravando apenas pilhas amostradas")
+            self._profiler = None
+
+        self._sampler = StackSampler(threading.get_ident(), self.interval)
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        self._sampler.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall_time = time.perf_counter() - self._wall_start
+        cpu_time = time.process_time() - self._cpu_start
+        self._sampler.stop()
+        if self._profiler is not None:
+            self._profiler.disable()
+
+        snapshot = None
+        peak = None
+        if tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+
+        try:
+            self.summary = self._write(wall_time, cpu_time, snapshot, peak)
+        except Exception as e:
+            # Falha ao gravar o perfil nunca derruba a execução
+            print(f"⚠️ Não foi possível gravar o perfil da execução: {e}")
+        return False
+
+    def _top_functions(self, limit: int = 15) -> List[dict]:
+        stats = pstats.Stats(self._profiler)
+        entries = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)
+        return [
+            {
+                "function": f"{Path(filename).name}:{line}({name})",
+                "calls": calls,
+                "tottime": round(tottime, 4),
+                "cumtime": round(cumtime, 4)
+            }
+            for (filename, line, name), (_, calls, tottime, cumtime, _) in entries[:limit]
+        ]
+
+    def _write(self, wall_time: float, cpu_time: float, snapshot, peak: Optional[int]) -> dict:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        (self.directory / "stacks.collapsed").write_text(self._sampler.collapsed(), encoding="utf-8")
+
+        top_functions = []
+        if self._profiler is not None:
+            self._profiler.dump_stats(str(self.directory / "profile.pstats"))
+            report = io.StringIO()
+            pstats.Stats(self._profiler, stream=report).sort_stats("cumulative").print_stats(40)
+            (self.directory / "profile.txt").write_text(report.getvalue(), encoding="utf-8")
+            top_functions = self._top_functions()
+
+        if snapshot is not None:
+            lines = [f"Pico de memória rastreada: {peak / 1024 / 1024:.1f} MiB", ""]
+            for stat in snapshot.statistics("lineno")[:30]:
+                lines.append(str(stat))
+            (self.directory / "memory.txt").write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+        samples = self._sampler.samples
+        return {
+            "label": self.label,
+            "dir": str(self.directory),
+            "wall_time": round(wall_time, 3),
+            "cpu_time": round(cpu_time, 3),
+            "peak_memory_mb": round(peak / 1024 / 1024, 2) if peak is not None else None,
+            "samples": samples,
+            "breakdown": {
+                bucket: round(self._sampler.buckets[bucket] / samples, 3) if samples else 0.0
+                for bucket in BUCKETS
+            },
+            "top_functions": top_functions
+        }
@@ -0,0 +1,446 @@
+"""
+Pool de provedores LLM com balanceamento e failover.
+
+Combina várias chaves Groq e endpoints OpenAI-compatíveis (ex: servidor de
+inferência local) atrás de um único LLM do CrewAI. Cada chamada vai para o
+endpoint com melhor relação entre cota restante (janela deslizante de 60s) e
+latência observada; respostas 429/5xx ou falhas de conexão tiram o endpoint
+do rodízio por um período de cooldown e a chamada segue para o próximo.
+"""
+import asyncio
+import hashlib
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+import openai
+from crewai.llm import LLM
+from crewai.llms.base_llm import BaseLLM
+from openai import OpenAI
+from pydantic import PrivateAttr
+
+from src.config import get_config
+
+
+GROQ_BASE_URL = "https://api.groq.com/openai/v1"
+
+# Latência assumida para endpoints ainda sem medições (segundos)
+_DEFAULT_LATENCY = 1.0
+_EWMA_ALPHA = 0.3
+_QUOTA_WINDOW = 60.0
+
+
+class Endpoint:
+    """Um destino de chamadas (URL + chave + modelo) com estado de cota e saúde."""
+
+    def __init__(self, name: str, base_url: str, api_key: str, model: Optional[str], rpm: int):
+        self.name = name
+        self.base_url = base_url
+        self.api_key = api_key
+        # None: usa o modelo pedido pelo chamador (chaves Groq)
+        self.model = model
+        self.rpm = rpm
+
+        self.requests = deque()
+        self.latency: Optional[float] = None
+        self.in_flight = 0
+        self.cooldown_until = 0.0
+        self.calls = 0
+        self.failures = 0
+
+    def remaining(self, now: float) -> int:
+        """Requisições ainda disponíveis na janela atual."""
+        while self.requests and now - self.requests[0] >= _QUOTA_WINDOW:
+            self.requests.popleft()
+        return self.rpm - len(self.requests)
+
+    def score(self, now: float) -> float:
+        """Prioridade do endpoint: maior cota restante e menor latência esperada."""
+        latency = self.latency if self.latency is not None else _DEFAULT_LATENCY
+        return (self.remaining(now) / self.rpm) / (latency * (1 + self.in_flight))
+
+
+def _error_chain(error: BaseException):
+    """A exceção e as que ela envolve (__cause__/__context__), sem repetir."""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        yield error
+        error = error.__cause__ or error.__context__
+
+
+def classify_error(error: Exception) -> Optional[str]:
+    """
+    Classifica um erro de chamada para decidir o failover.
+
+    Só falhas do endpoint contam: status 429/5xx ou erro de transporte
+    (conexão recusada/interrompida), identificados pelo tipo da exceção ou
+    pelo status HTTP. Timeouts do lado do cliente vêm dos nossos próprios
+    prazos (prazo da etapa, hedge cancelado) e não penalizam o endpoint.
+
+    Args:
+        error: Exceção levantada pelo cliente do endpoint
+
+    Returns:
+        "rate_limit" (429), "server" (5xx/transporte) ou None se o erro não for do endpoint
+    """
+    for current in _error_chain(error):
+        if isinstance(current, (TimeoutError, asyncio.TimeoutError, asyncio.CancelledError,
+                                openai.APITimeoutError, httpx.TimeoutException)):
+            return None
+
+        status = getattr(current, "status_code", None)
+        if status is None:
+            status = getattr(getattr(current, "response", None), "status_code", None)
+        if status == 429 or isinstance(current, openai.RateLimitError):
+            return "rate_limit"
+        if isinstance(status, int) and status >= 500:
+            return "server"
+        if isinstance(current, (openai.APIConnectionError, httpx.TransportError, ConnectionError)):
+            return "server"
+
+    # Sem tipo nem status (ex: erro reembalado em texto): só o rate limit é reconhecido
+    message = str(error).lower()
+    if "429" in message or "rate limit" in message or "rate_limit" in message:
+        return "rate_limit"
+    return None
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+# Estado dos endpoints (cota, in_flight, latência, cooldown) é do processo: um
+# Endpoint por (base_url, chave, modelo), compartilhado por todos os routers
+_endpoints: Dict[tuple, Endpoint] = {}
+_endpoint_lock = threading.Lock()
+
+
+def shared_endpoint(name: str, base_url: str, api_key: str, model: Optional[str], rpm: int) -> Endpoint:
+    """
+    Endpoint do processo para (base_url, api_key, model), criado na primeira vez.
+
+    Args:
+        name: Nome exibido nas métricas (usado só na criação)
+        base_url: URL base OpenAI-compatível
+        api_key: Chave do endpoint
+        model: Modelo fixo do endpoint (None usa o do chamador)
+        rpm: Cota de requisições por minuto
+
+    Returns:
+        Endpoint compartilhado (um 429 em uma sessão coloca a chave em cooldown para todas)
+    """
+    key = (base_url, api_key, model)
+    with _endpoint_lock:
+        endpoint = _endpoints.get(key)
+        if endpoint is None:
+            endpoint = _endpoints[key] = Endpoint(name, base_url, api_key, model, rpm)
+        endpoint.rpm = rpm
+        return endpoint
+
+
+# Clientes OpenAI diretos (logprobs, streaming): um por (base_url, chave,
+# timeout), reaproveitados entre chamadas para manter o pool de conexões
+_openai_clients: Dict[tuple, OpenAI] = {}
+_openai_client_lock = threading.Lock()
+
+
+def openai_client(endpoint: Endpoint, timeout: Optional[float] = None) -> OpenAI:
+    """
+    Cliente OpenAI do processo para um endpoint (thread-safe, reaproveitado).
+
+    Args:
+        endpoint: Endpoint de destino
+        timeout: Timeout (s) das requisições (None = padrão do cliente)
+
+    Returns:
+        Cliente OpenAI compartilhado
+    """
+    key = (endpoint.base_url, endpoint.api_key, timeout)
+    with _openai_client_lock:
+        client = _openai_clients.get(key)
+        if client is None:
+            client = _openai_clients[key] = OpenAI(
+                api_key=endpoint.api_key, base_url=endpoint.base_url, timeout=timeout
+            )
+        return client
+
+
+class ProviderRouter:
+    """Seleciona endpoints e mantém as métricas de cota, latência e cooldown."""
+
+    def __init__(self, endpoints: List[Endpoint], cooldown: Optional[float] = None):
+        if not endpoints:
+            raise ValueError("Nenhum endpoint LLM configurado")
+        self.endpoints = endpoints
+        self.cooldown = cooldown if cooldown is not None else get_config().provider_cooldown
+        # Mesmo lock para todos os routers: os endpoints são compartilhados
+        self._lock = _endpoint_lock
+
+    def acquire(self, exclude: set, idle_only: bool = False) -> Optional[Endpoint]:
+        """
+        Reserva o melhor endpoint disponível para uma chamada.
+
+        Args:
+            exclude: Nomes de endpoints já tentados nesta chamada
+            idle_only: Considerar só endpoints sem chamada em andamento
+
+        Returns:
+            Endpoint reservado (cota consumida, in_flight incrementado) ou None
+        """
+        with self._lock:
+            now = time.monotonic()
+            candidates = [
+                endpoint for endpoint in self.endpoints
+                if endpoint.name not in exclude
+                and endpoint.cooldown_until <= now
+                and endpoint.remaining(now) > 0
+                and not (idle_only and endpoint.in_flight)
+            ]
+            if not candidates:
+                return None
+            endpoint = max(candidates, key=lambda e: e.score(now))
+            endpoint.requests.append(now)
+            endpoint.in_flight += 1
+            endpoint.calls += 1
+            return endpoint
+
+    def release(self, endpoint: Endpoint, latency: Optional[float] = None, error: Optional[Exception] = None):
+        """
+        Registra o resultado de uma chamada.
+
+        Args:
+            endpoint: Endpoint reservado em acquire()
+            latency: Duração da chamada bem-sucedida (segundos)
+            error: Exceção da chamada com falha
+        """
+        with self._lock:
+            endpoint.in_flight -= 1
+            if error is None:
+                if latency is not None:
+                    endpoint.latency = latency if endpoint.latency is None else (
+                        _EWMA_ALPHA * latency + (1 - _EWMA_ALPHA) * endpoint.latency
+                    )
+                return
+            endpoint.failures += 1
+            endpoint.cooldown_until = time.monotonic() + (_retry_after(error) or self.cooldown)
+
+    def run(self, fn: Callable[[Endpoint], Any]) -> Any:
+        """
+        Executa uma chamada no melhor endpoint, com failover em 429/5xx.
+
+        Args:
+            fn: Função que recebe o Endpoint reservado e faz a requisição
+
+        Returns:
+            Resultado de fn no primeiro endpoint que responder
+
+        Raises:
+            Exception: Erro não relacionado ao endpoint, ou o último erro se todos falharem
+        """
+        tried = set()
+        last_error: Optional[Exception] = None
+
+        while True:
+            endpoint = self.acquire(tried)
+            if endpoint is None:
+                if last_error is not None:
+                    raise last_error
+                raise ValueError("Rate limit: todos os endpoints LLM estão sem cota ou em cooldown")
+            tried.add(endpoint.name)
+
+            start = time.monotonic()
+            try:
+                result = fn(endpoint)
+            except Exception as e:
+                if classify_error(e) is None:
+                    self.release(endpoint)
+                    raise
+                self.release(endpoint, error=e)
+                print(f"⚠️ Endpoint LLM '{endpoint.name}' indisponível ({classify_error(e)}), tentando o próximo")
+                last_error = e
+                continue
+
+            self.release(endpoint, latency=time.monotonic() - start)
+            return result
+
+    def stats(self) -> List[dict]:
+        """Estado de cada endpoint (sem as chaves)."""
+        with self._lock:
+            now = time.monotonic()
+            return [
+                {
+                    "name": endpoint.name,
+                    "model": endpoint.model,
+                    "remaining": endpoint.remaining(now),
+                    "latency": endpoint.latency,
+                    "in_flight": endpoint.in_flight,
+                    "cooling_down": endpoint.cooldown_until > now,
+                    "calls": endpoint.calls,
+                    "failures": endpoint.failures
+                }
+                for endpoint in self.endpoints
+            ]
+
+
+class RoutedLLM(BaseLLM):
+    """
+    LLM do CrewAI que distribui as chamadas entre os endpoints de um ProviderRouter.
+
+    Os clientes de cada endpoint são criados por instância (stop words e demais
+    atributos definidos pelo CrewAI não vazam entre agentes); cota, latência e
+    cooldown ficam nos endpoints, compartilhados pelo processo. Com idle_only,
+    as chamadas assíncronas só vão para endpoints ociosos (a duplicata do
+    hedging nunca cai no endpoint da chamada principal).
+    """
+
+    llm_type: str = "routed"
+    _router: ProviderRouter = PrivateAttr()
+    _clients: Dict[str, LLM] = PrivateAttr(default_factory=dict)
+    _idle_only: bool = PrivateAttr(default=False)
+
+    def __init__(self, router: ProviderRouter, idle_only: bool = False, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._router = router
+        self._clients = {}
+        self._idle_only = idle_only
+
+    @property
+    def router(self) -> ProviderRouter:
+        return self._router
+
+    def _client(self, endpoint: Endpoint) -> LLM:
+        if endpoint.name not in self._clients:
+            self._clients[endpoint.name] = LLM(
+                model=endpoint.model or self.model,
+                api_key=endpoint.api_key,
+                base_url=endpoint.base_url,
+                temperature=self.temperature
+            )
+        client = self._clients[endpoint.name]
+        client.stop = list(self.stop)
+        return client
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None,
+             from_task=None, from_agent=None, response_model=None):
+        return self._router.run(lambda endpoint: self._client(endpoint).call(
+            messages,
+            tools=tools,
+            callbacks=callbacks,
+            available_functions=available_functions,
+            from_task=from_task,
+            from_agent=from_agent,
+            response_model=response_model
+        ))
+
+    async def acall(self, messages, tools=None, callbacks=None, available_functions=None,
+                    from_task=None, from_agent=None, response_model=None):
+        tried = set()
+        last_error: Optional[Exception] = None
+
+        while True:
+            endpoint = self._router.acquire(tried, idle_only=self._idle_only)
+            if endpoint is None:
+                if last_error is not None:
+                    raise last_error
+                if self._idle_only:
+                    raise ValueError("Nenhum endpoint LLM ocioso para a requisição duplicada")
+                raise ValueError("Rate limit: todos os endpoints LLM estão sem cota ou em cooldown")
+            tried.add(endpoint.name)
+
+            start = time.monotonic()
+            try:
+                result = await self._client(endpoint).acall(
+                    messages,
+                    tools=tools,
+                    callbacks=callbacks,
+                    available_functions=available_functions,
+                    from_task=from_task,
+                    from_agent=from_agent,
+                    response_model=response_model
+                )
+            except asyncio.CancelledError:
+                # Chamada cancelada (hedge perdedor ou prazo): libera sem penalizar o endpoint
+                self._router.release(endpoint)
+                raise
+            except Exception as e:
+                if classify_error(e) is None:
+                    self._router.release(endpoint)
+                    raise
+                self._router.release(endpoint, error=e)
+                print(f"⚠️ Endpoint LLM '{endpoint.name}' indisponível ({classify_error(e)}), tentando o próximo")
+                last_error = e
+                continue
+
+            self._router.release(endpoint, latency=time.monotonic() - start)
+            return result
+
+    def supports_stop_words(self) -> bool:
+        return True
+
+    # Tool calling nativo e multimodalidade seguem o cliente do primeiro endpoint
+    def supports_function_calling(self) -> bool:
+        return self._client(self._router.endpoints[0]).supports_function_calling()
+
+    def supports_multimodal(self) -> bool:
+        return self._client(self._router.endpoints[0]).supports_multimodal()
+
+    def get_context_window_size(self) -> int:
+        return self._client(self._router.endpoints[0]).get_context_window_size()
+
+
+def build_endpoints(primary_key: Optional[str] = None) -> List[Endpoint]:
+    """
+    Monta a lista de endpoints a partir da configuração.
+
+    Args:
+        primary_key: Chave Groq principal (GROQ_API_KEY / sidebar)
+
+    Returns:
+        Endpoints das chaves Groq (sem duplicatas) seguidos dos endpoints extras,
+        com o estado compartilhado do processo
+    """
+    config = get_config()
+    keys = [primary_key] if primary_key else []
+    keys += [key.strip() for key in config.groq_api_keys.split(",") if key.strip()]
+
+    endpoints = [
+        # Nome estável por chave (sem expor a chave nas métricas)
+        shared_endpoint(
+            f"groq-{hashlib.sha256(key.encode('utf-8')).hexdigest()[:8]}",
+            config.groq_base_url or GROQ_BASE_URL, key, None, config.groq_rpm_limit
+        )
+        for key in dict.fromkeys(keys)
+    ]
+    for i, extra in enumerate(config.llm_endpoints):
+        endpoints.append(shared_endpoint(
+            extra.get("name") or f"endpoint-{i}",
+            extra["base_url"],
+            extra.get("api_key") or "not-needed",
+            extra.get("model"),
+            int(extra.get("rpm") or 600)
+        ))
+    return endpoints
+
+
+def get_router(primary_key: Optional[str] = None) -> ProviderRouter:
+    """
+    Retorna um router para o conjunto de chaves atual.
+
+    O router é só a lista de endpoints; cota, latência e cooldown ficam nos
+    endpoints compartilhados do processo, então routers de sessões diferentes
+    enxergam o mesmo estado das chaves em comum.
+
+    Args:
+        primary_key: Chave Groq principal (da sessão ou do ambiente)
+
+    Returns:
+        ProviderRouter sobre os endpoints compartilhados
+    """
+    return ProviderRouter(build_endpoints(primary_key))
@@ -0,0 +1,223 @@
+"""
+Relatório executivo montado localmente a partir das saídas estruturadas.
+
+Classificação (ClassificationOutput) e enriquecimento (EnrichmentOutput) já
+trazem todos os fatos do relatório; o template em pt-BR monta o ReportOutput
+com as quatro seções fixas sem uma chamada ao LLM. O Editor Chefe continua
+disponível como modo "llm" (REPORT_MODE) para um texto mais elaborado.
+"""
+import json
+import re
+from typing import Dict, List, Optional, Union
+
+from pydantic import ValidationError
+
+from src.models import ClassificationOutput, EnrichmentOutput, ReportOutput
+
+
+REPORT_MODES = ("template", "llm")
+
+_CONFIDENCE_JUSTIFICATIONS = {
+    "alta": "As entidades e os termos técnicos apontam de forma consistente para uma única categoria.",
+    "média": "Há evidências para a categoria escolhida, mas as candidatas próximas não foram totalmente descartadas.",
+    "baixa": "O texto traz poucos indicadores específicos; a categoria é a mais provável entre candidatas próximas.",
+}
+
+# Rótulos da versão em texto livre do enriquecimento (antes do JSON)
+_ENRICHMENT_LABELS = {
+    "historical_context": r"Contexto\s+Hist[óo]rico",
+    "evolution": r"Evolu[çc][ãa]o",
+    "current_relevance": r"Relev[âa]ncia\s+Atual",
+    "sources_summary": r"Fontes",
+}
+
+
+def parse_enrichment(text: str) -> Optional[EnrichmentOutput]:
+    """
+    Interpreta a saída da task de enriquecimento.
+
+    Aceita o JSON pedido pela task e, como alternativa, o resumo em texto com
+    os rótulos "Contexto Histórico", "Evolução", "Relevância Atual" e "Fontes".
+
+    Args:
+        text: Saída do Pesquisador
+
+    Returns:
+        EnrichmentOutput ou None se nenhuma seção for encontrada
+    """
+    text = text or ""
+    start = text.find('{')
+    end = text.rfind('}')
+    if start != -1 and end > start:
+        try:
+            data = json.loads(text[start:end + 1])
+            if isinstance(data, dict) and 'historical_context' in data:
+                return EnrichmentOutput.model_validate(data)
+        except (json.JSONDecodeError, ValidationError):
+            pass
+
+    sections: Dict[str, str] = {}
+    alternatives = "|".join(_ENRICHMENT_LABELS.values())
+    for field, label in _ENRICHMENT_LABELS.items():
+        match = re.search(
+            rf"(?:\*\*|#+\s*)?{label}\s*:?(?:\*\*)?\s*:?\s*(.+?)(?=(?:\*\*|#+\s*|\n\s*-?\s*)(?:{alternatives})|\Z)",
+            text, re.IGNORECASE | re.DOTALL
+        )
+        if match and match.group(1).strip():
+            sections[field] = match.group(1).strip()
+    if not sections:
+        return None
+    return EnrichmentOutput(
+        historical_context=sections.get("historical_context", ""),
+        evolution=sections.get("evolution", ""),
+        current_relevance=sections.get("current_relevance", ""),
+        sources_summary=sections.get("sources_summary")
+    )
+
+
+def _classification(data: Union[ClassificationOutput, dict]) -> ClassificationOutput:
+    if isinstance(data, ClassificationOutput):
+        return data
+    data = dict(data or {})
+    data.setdefault("final_category", "")
+    data["confidence"] = str(data.get("confidence") or "")
+    try:
+        return ClassificationOutput.model_validate(data)
+    except ValidationError:
+        # Classificação parcial (ex: só categoria e confiança do stream)
+        return ClassificationOutput(final_category=str(data["final_category"]), confidence=data["confidence"])
+
+
+def _join(items: List[str], limit: int = 6) -> str:
+    items = [str(item).strip() for item in items if str(item).strip()]
+    return ", ".join(items[:limit])
+
+
+def _methodology(classification: ClassificationOutput) -> str:
+    if classification.ensemble_members or classification.method == "ensemble":
+        members = len(classification.ensemble_members or [])
+        return (f"Votação entre {members} analistas independentes, "
+                "após a classificação inicial ter ficado ambígua.")
+    if classification.method == "local":
+        return "Classificador local destilado dos rótulos do LLM (sem chamada ao modelo)."
+    if classification.method == "logprob":
+        return "Distribuição de probabilidades sobre as categorias (modo rápido por logprobs)."
+    if classification.method == "compact":
+        return "Analista com raciocínio único: entidades, categorias candidatas e justificativa."
+    steps = [step.step_name for step in classification.reasoning_steps if step.step_name]
+    if steps:
+        return f"Chain of Thought em {len(steps)} passos: {' → '.join(steps)}."
+    if classification.method == "full":
+        return "Analista com Chain of Thought: entidades, raciocínio contextual e exclusões."
+    return "Classificação do Analista (categoria e confiança, sem raciocínio estruturado)."
+
+
+def render_report(
+    classification: Union[ClassificationOutput, dict],
+    enrichment: Optional[EnrichmentOutput] = None,
+    enrichment_text: str = ""
+) -> ReportOutput:
+    """
+    Monta o relatório executivo (quatro seções em Markdown) sem chamar o LLM.
+
+    Args:
+        classification: Saída da classificação (modelo ou dicionário)
+        enrichment: Saída estruturada do enriquecimento (se None, é extraída de enrichment_text)
+        enrichment_text: Saída do Pesquisador em texto (alternativa ao modelo)
+
+    Returns:
+        ReportOutput com as seções e full_report_markdown
+    """
+    data = _classification(classification)
+    enrichment = enrichment or parse_enrichment(enrichment_text)
+    category = data.final_category or "não identificada"
+    confidence = (data.confidence or "").strip().lower()
+    entities = data.entity_analysis
+    terms = _join(entities.organizations + entities.technical_terms)
+    domains = _join(entities.knowledge_domains, limit=4)
+
+    score = f" ({data.confidence_score:.0%})" if data.confidence_score is not None else ""
+    summary_parts = [f"O texto foi classificado como **{category}**, com confiança {confidence or 'não informada'}{score}."]
+    if terms:
+        summary_parts.append(f"A decisão se apoia em entidades e termos como {terms}.")
+    if enrichment and enrichment.current_relevance:
+        summary_parts.append(f"Relevância atual: {enrichment.current_relevance}")
+    executive_summary = " ".join(summary_parts)
+
+    justification = data.contextual_reasoning or _CONFIDENCE_JUSTIFICATIONS.get(confidence, "")
+    classification_analysis = {
+        "category": category,
+        "methodology": _methodology(data),
+        "confidence": confidence,
+        "justification": justification,
+    }
+    web_context = {
+        "historical_evolution": " ".join(
+            part for part in ((enrichment.historical_context, enrichment.evolution) if enrichment else ()) if part
+        ),
+        "current_relevance": enrichment.current_relevance if enrichment else "",
+        "key_findings": list(enrichment.key_findings) if enrichment else [],
+    }
+    conclusions = {
+        "summary": f"Categoria {category} ({confidence or 'confiança não informada'}).",
+        "implications": (
+            f"O documento pode ser roteado e indexado em {category}"
+            + (f", no domínio de {domains}." if domains else ".")
+        ),
+        "value": (
+            "O enriquecimento conecta o texto original ao contexto atual do tópico."
+            if enrichment else "Sem enriquecimento web disponível nesta execução."
+        ),
+    }
+
+    lines = ["# Relatório de Classificação e Enriquecimento", "", "## 1. Resumo Executivo", "", executive_summary]
+
+    lines += ["", "## 2. Análise de Classificação", "",
+              f"- **Categoria Identificada:** {category}",
+              f"- **Confiança:** {confidence or 'não informada'}{score}",
+              f"- **Metodologia:** {classification_analysis['methodology']}"]
+    if data.candidate_categories:
+        lines.append(f"- **Candidatas consideradas:** {_join(data.candidate_categories)}")
+    if terms:
+        lines.append(f"- **Entidades e termos:** {terms}")
+    if domains:
+        lines.append(f"- **Domínios de conhecimento:** {domains}")
+    if data.probabilities:
+        top = sorted(data.probabilities.items(), key=lambda item: item[1], reverse=True)[:3]
+        lines.append("- **Probabilidades:** " + ", ".join(f"{label} {value:.0%}" for label, value in top))
+    if justification:
+        lines += ["", f"**Justificativa:** {justification}"]
+    if data.exclusion_reasoning:
+        lines += ["", f"**Exclusões:** {data.exclusion_reasoning}"]
+
+    lines += ["", "## 3. Contexto e Enriquecimento Web", ""]
+    if enrichment:
+        for title, content in (
+            ("Contexto Histórico", enrichment.historical_context),
+            ("Evolução", enrichment.evolution),
+            ("Relevância Atual", enrichment.current_relevance),
+        ):
+            if content:
+                lines += [f"**{title}:** {content}", ""]
+        if enrichment.key_findings:
+            lines += ["**Principais Descobertas:**"] + [f"- {finding}" for finding in enrichment.key_findings] + [""]
+        if enrichment.sources_summary:
+            lines += [f"**Fontes:** {enrichment.sources_summary}", ""]
+        lines.pop()
+    elif enrichment_text.strip():
+        lines.append(enrichment_text.strip())
+    else:
+        lines.append("Enriquecimento web indisponível nesta execução.")
+
+    lines += ["", "## 4. Conclusões", "",
+              f"- **Síntese:** {conclusions['summary']}",
+              f"- **Implicações:** {conclusions['implications']}",
+              f"- **Valor do enriquecimento:** {conclusions['value']}"]
+
+    return ReportOutput(
+        executive_summary=executive_summary,
+        classification_analysis=classification_analysis,
+        web_context=web_context,
+        conclusions=conclusions,
+        full_report_markdown="\n".join(lines)
+    )
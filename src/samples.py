@@ -0,0 +1,437 @@
+"""
+Índice (manifesto) de diretórios de amostras.
+
+Cada arquivo de amostra vira uma linha SQLite com caminho, categoria (do nome
+categoria___N.txt ou, no layout do 20 Newsgroups original, do subdiretório),
+tamanho, mtime, hash do conteúdo e o texto limpo. A atualização é incremental:
+os.scandir percorre o diretório e só arquivos novos ou com tamanho/mtime
+diferentes são lidos. Listar, filtrar por categoria e sortear amostras
+estratificadas viram consultas no índice, sem varrer o disco nem aplicar a
+regex do nome a cada arquivo.
+
+Uso:
+    python -m src.samples refresh [--dir data/samples] [--full]
+    python -m src.samples stats   [--dir data/samples]
+    python -m src.samples sample  [--dir data/samples] [--n 10 | --per-category 2] [--category sci.space]
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from src.config import get_config
+from src.utils import clean_text, extract_ground_truth_from_filename, read_text_window
+
+
+DEFAULT_SAMPLES_DIR = "data/samples"
+_WRITE_CHUNK = 1000
+_COLUMNS = "path, category, size, content_hash"
+
+
+@dataclass
+class SampleEntry:
+    """Amostra indexada."""
+    path: str
+    category: str
+    size: int
+    content_hash: str
+
+
+def _is_sample(name: str) -> bool:
+    # categoria___N.txt ou arquivos sem extensão (layout original do 20 Newsgroups)
+    return not name.startswith(".") and (name.endswith(".txt") or "." not in name)
+
+
+def _category(relative_path: str) -> str:
+    category = extract_ground_truth_from_filename(relative_path)
+    if not category and os.sep in relative_path:
+        # <categoria>/<arquivo>
+        category = relative_path.split(os.sep, 1)[0]
+    return category
+
+
+def _walk(root: str, relative: str = "") -> Iterator[Tuple[str, Optional[os.DirEntry], int]]:
+    """
+    Percorre o diretório com os.scandir.
+
+    Yields:
+        (caminho relativo, DirEntry, 0) para arquivos de amostra e
+        (caminho relativo, None, mtime_ns) para cada diretório visitado
+    """
+    path = os.path.join(root, relative) if relative else root
+    yield relative, None, os.stat(path).st_mtime_ns
+    subdirs = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            name = os.path.join(relative, entry.name) if relative else entry.name
+            if entry.is_dir(follow_symlinks=False):
+                if not entry.name.startswith("."):
+                    subdirs.append(name)
+            elif entry.is_file() and _is_sample(entry.name):
+                yield name, entry, 0
+    for name in subdirs:
+        yield from _walk(root, name)
+
+
+def _read(path: str) -> Tuple[str, str]:
+    # Hash em streaming e texto limitado (read_text_window): memória constante
+    with open(path, "rb") as f:
+        content_hash = hashlib.file_digest(f, "sha256").hexdigest()
+    return content_hash, clean_text(read_text_window(path))
+
+
+class SampleIndex:
+    """Índice SQLite de diretórios de amostras, atualizado incrementalmente."""
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or get_config().sample_index_db_path
+        if self.db_path != ":memory:":
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS samples (
+                directory TEXT NOT NULL,
+                path TEXT NOT NULL,
+                category TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                content_hash TEXT NOT NULL,
+                clean_text TEXT NOT NULL,
+                PRIMARY KEY (directory, path)
+            );
+            CREATE INDEX IF NOT EXISTS idx_samples_category ON samples (directory, category, path);
+            CREATE TABLE IF NOT EXISTS directories (
+                directory TEXT NOT NULL,
+                path TEXT NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                PRIMARY KEY (directory, path)
+            );
+        """)
+
+    @staticmethod
+    def _root(directory: str) -> str:
+        return os.path.abspath(directory)
+
+    def refresh(self, directory: str = DEFAULT_SAMPLES_DIR, full: bool = False) -> Dict[str, int]:
+        """
+        Sincroniza o índice com o diretório.
+
+        Só arquivos novos ou com tamanho/mtime diferentes do índice são lidos
+        (hash e texto limpo); arquivos removidos saem do índice.
+
+        Args:
+            directory: Diretório de amostras (percorrido recursivamente)
+            full: Reler todos os arquivos, mesmo sem mudança de mtime
+
+        Returns:
+            Contagem de arquivos adicionados, atualizados, removidos e inalterados
+
+        Raises:
+            FileNotFoundError: Se o diretório não existir
+        """
+        root = self._root(directory)
+        with self._lock:
+            known = {
+                path: (size, mtime_ns) for path, size, mtime_ns in self._conn.execute(
+                    "SELECT path, size, mtime_ns FROM samples WHERE directory = ?", (root,)
+                )
+            }
+
+        stats = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+        seen = set()
+        directories = []
+        pending = []
+        for relative, entry, dir_mtime in _walk(root):
+            if entry is None:
+                directories.append((root, relative, dir_mtime))
+                continue
+            seen.add(relative)
+            stat = entry.stat()
+            signature = (stat.st_size, stat.st_mtime_ns)
+            if not full and known.get(relative) == signature:
+                stats["unchanged"] += 1
+                continue
+            try:
+                content_hash, text = _read(entry.path)
+            except OSError as e:
+                print(f"⚠️ Não foi possível indexar {entry.path}: {e}")
+                continue
+            stats["updated" if relative in known else "added"] += 1
+            pending.append((root, relative, _category(relative), *signature, content_hash, text))
+            if len(pending) >= _WRITE_CHUNK:
+                self._upsert(pending)
+                pending = []
+        self._upsert(pending)
+
+        removed = [(root, path) for path in known if path not in seen]
+        stats["removed"] = len(removed)
+        with self._lock:
+            self._conn.executemany("DELETE FROM samples WHERE directory = ? AND path = ?", removed)
+            self._conn.execute("DELETE FROM directories WHERE directory = ?", (root,))
+            self._conn.executemany("INSERT INTO directories (directory, path, mtime_ns) VALUES (?, ?, ?)", directories)
+            self._conn.commit()
+        return stats
+
+    def _upsert(self, rows: List[tuple]):
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO samples "
+                "(directory, path, category, size, mtime_ns, content_hash, clean_text) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+    def ensure_fresh(self, directory: str = DEFAULT_SAMPLES_DIR) -> bool:
+        """
+        Atualiza o índice se algum diretório mudou (arquivo criado, removido ou
+        renomeado). Verifica só o mtime dos diretórios, então é barato mesmo com
+        centenas de milhares de arquivos; edições no lugar são detectadas por
+        lookup() ou por refresh().
+
+        Args:
+            directory: Diretório de amostras
+
+        Returns:
+            True se o índice foi atualizado
+        """
+        root = self._root(directory)
+        with self._lock:
+            stored = self._conn.execute(
+                "SELECT path, mtime_ns FROM directories WHERE directory = ?", (root,)
+            ).fetchall()
+        try:
+            if stored and all(
+                os.stat(os.path.join(root, path) if path else root).st_mtime_ns == mtime_ns
+                for path, mtime_ns in stored
+            ):
+                return False
+        except FileNotFoundError:
+            pass
+        self.refresh(directory)
+        return True
+
+    def _entry(self, root: str, row: tuple) -> SampleEntry:
+        path, category, size, content_hash = row
+        return SampleEntry(os.path.join(root, path), category, size, content_hash)
+
+    def entries(
+        self,
+        directory: str = DEFAULT_SAMPLES_DIR,
+        category: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0
+    ) -> List[SampleEntry]:
+        """
+        Lista as amostras indexadas em ordem de caminho.
+
+        Args:
+            directory: Diretório de amostras
+            category: Filtrar por categoria (None lista todas)
+            limit: Número máximo de amostras (None sem limite)
+            offset: Amostras a pular (paginação)
+
+        Returns:
+            Lista de SampleEntry (caminho absoluto, categoria, tamanho e hash)
+        """
+        root = self._root(directory)
+        query = f"SELECT {_COLUMNS} FROM samples WHERE directory = ?"
+        params: list = [root]
+        if category is not None:
+            query += " AND category = ?"
+            params.append(category)
+        query += " ORDER BY category, path LIMIT ? OFFSET ?"
+        params += [-1 if limit is None else limit, offset]
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [self._entry(root, row) for row in rows]
+
+    def categories(self, directory: str = DEFAULT_SAMPLES_DIR) -> Dict[str, int]:
+        """Número de amostras por categoria."""
+        with self._lock:
+            return dict(self._conn.execute(
+                "SELECT category, COUNT(*) FROM samples WHERE directory = ? GROUP BY category ORDER BY category",
+                (self._root(directory),)
+            ).fetchall())
+
+    def stratified_sample(
+        self,
+        directory: str = DEFAULT_SAMPLES_DIR,
+        n: Optional[int] = None,
+        per_category: Optional[int] = None,
+        categories: Optional[List[str]] = None,
+        seed: Optional[int] = None
+    ) -> List[SampleEntry]:
+        """
+        Sorteia amostras equilibradas entre as categorias.
+
+        Cada sorteio é uma consulta pelo índice (categoria, posição), sem
+        carregar a lista completa de arquivos.
+
+        Args:
+            directory: Diretório de amostras
+            n: Total de amostras, distribuído em rodízio entre as categorias
+            per_category: Amostras por categoria (alternativa a n)
+            categories: Restringir a estas categorias
+            seed: Semente do sorteio (reprodutível)
+
+        Returns:
+            Lista de SampleEntry sem repetições
+        """
+        rng = random.Random(seed)
+        counts = self.categories(directory)
+        if categories is not None:
+            counts = {category: counts[category] for category in categories if category in counts}
+
+        quotas = {category: 0 for category in counts}
+        if per_category is not None:
+            quotas = {category: min(per_category, count) for category, count in counts.items()}
+        else:
+            remaining = min(n or 0, sum(counts.values()))
+            order = list(counts)
+            rng.shuffle(order)
+            while remaining:
+                for category in order:
+                    if remaining and quotas[category] < counts[category]:
+                        quotas[category] += 1
+                        remaining -= 1
+
+        root = self._root(directory)
+        sample = []
+        with self._lock:
+            for category, quota in quotas.items():
+                for position in sorted(rng.sample(range(counts[category]), quota)):
+                    row = self._conn.execute(
+                        f"SELECT {_COLUMNS} FROM samples WHERE directory = ? AND category = ? "
+                        "ORDER BY path LIMIT 1 OFFSET ?",
+                        (root, category, position)
+                    ).fetchone()
+                    if row:
+                        sample.append(self._entry(root, row))
+        rng.shuffle(sample)
+        return sample
+
+    def _locate(self, path: str) -> Tuple[Optional[str], str]:
+        absolute = os.path.abspath(path)
+        with self._lock:
+            roots = [row[0] for row in self._conn.execute("SELECT DISTINCT directory FROM directories")]
+        # Diretório indexado mais específico que contém o arquivo
+        for root in sorted(roots, key=len, reverse=True):
+            if absolute.startswith(root + os.sep):
+                return root, os.path.relpath(absolute, root)
+        return None, absolute
+
+    def lookup(self, path: str) -> Optional[SampleEntry]:
+        """
+        Retorna a amostra indexada de um arquivo, reindexando-o se o tamanho ou
+        o mtime mudaram (ex: arquivo reescrito com o mesmo nome).
+
+        Args:
+            path: Caminho do arquivo (dentro de um diretório já indexado)
+
+        Returns:
+            SampleEntry ou None se o arquivo não estiver em um diretório indexado
+            ou não existir
+        """
+        root, relative = self._locate(path)
+        if root is None:
+            return None
+        try:
+            stat = os.stat(os.path.join(root, relative))
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, category, content_hash FROM samples WHERE directory = ? AND path = ?",
+                (root, relative)
+            ).fetchone()
+        if row and row[:2] == (stat.st_size, stat.st_mtime_ns):
+            return SampleEntry(os.path.join(root, relative), row[2], stat.st_size, row[3])
+
+        content_hash, text = _read(os.path.join(root, relative))
+        category = _category(relative)
+        self._upsert([(root, relative, category, stat.st_size, stat.st_mtime_ns, content_hash, text)])
+        return SampleEntry(os.path.join(root, relative), category, stat.st_size, content_hash)
+
+    def clean_text(self, path: str) -> Optional[str]:
+        """
+        Texto limpo (clean_text) de uma amostra, do cache do índice.
+
+        Returns:
+            Texto limpo ou None se o arquivo não estiver indexado
+        """
+        entry = self.lookup(path)
+        if entry is None:
+            return None
+        root, relative = self._locate(path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT clean_text FROM samples WHERE directory = ? AND path = ?", (root, relative)
+            ).fetchone()
+        return row[0] if row else None
+
+
+_index: Optional[SampleIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_sample_index() -> SampleIndex:
+    """Retorna o índice de amostras do processo."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SampleIndex()
+        return _index
+
+
+def main():
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Índice de diretórios de amostras do VerbaFlow")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    refresh_parser = subparsers.add_parser("refresh", help="Sincronizar o índice com o diretório")
+    refresh_parser.add_argument("--dir", default=DEFAULT_SAMPLES_DIR)
+    refresh_parser.add_argument("--full", action="store_true", help="Reler todos os arquivos")
+
+    stats_parser = subparsers.add_parser("stats", help="Amostras por categoria")
+    stats_parser.add_argument("--dir", default=DEFAULT_SAMPLES_DIR)
+
+    sample_parser = subparsers.add_parser("sample", help="Sorteio estratificado")
+    sample_parser.add_argument("--dir", default=DEFAULT_SAMPLES_DIR)
+    sample_parser.add_argument("--n", type=int, default=10)
+    sample_parser.add_argument("--per-category", type=int, default=None)
+    sample_parser.add_argument("--category", action="append", default=None, help="Restringir a uma categoria")
+    sample_parser.add_argument("--seed", type=int, default=None)
+
+    args = parser.parse_args()
+    index = get_sample_index()
+
+    if args.command == "refresh":
+        start = time.perf_counter()
+        stats = index.refresh(args.dir, full=args.full)
+        print(json.dumps({**stats, "seconds": round(time.perf_counter() - start, 3)}, indent=2))
+    elif args.command == "stats":
+        index.ensure_fresh(args.dir)
+        counts = index.categories(args.dir)
+        print(json.dumps({"total": sum(counts.values()), "categories": counts}, ensure_ascii=False, indent=2))
+    else:
+        index.ensure_fresh(args.dir)
+        for entry in index.stratified_sample(args.dir, n=args.n, per_category=args.per_category,
+                                             categories=args.category, seed=args.seed):
+            print(f"{entry.category}\t{entry.path}")
+
+
+if __name__ == "__main__":
+    main()
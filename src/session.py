@@ -0,0 +1,39 @@
+"""
+Contexto de credenciais e modelo de uma sessão.
+
+A interface atende várias sessões no mesmo processo: em vez de gravar chaves
+e modelo em os.environ (compartilhado entre todas), cada execução recebe um
+SessionContext explícito, repassado para get_llm, as fábricas de agentes e
+as ferramentas. Campos vazios caem para a configuração e as variáveis de
+ambiente do processo (CLI, API, workers).
+"""
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+from src.config import get_config
+
+
+@dataclass(frozen=True)
+class SessionContext:
+    """Credenciais e modelo de uma sessão (imutável: seguro entre threads)."""
+
+    groq_api_key: Optional[str] = None
+    tavily_api_key: Optional[str] = None
+    model_name: Optional[str] = None
+
+    def resolve_groq_key(self) -> Optional[str]:
+        """Chave Groq da sessão, da configuração ou de GROQ_API_KEY."""
+        return self.groq_api_key or get_config().groq_api_key or os.getenv("GROQ_API_KEY")
+
+    def resolve_tavily_key(self) -> Optional[str]:
+        """Chave Tavily da sessão, da configuração ou de TAVILY_API_KEY."""
+        return self.tavily_api_key or get_config().tavily_api_key or os.getenv("TAVILY_API_KEY")
+
+    def resolve_model(self, model_name: Optional[str] = None) -> str:
+        """Modelo pedido explicitamente, o da sessão ou o padrão da configuração."""
+        return model_name or self.model_name or get_config().groq_model
+
+
+# Sem sessão: apenas configuração e variáveis de ambiente do processo
+DEFAULT_SESSION = SessionContext()
@@ -0,0 +1,531 @@
+"""
+Execuções em lote particionadas (shards) para múltiplos processos e nós.
+
+Fluxo (o diretório da execução deve estar em um volume compartilhado):
+    python -m src.sharding plan  --source data/samples --run-dir runs/r1 --shards 16
+    python -m src.sharding work  --run-dir runs/r1 --processes 4     # em cada nó
+    python -m src.sharding merge --run-dir runs/r1
+
+Estrutura de <run-dir>:
+    plan.json                  Parâmetros da execução
+    shards/shard-00000.json    Manifesto de cada shard (documentos atribuídos)
+    claims/shard-00000.claim   Reserva exclusiva (O_EXCL) por um worker
+    results/shard-00000.jsonl  Resultados confirmados (escrita atômica via os.replace)
+    results.jsonl              Saída consolidada do merge
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+from src.config import get_config
+from src.corpus import CORPUS_SUFFIX, make_ref, open_corpus
+from src.labels import NEWSGROUPS_LABEL_SET, LabelSet, get_label_set, load_csv_label_set
+from src.samples import get_sample_index
+from src.utils import (
+    load_custom_csv,
+    detect_csv_columns,
+    get_text_from_file
+)
+
+
+class ShardAbandoned(Exception):
+    """A reserva do shard foi recuperada por outro worker; o resultado não é confirmado."""
+
+
+def load_documents(source: str) -> List[dict]:
+    """
+    Lista os documentos de uma fonte (diretório de amostras, corpus empacotado ou CSV).
+
+    Args:
+        source: Diretório de amostras (ver src/samples.py), corpus empacotado
+            (.jsonl, ver src/corpus.py) ou caminho de um CSV
+
+    Returns:
+        Lista de referências {"id", "path", "row", "ground_truth"}, ordenada por id
+
+    Raises:
+        ValueError: Se a fonte não existir ou o CSV não tiver colunas reconhecíveis
+    """
+    if os.path.isdir(source):
+        # Listagem e categorias vêm do índice (atualizado só se o diretório mudou)
+        index = get_sample_index()
+        index.ensure_fresh(source)
+        root = os.path.abspath(source)
+        documents = [
+            {
+                "id": os.path.relpath(entry.path, root),
+                "path": entry.path,
+                "row": None,
+                "ground_truth": entry.category
+            }
+            for entry in index.entries(source)
+        ]
+        return sorted(documents, key=lambda doc: doc["id"])
+
+    if os.path.isfile(source) and source.endswith(CORPUS_SUFFIX):
+        # Corpus empacotado: ids e categorias do índice, textos lidos por referência
+        corpus = open_corpus(source)
+        return sorted(
+            (
+                {"id": doc_id, "path": make_ref(source, doc_id), "row": None, "ground_truth": corpus.category(doc_id)}
+                for doc_id in corpus.ids
+            ),
+            key=lambda doc: doc["id"]
+        )
+
+    if os.path.isfile(source) and source.lower().endswith(".csv"):
+        df = load_custom_csv(source)
+        text_col, category_col = detect_csv_columns(df)
+        if not text_col:
+            raise ValueError(f"Coluna de texto não encontrada em {source}")
+        name = os.path.basename(source)
+        return [
+            {
+                "id": f"{name}:{row}",
+                "path": source,
+                "row": int(row),
+                "ground_truth": str(df.iloc[row][category_col]) if category_col else ""
+            }
+            for row in range(len(df))
+        ]
+
+    raise ValueError(f"Fonte não encontrada ou não suportada: {source}")
+
+
+def read_document_text(document: dict, csv_cache: Optional[dict] = None) -> str:
+    """
+    Lê o texto de uma referência de documento.
+
+    Args:
+        document: Referência produzida por load_documents
+        csv_cache: Cache opcional {caminho: DataFrame} para não reler o CSV
+
+    Returns:
+        Texto bruto do documento
+    """
+    if document.get("row") is None:
+        return get_text_from_file(document["path"])
+
+    csv_cache = csv_cache if csv_cache is not None else {}
+    if document["path"] not in csv_cache:
+        csv_cache[document["path"]] = load_custom_csv(document["path"])
+    df = csv_cache[document["path"]]
+    text_col, _ = detect_csv_columns(df)
+    return str(df.iloc[document["row"]][text_col])
+
+
+def source_label_set(source: str) -> dict:
+    """
+    Label set de uma fonte, no formato gravado nos manifestos.
+
+    CSVs usam as próprias categorias (coluna detectada); diretórios de
+    amostras e corpus empacotados usam as do 20 Newsgroups.
+
+    Args:
+        source: Fonte aceita por load_documents
+
+    Returns:
+        {"label_set": nome, "label_set_column": coluna de categoria do CSV ou None}
+    """
+    if os.path.isfile(source) and source.lower().endswith(".csv"):
+        _, category_col = detect_csv_columns(load_custom_csv(source))
+        if category_col:
+            return {"label_set": load_csv_label_set(source, category_col).name, "label_set_column": category_col}
+        print(f"⚠️ {source} sem coluna de categoria: classificando com as categorias do 20 Newsgroups")
+    return {"label_set": NEWSGROUPS_LABEL_SET.name, "label_set_column": None}
+
+
+def manifest_label_set(manifest: dict) -> LabelSet:
+    """Resolve o label set gravado no manifesto de um shard (ou no plan.json)."""
+    if manifest.get("label_set_column"):
+        # CSV da própria fonte: o manifesto é gravado pelo plan, não vem de requisições
+        return load_csv_label_set(manifest["label_set"], manifest["label_set_column"])
+    return get_label_set(manifest.get("label_set"))
+
+
+def assign_shard(doc_id: str, num_shards: int) -> int:
+    """
+    Atribui deterministicamente um documento a um shard (hash estável do id).
+
+    Args:
+        doc_id: Identificador do documento
+        num_shards: Número total de shards
+
+    Returns:
+        Índice do shard (0 a num_shards - 1)
+    """
+    digest = hashlib.sha1(doc_id.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % num_shards
+
+
+def _shard_name(shard: int) -> str:
+    return f"shard-{shard:05d}"
+
+
+def plan_shards(source: str, run_dir: str, num_shards: int, stage: str = "classify") -> dict:
+    """
+    Particiona a fonte e grava um manifesto por shard.
+
+    Args:
+        source: Diretório de amostras ou CSV
+        run_dir: Diretório (compartilhado) da execução
+        num_shards: Número de shards
+        stage: Etapa do pipeline a executar em cada documento
+
+    Returns:
+        Conteúdo de plan.json
+
+    Raises:
+        ValueError: Se num_shards não for positivo
+    """
+    if num_shards < 1:
+        raise ValueError(f"Número de shards inválido: {num_shards} (mínimo 1)")
+    documents = load_documents(source)
+    labels = source_label_set(source)
+    buckets = [[] for _ in range(num_shards)]
+    for document in documents:
+        buckets[assign_shard(document["id"], num_shards)].append(document)
+
+    run_path = Path(run_dir)
+    for subdir in ("shards", "claims", "results"):
+        (run_path / subdir).mkdir(parents=True, exist_ok=True)
+
+    for shard, docs in enumerate(buckets):
+        manifest = {"shard": shard, "stage": stage, **labels, "count": len(docs), "documents": docs}
+        (run_path / "shards" / f"{_shard_name(shard)}.json").write_text(
+            json.dumps(manifest, ensure_ascii=False), encoding="utf-8"
+        )
+
+    plan = {
+        "source": source,
+        "stage": stage,
+        **labels,
+        "num_shards": num_shards,
+        "num_documents": len(documents),
+        "created_at": datetime.now().isoformat()
+    }
+    (run_path / "plan.json").write_text(json.dumps(plan, indent=2), encoding="utf-8")
+    print(f"Plano criado: {len(documents)} documentos em {num_shards} shards ({run_dir})")
+    return plan
+
+
+def claim_shard(run_dir: str, worker_id: str, stale_after: Optional[float] = None) -> Optional[int]:
+    """
+    Reserva o próximo shard pendente.
+
+    A reserva é um arquivo criado com O_CREAT | O_EXCL, atômico inclusive em
+    volumes de rede compartilhados. Reservas sem commit mais antigas que
+    `stale_after` (worker morto) são recuperadas.
+
+    Args:
+        run_dir: Diretório da execução
+        worker_id: Identificador do worker
+        stale_after: Segundos até uma reserva sem commit ser considerada abandonada
+
+    Returns:
+        Índice do shard reservado ou None se não houver shards pendentes
+    """
+    stale_after = stale_after if stale_after is not None else get_config().shard_claim_timeout
+    run_path = Path(run_dir)
+    plan = json.loads((run_path / "plan.json").read_text(encoding="utf-8"))
+
+    for shard in range(plan["num_shards"]):
+        name = _shard_name(shard)
+        if (run_path / "results" / f"{name}.jsonl").exists():
+            continue
+
+        claim_path = run_path / "claims" / f"{name}.claim"
+        try:
+            if claim_path.exists() and time.time() - claim_path.stat().st_mtime > stale_after:
+                # Renomear é atômico: só um worker recupera a reserva abandonada
+                tombstone = claim_path.with_suffix(f".stale-{worker_id.replace(':', '-')}")
+                os.rename(claim_path, tombstone)
+                if time.time() - tombstone.stat().st_mtime <= stale_after:
+                    # Outro worker acabou de reservar; devolver a reserva
+                    os.rename(tombstone, claim_path)
+                    continue
+                tombstone.unlink()
+            fd = os.open(claim_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except (FileExistsError, FileNotFoundError):
+            continue
+
+        with os.fdopen(fd, "w") as f:
+            f.write(json.dumps({"worker_id": worker_id, "claimed_at": time.time()}))
+        return shard
+
+    return None
+
+
+class ClaimHeartbeat:
+    """
+    Mantém a reserva de um shard fresca (mtime do arquivo) em uma thread
+    própria, independente da duração de cada documento. Se a reserva sumir
+    ou passar a ser de outro worker, marca o shard como perdido.
+    """
+
+    def __init__(self, claim_path: Path, worker_id: Optional[str] = None, interval: Optional[float] = None):
+        self.claim_path = claim_path
+        self.worker_id = worker_id
+        self.interval = interval or max(1.0, get_config().shard_claim_timeout / 4)
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"claim-{claim_path.stem}", daemon=True)
+
+    def __enter__(self):
+        self.beat()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def beat(self):
+        """Renova a reserva (ou marca o shard como perdido)."""
+        if self.lost:
+            return
+        try:
+            if self.worker_id is not None:
+                owner = json.loads(self.claim_path.read_text(encoding="utf-8") or "{}").get("worker_id")
+                if owner != self.worker_id:
+                    raise FileNotFoundError(self.claim_path)
+            os.utime(self.claim_path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            # Recuperada por outro worker (reserva renomeada ou recriada)
+            self.lost = True
+
+    def _run(self):
+        while not self.lost and not self._stop.wait(self.interval):
+            self.beat()
+
+
+def run_shard(run_dir: str, shard: int, threads: Optional[int] = None, worker_id: Optional[str] = None) -> int:
+    """
+    Processa todos os documentos de um shard e confirma o resultado.
+
+    Os resultados são gravados em um arquivo temporário e publicados com
+    os.replace, então um shard nunca fica parcialmente confirmado.
+
+    Args:
+        run_dir: Diretório da execução
+        shard: Índice do shard reservado
+        threads: Requisições concorrentes dentro do shard
+        worker_id: Dono da reserva (verificado no heartbeat, se informado)
+
+    Returns:
+        Número de documentos processados
+
+    Raises:
+        ShardAbandoned: Se a reserva foi recuperada por outro worker
+    """
+    # Import tardio: CrewAI só é carregado nos processos que executam shards
+    from src.pipeline import STAGE_CLASSIFY, run_batch_classification, run_pipeline
+
+    run_path = Path(run_dir)
+    name = _shard_name(shard)
+    claim_path = run_path / "claims" / f"{name}.claim"
+    manifest = json.loads((run_path / "shards" / f"{name}.json").read_text(encoding="utf-8"))
+    label_set = manifest_label_set(manifest)
+    documents = manifest["documents"]
+    csv_cache = {}
+
+    def check_claim(*_):
+        if heartbeat.lost:
+            raise ShardAbandoned(f"{name}: reserva recuperada por outro worker")
+
+    def process(document: dict) -> dict:
+        check_claim()
+        try:
+            record = run_pipeline(
+                read_document_text(document, csv_cache),
+                ground_truth=document["ground_truth"],
+                stage=manifest["stage"],
+                capture_trace=False,
+                label_set=label_set
+            )
+            record.pop("trace_output", None)
+        except Exception as e:
+            record = {"error": str(e)}
+        return dict(record, doc_id=document["id"], shard=shard)
+
+    def classify_batched() -> List[dict]:
+        # Linhas de CSV só classificadas: vários textos por chamada (run_batch_classification)
+        results = run_batch_classification(
+            [read_document_text(document, csv_cache) for document in documents],
+            label_set=label_set,
+            max_workers=threads,
+            on_progress=check_claim,
+            ground_truths=[document["ground_truth"] for document in documents]
+        )
+        records = []
+        for document, result in zip(documents, results):
+            predicted = result.get("predicted") or ""
+            ground_truth = document["ground_truth"]
+            records.append(dict(
+                result,
+                stage=STAGE_CLASSIFY,
+                label_set=label_set.name,
+                ground_truth=ground_truth,
+                is_correct=bool(predicted and ground_truth) and predicted.lower() == ground_truth.lower(),
+                doc_id=document["id"],
+                shard=shard
+            ))
+        return records
+
+    # Carregar CSVs antes de paralelizar (evita leituras duplicadas entre threads)
+    for document in documents:
+        if document.get("row") is not None and document["path"] not in csv_cache:
+            csv_cache[document["path"]] = load_custom_csv(document["path"])
+
+    batched = manifest["stage"] == STAGE_CLASSIFY and bool(documents) and all(
+        document.get("row") is not None for document in documents
+    )
+    with ClaimHeartbeat(claim_path, worker_id) as heartbeat:
+        if batched:
+            records = classify_batched()
+        else:
+            with ThreadPoolExecutor(max_workers=threads or get_config().shard_threads) as executor:
+                records = list(executor.map(process, documents))
+        heartbeat.beat()
+        if heartbeat.lost:
+            raise ShardAbandoned(f"{name}: reserva recuperada por outro worker")
+
+    tmp_path = run_path / "results" / f"{name}.jsonl.tmp-{os.getpid()}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    os.replace(tmp_path, run_path / "results" / f"{name}.jsonl")
+    return len(records)
+
+
+def work(run_dir: str, threads: Optional[int] = None):
+    """
+    Loop de um worker: reserva e executa shards até não restar nenhum pendente.
+
+    Args:
+        run_dir: Diretório da execução
+        threads: Requisições concorrentes dentro de cada shard
+    """
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    while True:
+        shard = claim_shard(run_dir, worker_id)
+        if shard is None:
+            print(f"Worker {worker_id}: nenhum shard pendente")
+            return
+        start = time.time()
+        try:
+            count = run_shard(run_dir, shard, threads, worker_id)
+        except ShardAbandoned as e:
+            print(f"⚠️ Worker {worker_id}: shard abandonado ({e})")
+            continue
+        print(f"Worker {worker_id}: {_shard_name(shard)} confirmado ({count} docs em {time.time() - start:.1f}s)")
+
+
+def merge_shards(run_dir: str, output_path: Optional[str] = None, allow_partial: bool = False) -> dict:
+    """
+    Consolida os resultados de todos os shards em um único arquivo JSONL.
+
+    Args:
+        run_dir: Diretório da execução
+        output_path: Arquivo de saída (padrão: <run_dir>/results.jsonl)
+        allow_partial: Consolidar mesmo com shards pendentes
+
+    Returns:
+        Resumo com totais, erros e acurácia
+
+    Raises:
+        RuntimeError: Se houver shards sem commit e allow_partial for False
+    """
+    run_path = Path(run_dir)
+    plan = json.loads((run_path / "plan.json").read_text(encoding="utf-8"))
+    output_path = output_path or str(run_path / "results.jsonl")
+
+    pending = [
+        shard for shard in range(plan["num_shards"])
+        if not (run_path / "results" / f"{_shard_name(shard)}.jsonl").exists()
+    ]
+    if pending and not allow_partial:
+        raise RuntimeError(f"{len(pending)} shards ainda sem commit: {pending[:10]}")
+
+    total = errors = labeled = correct = 0
+    records = []
+    for shard in range(plan["num_shards"]):
+        shard_path = run_path / "results" / f"{_shard_name(shard)}.jsonl"
+        if not shard_path.exists():
+            continue
+        with open(shard_path, encoding="utf-8") as f:
+            records.extend(json.loads(line) for line in f if line.strip())
+
+    # Ordem estável independente de quantos workers/shards participaram
+    records.sort(key=lambda record: record["doc_id"])
+    with open(output_path, "w", encoding="utf-8") as f:
+        for record in records:
+            total += 1
+            if "error" in record:
+                errors += 1
+            elif record.get("ground_truth"):
+                labeled += 1
+                correct += int(bool(record.get("is_correct")))
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    summary = {
+        "output": output_path,
+        "documents": total,
+        "errors": errors,
+        "pending_shards": pending,
+        "accuracy": correct / labeled if labeled else None
+    }
+    print(json.dumps(summary, indent=2))
+    return summary
+
+
+def main():
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Execuções em lote particionadas do VerbaFlow")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    plan_parser = subparsers.add_parser("plan", help="Particionar a fonte em shards")
+    plan_parser.add_argument("--source", required=True, help="Diretório de amostras ou CSV")
+    plan_parser.add_argument("--run-dir", required=True, help="Diretório compartilhado da execução")
+    plan_parser.add_argument("--shards", type=int, required=True, help="Número de shards")
+    plan_parser.add_argument("--stage", default="classify", choices=["classify", "enrich", "report"])
+
+    work_parser = subparsers.add_parser("work", help="Reservar e executar shards pendentes")
+    work_parser.add_argument("--run-dir", required=True)
+    work_parser.add_argument("--processes", type=int, default=1, help="Processos worker neste nó")
+    work_parser.add_argument("--threads", type=int, default=None, help="Requisições concorrentes por shard")
+
+    merge_parser = subparsers.add_parser("merge", help="Consolidar resultados dos shards")
+    merge_parser.add_argument("--run-dir", required=True)
+    merge_parser.add_argument("--output", default=None)
+    merge_parser.add_argument("--allow-partial", action="store_true")
+
+    args = parser.parse_args()
+    if args.command == "plan":
+        plan_shards(args.source, args.run_dir, args.shards, args.stage)
+    elif args.command == "work":
+        processes = [
+            multiprocessing.Process(target=work, args=(args.run_dir, args.threads))
+            for _ in range(max(1, args.processes))
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+    else:
+        merge_shards(args.run_dir, args.output, args.allow_partial)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Coalescência de requisições (single-flight).
+Chamadas concorrentes com a mesma chave compartilham uma única execução.
+"""
+import threading
+from typing import Callable, Dict, Tuple
+
+
+class _Call:
+    """Execução em andamento compartilhada pelas chamadas com a mesma chave."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Garante que, para cada chave, apenas uma execução de `fn` esteja em andamento.
+
+    A primeira chamada executa `fn`; as demais que chegarem enquanto ela roda
+    aguardam e recebem o mesmo resultado (ou a mesma exceção). Assim que a
+    execução termina a chave é liberada: não é um cache.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key: str, fn: Callable) -> Tuple[object, bool]:
+        """
+        Executa `fn` uma única vez por chave entre chamadas concorrentes.
+
+        Args:
+            key: Chave de coalescência (ex: hash do texto)
+            fn: Função sem argumentos a executar
+
+        Returns:
+            Tupla (resultado, compartilhado), onde compartilhado indica que a
+            chamada reaproveitou a execução de outra requisição
+
+        Raises:
+            Exception: A mesma exceção levantada por `fn`
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executions += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+        if call.error is not None:
+            raise call.error
+        return call.result, False
+
+    def stats(self) -> dict:
+        """Retorna contadores de execuções reais e requisições coalescidas."""
+        with self._lock:
+            return {
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls)
+            }
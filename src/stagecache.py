@@ -0,0 +1,343 @@
+"""
+Cache de resultados por etapa do pipeline.
+
+Cada etapa recebe apenas os campos que declara precisar das etapas
+anteriores (projeção de contexto em src/tasks.py); a chave do cache é o
+fingerprint desses campos, do modelo e da etapa. O enriquecimento, por
+exemplo, depende só da categoria e das candidatas, então textos diferentes
+da mesma categoria reaproveitam a mesma pesquisa web enquanto ela não expira.
+
+O cache tem duas camadas: um LRU em memória na frente de um backend
+compartilhado (SQLite em um volume comum ou servidor Redis). Réplicas da
+interface e workers apontados para o mesmo backend reaproveitam o trabalho
+umas das outras; o LRU evita a ida ao backend para os resultados recentes
+da própria réplica. Modelos Pydantic de src/models.py são serializados com
+o nome da classe e voltam como o mesmo modelo.
+"""
+import json
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from pydantic import BaseModel
+
+from src import models
+from src.cassette import fingerprint
+from src.config import get_config
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+
+STAGE_CACHE_BACKENDS = ("sqlite", "redis", "memory")
+
+# Marcador dos modelos Pydantic serializados
+_MODEL_TAG = "__model__"
+
+
+def _to_json(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return {_MODEL_TAG: type(value).__name__, "data": value.model_dump(mode="json")}
+    if isinstance(value, dict):
+        return {key: _to_json(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_json(item) for item in value]
+    return value
+
+
+def _from_json(value: Any) -> Any:
+    if isinstance(value, dict):
+        if _MODEL_TAG in value:
+            model = getattr(models, value[_MODEL_TAG], None)
+            if isinstance(model, type) and issubclass(model, BaseModel):
+                return model.model_validate(value["data"])
+            # Classe fora de src/models.py: volta como dicionário
+            return value["data"]
+        return {key: _from_json(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_from_json(item) for item in value]
+    return value
+
+
+def encode_value(value: Any) -> bytes:
+    """Serializa um valor (JSON, dicionários, listas e modelos de src/models.py) em JSON comprimido."""
+    return zlib.compress(json.dumps(_to_json(value), ensure_ascii=False).encode("utf-8"), 9)
+
+
+def decode_value(blob: bytes) -> Any:
+    """Inverso de encode_value."""
+    return _from_json(json.loads(zlib.decompress(blob)))
+
+
+class CacheBackend(ABC):
+    """Camada compartilhada do cache: valores já serializados, por etapa e chave."""
+
+    name = "base"
+
+    @abstractmethod
+    def get(self, stage: str, key: str) -> Optional[Tuple[bytes, float]]:
+        """Valor e instante de gravação (time.time()), ou None se ausente ou expirado."""
+
+    @abstractmethod
+    def set(self, stage: str, key: str, value: bytes):
+        """Grava o valor (a validade conta a partir de agora)."""
+
+
+class SQLiteBackend(CacheBackend):
+    """
+    Arquivo SQLite compartilhado pelos processos que enxergam o mesmo arquivo.
+    Usa journal_mode=DELETE (sem a memória compartilhada do WAL), então o
+    arquivo pode ficar em um volume comum; com muitos nós escrevendo ao mesmo
+    tempo, prefira o backend redis.
+    """
+
+    name = "sqlite"
+    # Limpeza de expirados a cada N gravações
+    PURGE_EVERY = 100
+
+    def __init__(self, path: Optional[str] = None, ttl: Optional[float] = None):
+        config = get_config()
+        self.path = path or config.stage_cache_path
+        self.ttl = config.stage_cache_ttl if ttl is None else ttl
+        if self.path != ":memory:":
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30.0)
+        self._conn.executescript("""
+            PRAGMA journal_mode=DELETE;
+            CREATE TABLE IF NOT EXISTS stages (
+                key TEXT PRIMARY KEY,
+                stage TEXT NOT NULL,
+                value BLOB NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_stages_created ON stages (created_at);
+        """)
+
+    def get(self, stage: str, key: str) -> Optional[Tuple[bytes, float]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM stages WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or (self.ttl and time.time() - row[1] > self.ttl):
+            return None
+        return row[0], row[1]
+
+    def set(self, stage: str, key: str, value: bytes):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO stages (key, stage, value, created_at) VALUES (?, ?, ?, ?)",
+                (key, stage, value, now)
+            )
+            self._writes += 1
+            if self.ttl and self._writes % self.PURGE_EVERY == 1:
+                # Expirados saem do arquivo compartilhado (não só das leituras)
+                self._conn.execute("DELETE FROM stages WHERE created_at < ?", (now - self.ttl,))
+            self._conn.commit()
+
+
+class RedisBackend(CacheBackend):
+    """Servidor Redis (ou compatível); a validade fica a cargo do servidor (EX)."""
+
+    name = "redis"
+
+    def __init__(self, url: Optional[str] = None, ttl: Optional[float] = None):
+        if not REDIS_AVAILABLE:
+            raise ImportError("STAGE_CACHE_BACKEND=redis requer o pacote redis (pip install redis)")
+        config = get_config()
+        self.url = url or config.stage_cache_url
+        if not self.url:
+            raise ValueError("STAGE_CACHE_URL é obrigatória com STAGE_CACHE_BACKEND=redis")
+        self.ttl = config.stage_cache_ttl if ttl is None else ttl
+        self._client = redis.Redis.from_url(self.url)
+
+    @staticmethod
+    def _name(stage: str, key: str) -> str:
+        return f"verbaflow:stage:{stage}:{key}"
+
+    def get(self, stage: str, key: str) -> Optional[Tuple[bytes, float]]:
+        blob = self._client.get(self._name(stage, key))
+        if blob is None:
+            return None
+        # Instante de gravação nos 8 primeiros bytes (a validade local segue a do servidor)
+        return blob[8:], struct.unpack(">d", blob[:8])[0]
+
+    def set(self, stage: str, key: str, value: bytes):
+        blob = struct.pack(">d", time.time()) + value
+        self._client.set(self._name(stage, key), blob, ex=max(1, int(self.ttl)) if self.ttl else None)
+
+
+class MemoryBackend(CacheBackend):
+    """
+    Backend no próprio processo. Substitui o servidor compartilhado em testes:
+    vários StageCache com a mesma instância se comportam como réplicas.
+    """
+
+    name = "memory"
+
+    def __init__(self, ttl: Optional[float] = None):
+        self.ttl = get_config().stage_cache_ttl if ttl is None else ttl
+        self._lock = threading.Lock()
+        self._values: Dict[str, Tuple[bytes, float]] = {}
+
+    def get(self, stage: str, key: str) -> Optional[Tuple[bytes, float]]:
+        with self._lock:
+            entry = self._values.get(key)
+        if entry is None or (self.ttl and time.time() - entry[1] > self.ttl):
+            return None
+        return entry
+
+    def set(self, stage: str, key: str, value: bytes):
+        with self._lock:
+            self._values[key] = (value, time.time())
+
+
+def create_backend(kind: Optional[str] = None, ttl: Optional[float] = None) -> CacheBackend:
+    """
+    Backend compartilhado configurado.
+
+    Args:
+        kind: "sqlite", "redis" ou "memory" (padrão: stage_cache_backend)
+        ttl: Validade dos resultados em segundos (padrão: stage_cache_ttl)
+
+    Returns:
+        Instância do backend
+
+    Raises:
+        ValueError: Backend desconhecido ou sem STAGE_CACHE_URL (redis)
+        ImportError: Backend redis sem o pacote redis instalado
+    """
+    kind = (kind or get_config().stage_cache_backend or "sqlite").lower()
+    if kind == "sqlite":
+        return SQLiteBackend(ttl=ttl)
+    if kind == "redis":
+        return RedisBackend(ttl=ttl)
+    if kind == "memory":
+        return MemoryBackend(ttl=ttl)
+    raise ValueError(f"STAGE_CACHE_BACKEND '{kind}' inválido. Use um de: {', '.join(STAGE_CACHE_BACKENDS)}")
+
+
+class StageCache:
+    """Resultados de etapas: LRU em memória na frente de um backend compartilhado."""
+
+    def __init__(
+        self,
+        backend: Optional[CacheBackend] = None,
+        lru_size: Optional[int] = None,
+        ttl: Optional[float] = None
+    ):
+        config = get_config()
+        self.ttl = config.stage_cache_ttl if ttl is None else ttl
+        self.backend = backend or create_backend(ttl=self.ttl)
+        self.lru_size = config.stage_cache_lru_size if lru_size is None else lru_size
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._local: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+
+    def get(self, stage: str, request: dict) -> Optional[Any]:
+        """
+        Busca o resultado de uma etapa (LRU local, depois o backend compartilhado).
+
+        Args:
+            stage: Nome da etapa
+            request: Campos que determinam o resultado (contexto projetado, modelo)
+
+        Returns:
+            Valor gravado ou None se ausente ou expirado
+        """
+        key = fingerprint(stage, request)
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None and self.ttl and time.time() - entry[1] > self.ttl:
+                del self._local[key]
+                entry = None
+            if entry is not None:
+                self._local.move_to_end(key)
+                self.local_hits += 1
+                return decode_value(entry[0])
+
+        try:
+            entry = self.backend.get(stage, key)
+        except Exception as e:
+            # Backend fora do ar: segue só com a camada local
+            entry = None
+            with self._lock:
+                self.errors += 1
+            print(f"⚠️ Cache de etapas ({self.backend.name}) indisponível: {e}")
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.shared_hits += 1
+            # Trazido de outra réplica (ou de execução anterior): expira junto com o original
+            self._remember(key, *entry)
+        return decode_value(entry[0])
+
+    def put(self, stage: str, request: dict, value: Any):
+        """Grava o resultado de uma etapa nas duas camadas."""
+        key = fingerprint(stage, request)
+        blob = encode_value(value)
+        with self._lock:
+            self._remember(key, blob, time.time())
+            self.stored += 1
+        try:
+            self.backend.set(stage, key, blob)
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            print(f"⚠️ Cache de etapas ({self.backend.name}) indisponível: {e}")
+
+    def _remember(self, key: str, blob: bytes, created_at: float):
+        if self.lru_size <= 0:
+            return
+        self._local[key] = (blob, created_at)
+        self._local.move_to_end(key)
+        while len(self._local) > self.lru_size:
+            self._local.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.local_hits + self.shared_hits
+            lookups = hits + self.misses
+            return {
+                "backend": self.backend.name,
+                "hits": hits,
+                "local_hits": self.local_hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "stored": self.stored,
+                "errors": self.errors,
+                "local_entries": len(self._local)
+            }
+
+
+_stage_cache: Optional[StageCache] = None
+_stage_cache_lock = threading.Lock()
+
+
+def get_stage_cache() -> Optional[StageCache]:
+    """Cache de etapas do processo, ou None se desativado (STAGE_CACHE_ENABLED)."""
+    global _stage_cache
+    if not get_config().stage_cache_enabled:
+        return None
+    with _stage_cache_lock:
+        if _stage_cache is None:
+            _stage_cache = StageCache()
+        return _stage_cache
@@ -0,0 +1,274 @@
+"""
+Classificação em streaming com parse incremental do JSON.
+
+Os tokens do Analista passam por um parser incremental que registra cada
+campo de primeiro nível assim que seu valor termina. Quando a categoria e a
+confiança estão completas, o resultado antecipado é entregue (as etapas
+seguintes já podem começar) e, em contextos só de classificação, o stream é
+fechado: a conexão cai e o restante da geração não é cobrado.
+"""
+import json
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from src.cassette import cassette_mode, replay_or_record
+from src.config import get_config
+from src.models import CompactClassificationOutput
+from src.providers import Endpoint, get_router, openai_client
+from src.session import DEFAULT_SESSION, SessionContext
+
+
+# Campos que compõem o resultado antecipado: (categoria, confiança) por schema
+EARLY_FIELDS = (("final_category", "confidence"), ("cat", "conf"))
+
+
+class IncrementalJSONParser:
+    """
+    Parser incremental de um objeto JSON: emite (campo, valor) para cada campo
+    de primeiro nível assim que o valor termina. Texto antes do primeiro '{'
+    (ex: "Thought:" ou cercas de código) é ignorado.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.fields: Dict[str, Any] = {}
+        self.done = False
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._expect_key = True
+        self._key: Optional[str] = None
+        self._token_start: Optional[int] = None
+        self._value_start: Optional[int] = None
+
+    def _emit(self, end: int, events: List[Tuple[str, Any]]):
+        raw = self.buffer[self._value_start:end].strip()
+        self._value_start = None
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError:
+            return
+        if self._key is not None:
+            self.fields[self._key] = value
+            events.append((self._key, value))
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        Adiciona um trecho do stream.
+
+        Args:
+            chunk: Texto recebido
+
+        Returns:
+            Lista de (campo, valor) completados neste trecho
+        """
+        events: List[Tuple[str, Any]] = []
+        self.buffer += chunk
+
+        while self._pos < len(self.buffer) and not self.done:
+            pos = self._pos
+            ch = self.buffer[pos]
+            self._pos += 1
+
+            if self._depth == 0:
+                if ch == "{":
+                    self._depth = 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        if self._expect_key:
+                            self._key = json.loads(self.buffer[self._token_start:pos + 1])
+                        else:
+                            self._emit(pos + 1, events)
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                if self._depth == 1:
+                    self._token_start = pos
+                    if not self._expect_key:
+                        self._value_start = pos
+            elif ch in "{[":
+                if self._depth == 1 and not self._expect_key:
+                    self._value_start = pos
+                self._depth += 1
+            elif ch in "}]":
+                if self._depth == 1:
+                    if self._value_start is not None:
+                        self._emit(pos, events)
+                    self._depth = 0
+                    self.done = True
+                else:
+                    self._depth -= 1
+                    if self._depth == 1 and self._value_start is not None:
+                        self._emit(pos + 1, events)
+            elif self._depth == 1:
+                if ch == ":":
+                    self._expect_key = False
+                elif ch == ",":
+                    if self._value_start is not None:
+                        self._emit(pos, events)
+                    self._expect_key = True
+                elif not ch.isspace() and not self._expect_key and self._value_start is None:
+                    # Início de número, true/false/null
+                    self._value_start = pos
+
+        return events
+
+
+def early_result_ready(fields: Dict[str, Any]) -> bool:
+    """Categoria e confiança já completas (schema completo ou compacto)."""
+    return any(all(name in fields for name in names) for names in EARLY_FIELDS)
+
+
+def normalize_fields(fields: Dict[str, Any]) -> Optional[dict]:
+    """
+    Converte os campos parseados para o formato de ClassificationOutput.
+
+    Args:
+        fields: Campos de primeiro nível do JSON (completo ou compacto)
+
+    Returns:
+        Dicionário de classificação ou None se não houver categoria
+    """
+    if "final_category" in fields:
+        return dict(fields)
+    if "cat" in fields:
+        try:
+            return CompactClassificationOutput.model_validate(fields).to_classification_output().model_dump()
+        except ValidationError:
+            return None
+    return None
+
+
+def build_messages(agent, task) -> List[dict]:
+    """Mensagens do Analista a partir do Agent e da Task do CrewAI."""
+    return [
+        {
+            "role": "system",
+            "content": f"Você é {agent.role}. {agent.backstory}\n\nSeu objetivo: {agent.goal}"
+        },
+        {
+            "role": "user",
+            "content": f"{task.description}\n\nSaída esperada: {task.expected_output}"
+        }
+    ]
+
+
+def _stream(
+    endpoint: Endpoint,
+    model: str,
+    messages: List[dict],
+    parser: IncrementalJSONParser,
+    on_early_result: Optional[Callable[[dict], None]],
+    cancel_on_result: bool
+) -> dict:
+    config = get_config()
+    # Cada tentativa (failover) recomeça o parse do zero
+    parser.__init__()
+    client = openai_client(endpoint, config.classify_deadline or None)
+    stream = client.chat.completions.create(
+        model=endpoint.model or model,
+        messages=messages,
+        temperature=config.temperature,
+        stream=True
+    )
+
+    early_sent = False
+    cancelled = False
+    try:
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content or ""
+            if not delta:
+                continue
+            parser.feed(delta)
+            if not early_sent and early_result_ready(parser.fields):
+                early_sent = True
+                if on_early_result:
+                    on_early_result(normalize_fields(parser.fields))
+                if cancel_on_result:
+                    cancelled = True
+                    break
+            if parser.done:
+                break
+    finally:
+        # Fecha a conexão: o servidor interrompe a geração restante
+        stream.close()
+
+    return {"content": parser.buffer, "cancelled": cancelled, "early_sent": early_sent}
+
+
+def stream_classification(
+    messages: List[dict],
+    model_name: Optional[str] = None,
+    on_early_result: Optional[Callable[[dict], None]] = None,
+    cancel_on_result: bool = False,
+    session: Optional[SessionContext] = None
+) -> dict:
+    """
+    Executa a classificação em streaming.
+
+    Args:
+        messages: Mensagens do Analista (ver build_messages)
+        model_name: Modelo a usar (None usa o padrão da configuração)
+        on_early_result: Chamado uma vez com a classificação parcial assim que
+            categoria e confiança estiverem completas
+        cancel_on_result: Fechar o stream logo após o resultado antecipado
+        session: Credenciais da sessão (None usa configuração e ambiente)
+
+    Returns:
+        {"classification": dict ou None, "content": texto recebido,
+         "cancelled": bool, "early_latency": segundos até o resultado antecipado}
+    """
+    session = session or DEFAULT_SESSION
+    model = session.resolve_model(model_name)
+    parser = IncrementalJSONParser()
+    start = time.monotonic()
+    early_latency = None
+
+    def on_early(partial: dict):
+        nonlocal early_latency
+        if early_latency is not None:
+            # Failover no meio do stream: o resultado antecipado já foi entregue
+            return
+        early_latency = time.monotonic() - start
+        if on_early_result and partial:
+            on_early_result(partial)
+
+    if cassette_mode() != "off":
+        # Com cassette o texto é gravado inteiro (reproduzível para qualquer etapa)
+        # e depois reproduzido pelo parser, com os mesmos eventos
+        def fetch() -> dict:
+            router = get_router(session.resolve_groq_key())
+            return router.run(lambda endpoint: _stream(endpoint, model, messages, IncrementalJSONParser(), None, False))
+
+        recorded = replay_or_record("stream", {"model": model, "messages": messages}, fetch)
+        parser.feed(recorded["content"])
+        if early_result_ready(parser.fields):
+            on_early(normalize_fields(parser.fields))
+        content = recorded["content"]
+        cancelled = False
+    else:
+        router = get_router(session.resolve_groq_key())
+        response = router.run(lambda endpoint: _stream(endpoint, model, messages, parser, on_early, cancel_on_result))
+        content = response["content"]
+        cancelled = response["cancelled"]
+
+    return {
+        "classification": normalize_fields(parser.fields),
+        "content": content,
+        "cancelled": cancelled,
+        "early_latency": early_latency
+    }
@@ -15,16 +15,23 @@ Design Trends Aplicados:
 Author: VerbaFlow Team
 Version: 2.0.0
 """
+import hashlib
+import json
+import re
+from functools import lru_cache
+
 import streamlit as st
+import streamlit.components.v1 as components
 
+from src.config import get_config
 
-def inject_custom_css():
-    """
-    Sistema de CSS avançado com Glassmorphism e Dark Theme profissional.
-    Corrigido para o bug do ícone da sidebar no Streamlit 1.40+.
-    """
-    css = """
-    <style>
+
+# ============================================
+# THEME STYLESHEET - fonte única do CSS
+# ============================================
+# Mantido sem a tag <style>: o CSS é minificado uma única vez por processo
+# e injetado no <head> do documento apenas uma vez por sessão.
+THEME_CSS = """
     /* ============================================
        1. IMPORTS - Fontes Modernas
        ============================================ */
@@ -762,9 +769,108 @@ def inject_custom_css():
         margin-bottom: 1rem;
     }
 
-    </style>
+"""
+
+
+def minify_css(css: str) -> str:
     """
-    st.markdown(css, unsafe_allow_html=True)
+    Minifica CSS removendo comentários e espaços redundantes.
+    
+    Args:
+        css: CSS original
+    
+    Returns:
+        CSS minificado
+    """
+    # Remover comentários /* ... */
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.DOTALL)
+    
+    # Colapsar espaços em branco (strings do tema não contêm espaços duplos)
+    css = re.sub(r'\s+', ' ', css)
+    
+    # Remover espaços ao redor de delimitadores (não toca em ':' antes de
+    # pseudo-classes para não alterar seletores como "div :hover")
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    css = re.sub(r':\s+', ':', css)
+    
+    # Último ';' de cada bloco é desnecessário
+    css = css.replace(';}', '}')
+    
+    return css.strip()
+
+
+@lru_cache(maxsize=1)
+def get_theme_stylesheet() -> tuple:
+    """
+    Retorna o CSS do tema minificado e seu hash de conteúdo.
+    
+    O resultado é calculado uma vez por processo e reutilizado em todos os
+    reruns e sessões.
+    
+    Returns:
+        Tupla (css_minificado, hash_sha256_curto)
+    """
+    css = minify_css(THEME_CSS)
+    digest = hashlib.sha256(css.encode('utf-8')).hexdigest()[:12]
+    return css, digest
+
+
+def inject_custom_css():
+    """
+    Sistema de CSS avançado com Glassmorphism e Dark Theme profissional.
+    Corrigido para o bug do ícone da sidebar no Streamlit 1.40+.
+    
+    Por padrão o stylesheet é enviado apenas no primeiro run da sessão: um
+    componente de altura zero anexa um <style id="vf-theme-<hash>"> ao <head>
+    do documento, que sobrevive aos reruns seguintes. Reruns posteriores não
+    enviam nenhum CSS pelo websocket. Se o hash mudar (tema atualizado), o
+    estilo antigo é substituído.
+    
+    A sessão só é marcada como estilizada em confirm_theme_injection(),
+    chamado depois que o run já enviou mais elementos: se um rerun
+    interromper o primeiro run antes disso, o componente é enviado de novo
+    (o script ignora um <style> já presente).
+    """
+    css, digest = get_theme_stylesheet()
+    
+    if not get_config().css_inject_once:
+        # Modo legado: reenviar o CSS (minificado) a cada rerun
+        st.markdown(f"<style>{css}</style>", unsafe_allow_html=True)
+        return
+    
+    if st.session_state.get('_theme_css_hash') == digest:
+        return
+    
+    components.html(f"""
+    <script>
+    (function() {{
+        const doc = window.parent.document;
+        const styleId = "vf-theme-{digest}";
+        if (doc.getElementById(styleId)) {{ return; }}
+        doc.querySelectorAll('style[id^="vf-theme-"]').forEach((el) => el.remove());
+        const style = doc.createElement("style");
+        style.id = styleId;
+        style.textContent = {json.dumps(css)};
+        doc.head.appendChild(style);
+    }})();
+    </script>
+    """, height=0)
+    st.session_state['_theme_css_pending'] = digest
+
+
+def confirm_theme_injection():
+    """
+    Marca o tema como injetado na sessão.
+    
+    Deve ser chamado depois de inject_custom_css(), em um ponto do script
+    alcançado só depois que o componente de injeção foi entregue ao navegador
+    (por exemplo, após renderizar a sidebar). Até lá, cada run reenvia o
+    componente.
+    """
+    pending = st.session_state.pop('_theme_css_pending', None)
+    if pending is not None:
+        st.session_state['_theme_css_hash'] = pending
+
 
 def apply_page_config():
     """
@@ -2,11 +2,96 @@
 Definições das tasks do sistema VerbaFlow.
 Usa Structured Output com Pydantic para garantir formato consistente.
 """
+import json
+from typing import Iterable, List, Optional
+
 from crewai import Task
-from src.models import ClassificationOutput, EnrichmentOutput, ReportOutput
+from pydantic import ValidationError
+from src.models import ClassificationOutput, CompactClassificationOutput, EnrichmentOutput, ReportOutput
+from src.labels import LabelSet, NEWSGROUPS_LABEL_SET
+from src.config import get_config
+
+
+# Campos que cada etapa declara precisar das anteriores (projeção de contexto).
+# O raciocínio CoT e as entidades ficam de fora: só a classificação decide.
+ENRICHMENT_CONTEXT_FIELDS = ("final_category", "candidate_categories")
+REPORT_CONTEXT_FIELDS = (
+    "final_category", "confidence", "confidence_score", "candidate_categories", "contextual_reasoning",
+    "historical_context", "evolution", "current_relevance", "key_findings", "sources_summary"
+)
+
+# Separador do CrewAI entre saídas de tasks de contexto
+_CONTEXT_DIVIDER = "\n\n----------\n\n"
+
+
+def _json_object(text: str) -> Optional[dict]:
+    start = text.find('{')
+    end = text.rfind('}')
+    if start == -1 or end <= start:
+        return None
+    try:
+        data = json.loads(text[start:end + 1])
+    except json.JSONDecodeError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def project_context(output: str, fields: Iterable[str]) -> str:
+    """
+    Reduz a saída JSON de uma task aos campos pedidos pela task seguinte.
+
+    Args:
+        output: Saída de uma task (JSON da classificação, inclusive compacto, ou do enriquecimento)
+        fields: Campos de interesse
+
+    Returns:
+        JSON apenas com os campos presentes; a saída original se não for JSON
+        estruturado ou se nenhum campo for encontrado
+    """
+    data = _json_object(output or "")
+    if data is None:
+        return output
+    if "cat" in data and "final_category" not in data:
+        try:
+            data = CompactClassificationOutput.model_validate(data).to_classification_output().model_dump()
+        except ValidationError:
+            return output
+    projected = {field: data[field] for field in fields if data.get(field) not in (None, "", [], {})}
+    return json.dumps(projected, ensure_ascii=False) if projected else output
+
+
+class ProjectedTask(Task):
+    """
+    Task que recebe das tasks de contexto apenas os campos declarados em
+    context_fields, em vez da saída bruta completa (com CONTEXT_PROJECTION).
+    """
+
+    context_fields: Optional[List[str]] = None
+
+    def _project(self, context: Optional[str]) -> Optional[str]:
+        if not self.context_fields or not isinstance(self.context, list) or not get_config().context_projection:
+            return context
+        outputs = [task.output.raw for task in self.context if task.output is not None]
+        return _CONTEXT_DIVIDER.join(project_context(output, self.context_fields) for output in outputs)
+
+    def execute_sync(self, agent=None, context=None, tools=None):
+        return super().execute_sync(agent, self._project(context), tools)
+
+    def execute_async(self, agent=None, context=None, tools=None):
+        return super().execute_async(agent, self._project(context), tools)
 
+    async def aexecute_sync(self, agent=None, context=None, tools=None):
+        return await super().aexecute_sync(agent, self._project(context), tools)
 
-def create_classification_task(agent, text: str, few_shot_examples: list = None):
+
+def create_classification_task(
+    agent,
+    text: str,
+    few_shot_examples: list = None,
+    label_set: LabelSet = None,
+    compact: bool = None,
+    decision_first: bool = False
+):
     """
     Cria a Task 1: Classificação do texto com Chain of Thought e Structured Output.
     
@@ -14,10 +99,20 @@ def create_classification_task(agent, text: str, few_shot_examples: list = None)
         agent: Agente Analista
         text: Texto a ser classificado
         few_shot_examples: Lista de exemplos para few-shot prompting (opcional)
+        label_set: Conjunto de categorias válidas (padrão: 20 Newsgroups)
+        compact: Usar o schema compacto (CompactClassificationOutput). Se None,
+            segue classification_schema da configuração
+        decision_first: No schema completo, pedir final_category e confidence
+            antes do raciocínio (streaming: o resultado antecipado sai nos
+            primeiros tokens). O compacto sempre começa por "cat" e "conf"
     
     Returns:
         Task configurada com CoT e structured output
     """
+    label_set = label_set or NEWSGROUPS_LABEL_SET
+    if compact is None:
+        compact = get_config().classification_schema == "compact"
+    
     # Few-shot examples (se fornecidos)
     few_shot_section = ""
     if few_shot_examples:
@@ -31,6 +126,40 @@ Raciocínio: {example.get('reasoning', 'Análise de entidades técnicas de hardw
 ---
 """
     
+    if compact:
+        # Raciocínio escrito uma única vez, chaves curtas e campos limitados
+        return Task(
+            description=f"""
+        Classifique o texto abaixo ({label_set.domain or 'textos gerais'}) e retorne APENAS um JSON compacto.
+        
+        **TEXTO A CLASSIFICAR:**
+        {text}
+        
+        {few_shot_section}
+        
+        **CATEGORIAS VÁLIDAS ({len(label_set.labels)}):**
+        {', '.join(label_set.labels)}
+        
+        Analise as entidades, compare as categorias candidatas e decida. Escreva o raciocínio UMA vez, no campo "why".
+        
+        **FORMATO DE SAÍDA (JSON, sem texto fora dele, nesta ordem de campos):**
+        {{"cat": "categoria_final_exata", "conf": "A|M|B", "cands": ["até 3 candidatas"], "ents": ["até 6 entidades/termos"], "why": "justificativa única, máx. 300 caracteres, incluindo exclusões"}}
+        
+        conf: A = alta, M = média, B = baixa.
+        IMPORTANTE: "cat" DEVE ser EXATAMENTE uma das {len(label_set.labels)} categorias listadas acima.
+        """,
+            agent=agent,
+            expected_output="JSON compacto com cat, conf, cands, ents e why."
+        )
+    
+    # Streaming: categoria e confiança nos primeiros campos do JSON
+    decision_fields = """
+            "final_category": "categoria_final_exata",
+            "confidence": "alta|média|baixa",""" if decision_first else ""
+    conclusion_fields = "" if decision_first else """
+            "final_category": "categoria_final_exata",
+            "confidence": "alta|média|baixa","""
+    
     return Task(
         description=f"""
         Analise o seguinte texto usando a metodologia Chain of Thought (CoT) e retorne um JSON estruturado.
@@ -47,15 +176,11 @@ Raciocínio: {example.get('reasoning', 'Análise de entidades técnicas de hardw
         - Organizações mencionadas (ex: IBM, Apple, Microsoft, NASA)
         - Termos técnicos específicos (ex: "encryption", "hardware", "software")
         - Domínios de conhecimento (ex: medicina, ciência espacial, criptografia)
-        - Contexto temporal (anos 90 - tecnologia da época)
+        - Contexto do domínio ({label_set.domain or 'textos gerais'})
         
         **PASSO 2: RACIOCÍNIO CONTEXTUAL**
-        Conecte as entidades identificadas às definições das 20 categorias Newsgroups:
-        - alt.atheism, comp.graphics, comp.os.ms-windows.misc, comp.sys.ibm.pc.hardware,
-        - comp.sys.mac.hardware, comp.windows.x, misc.forsale, rec.autos, rec.motorcycles,
-        - rec.sport.baseball, rec.sport.hockey, sci.crypt, sci.electronics, sci.med,
-        - sci.space, soc.religion.christian, talk.politics.guns, talk.politics.mideast,
-        - talk.politics.misc, talk.religion.misc
+        Conecte as entidades identificadas às definições das {len(label_set.labels)} categorias válidas:
+        {', '.join(label_set.labels)}
         
         **PASSO 3: HIPÓTESE COM EXCLUSÕES**
         Liste 2-3 categorias candidatas e explique por que você EXCLUI as outras.
@@ -64,8 +189,8 @@ Raciocínio: {example.get('reasoning', 'Análise de entidades técnicas de hardw
         Selecione a categoria final e avalie sua confiança (alta/média/baixa).
         
         **FORMATO DE SAÍDA (JSON ESTRUTURADO):**
-        Você DEVE retornar um JSON válido seguindo este schema:
-        {{
+        Você DEVE retornar um JSON válido seguindo este schema{' (nesta ordem de campos)' if decision_first else ''}:
+        {{{decision_fields}
             "entity_analysis": {{
                 "organizations": ["lista de organizações"],
                 "technical_terms": ["lista de termos técnicos"],
@@ -73,9 +198,7 @@ Raciocínio: {example.get('reasoning', 'Análise de entidades técnicas de hardw
             }},
             "contextual_reasoning": "explicação do raciocínio contextual",
             "candidate_categories": ["cat1", "cat2", "cat3"],
-            "exclusion_reasoning": "por que outras categorias foram excluídas",
-            "final_category": "categoria_final_exata",
-            "confidence": "alta|média|baixa",
+            "exclusion_reasoning": "por que outras categorias foram excluídas",{conclusion_fields}
             "reasoning_steps": [
                 {{"step_number": 1, "step_name": "Análise", "reasoning": "..."}},
                 {{"step_number": 2, "step_name": "Raciocínio", "reasoning": "..."}},
@@ -84,26 +207,84 @@ Raciocínio: {example.get('reasoning', 'Análise de entidades técnicas de hardw
             ]
         }}
         
-        IMPORTANTE: A "final_category" DEVE ser EXATAMENTE uma das 20 categorias listadas acima.
+        IMPORTANTE: A "final_category" DEVE ser EXATAMENTE uma das {len(label_set.labels)} categorias listadas acima.
         """,
         agent=agent,
         expected_output="JSON estruturado com ClassificationOutput contendo entity_analysis, contextual_reasoning, candidate_categories, exclusion_reasoning, final_category, confidence e reasoning_steps."
     )
 
 
-def create_enrichment_task(agent, classification_task):
+def create_batch_classification_task(agent, texts: list, label_set: LabelSet):
+    """
+    Cria uma task que classifica vários textos curtos em uma única chamada.
+    Sem Chain of Thought: retorna apenas categoria e confiança por item, o que
+    reduz drasticamente os tokens por texto em execuções em lote.
+    
+    Args:
+        agent: Agente Analista
+        texts: Lista de textos (já limpos) do lote
+        label_set: Conjunto de categorias válidas
+    
+    Returns:
+        Task configurada
+    """
+    items = "\n".join(f"[{i}] {text}" for i, text in enumerate(texts))
+    
+    return Task(
+        description=f"""
+        Classifique CADA um dos {len(texts)} textos abaixo em exatamente uma das categorias:
+        {', '.join(label_set.labels)}
+        
+        **TEXTOS ({label_set.domain or 'textos gerais'}):**
+        {items}
+        
+        **FORMATO DE SAÍDA:** retorne APENAS uma lista JSON, um objeto por texto, na mesma ordem:
+        [{{"id": 0, "final_category": "categoria_exata", "confidence": "alta|média|baixa"}}, ...]
+        """,
+        agent=agent,
+        expected_output=f"Lista JSON com {len(texts)} objetos contendo id, final_category e confidence."
+    )
+
+
+def _classification_section(classification_result: str, fields: Iterable[str]) -> str:
+    """Bloco de descrição com uma classificação já conhecida (sem task de contexto)."""
+    if get_config().context_projection:
+        classification_result = project_context(classification_result, fields)
+    return f"""
+        **CLASSIFICAÇÃO JÁ REALIZADA (reaproveitada):**
+        {classification_result}
+        """
+
+
+def _enrichment_section(enrichment_result: str) -> str:
+    """Bloco de descrição com um enriquecimento já conhecido (do cache de etapas)."""
+    if get_config().context_projection:
+        enrichment_result = project_context(enrichment_result, REPORT_CONTEXT_FIELDS)
+    return f"""
+        **ENRIQUECIMENTO JÁ REALIZADO (reaproveitado):**
+        {enrichment_result}
+        """
+
+
+def create_enrichment_task(agent, classification_task=None, classification_result: str = None):
     """
     Cria a Task 2: Enriquecimento com contexto web estruturado.
     
     Args:
         agent: Agente Pesquisador
         classification_task: Task de classificação (para usar como contexto)
+        classification_result: Classificação já conhecida em JSON, usada no lugar
+            de classification_task (ex: reaproveitada de uma quase-duplicata)
     
     Returns:
         Task configurada
     """
-    return Task(
-        description="""
+    known_classification = (
+        _classification_section(classification_result, ENRICHMENT_CONTEXT_FIELDS) if classification_result else ""
+    )
+    
+    return ProjectedTask(
+        description=known_classification + """
         Com base na classificação realizada na task anterior, realize uma pesquisa web estruturada:
         
         **PASSO 1: EXTRAÇÃO DA CATEGORIA**
@@ -117,34 +298,53 @@ def create_enrichment_task(agent, classification_task):
         - Contexto histórico e relevância contemporânea
         
         **PASSO 3: SÍNTESE**
-        Organize as informações encontradas em:
-        - **Contexto Histórico:** Como o tópico era visto nos anos 90
-        - **Evolução:** Principais mudanças desde então
-        - **Relevância Atual:** Por que o tópico ainda importa hoje
-        - **Fontes:** Principais descobertas ou notícias encontradas
+        Organize as informações encontradas e retorne APENAS um JSON (em pt-BR):
+        {
+            "historical_context": "Como o tópico era visto nos anos 90",
+            "evolution": "Principais mudanças desde então",
+            "current_relevance": "Por que o tópico ainda importa hoje",
+            "key_findings": ["descoberta ou notícia 1", "descoberta ou notícia 2"],
+            "sources_summary": "Principais fontes consultadas (título e URL)"
+        }
         
         Forneça um resumo estruturado e informativo que enriqueça a classificação.
         """,
         agent=agent,
-        context=[classification_task],
-        expected_output="Resumo estruturado do contexto web com histórico, evolução, relevância atual e fontes encontradas."
+        context=[classification_task] if classification_task else [],
+        context_fields=list(ENRICHMENT_CONTEXT_FIELDS),
+        expected_output="JSON estruturado com EnrichmentOutput contendo historical_context, evolution, "
+                        "current_relevance, key_findings e sources_summary."
     )
 
 
-def create_reporting_task(agent, classification_task, enrichment_task):
+def create_reporting_task(
+    agent,
+    classification_task,
+    enrichment_task,
+    classification_result: str = None,
+    enrichment_result: str = None
+):
     """
     Cria a Task 3: Compilação do relatório executivo final com structured output.
     
     Args:
         agent: Agente Editor Chefe
-        classification_task: Task de classificação
-        enrichment_task: Task de enriquecimento
+        classification_task: Task de classificação (None se classification_result for usado)
+        enrichment_task: Task de enriquecimento (None se enrichment_result for usado)
+        classification_result: Classificação já conhecida em JSON (opcional)
+        enrichment_result: Enriquecimento já conhecido em JSON (opcional)
     
     Returns:
         Task configurada
     """
-    return Task(
-        description="""
+    known_results = (
+        _classification_section(classification_result, REPORT_CONTEXT_FIELDS) if classification_result else ""
+    )
+    if enrichment_result:
+        known_results += _enrichment_section(enrichment_result)
+    
+    return ProjectedTask(
+        description=known_results + """
         Compile um relatório executivo elegante e profissional, escrito em português brasileiro (pt-BR).
         
         Use os resultados das tasks anteriores (classificação e enriquecimento) para criar um relatório completo.
@@ -186,7 +386,8 @@ def create_reporting_task(agent, classification_task, enrichment_task):
         - Linguagem clara, acessível mas técnica
         """,
         agent=agent,
-        context=[classification_task, enrichment_task],
+        context=[task for task in (classification_task, enrichment_task) if task],
+        context_fields=list(REPORT_CONTEXT_FIELDS),
         expected_output="JSON estruturado com ReportOutput contendo executive_summary, classification_analysis, web_context, conclusions e full_report_markdown."
     )
 
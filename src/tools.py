@@ -1,22 +1,126 @@
 """
 Configuração de ferramentas para os agentes.
 """
-import os
+import asyncio
+from typing import Any, Optional
+
+import requests
+from crewai.tools import BaseTool
 from crewai_tools import TavilySearchTool
+from src.config import get_config
+from src.cassette import RecordingTavilySearchTool, cassette_mode
+from src.compression import compress_search_results
+from src.session import DEFAULT_SESSION, SessionContext
+
+
+class TavilyEndpointClient:
+    """Cliente mínimo da API de busca do Tavily para um endpoint compatível (ex: mock local)."""
+
+    def __init__(self, base_url: str, api_key: Optional[str]):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+
+    def search(self, query: str, timeout: Optional[float] = None, **params: Any) -> dict:
+        body = {key: value for key, value in params.items() if value is not None}
+        body.update(query=query, api_key=self.api_key)
+        response = requests.post(f"{self.base_url}/search", json=body, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+
+
+class AsyncTavilyEndpointClient(TavilyEndpointClient):
+    """Versão assíncrona (a requisição roda em uma thread do executor)."""
+
+    async def search(self, query: str, timeout: Optional[float] = None, **params: Any) -> dict:
+        return await asyncio.to_thread(TavilyEndpointClient.search, self, query, timeout=timeout, **params)
 
 
-def get_tavily_tool():
+class EndpointTavilySearchTool(TavilySearchTool):
+    """TavilySearchTool apontada para TAVILY_BASE_URL (não requer o tavily-python)."""
+
+    def __init__(self, base_url: str, **kwargs: Any):
+        # Pula o __init__ do TavilySearchTool, que instancia os clientes do tavily-python
+        BaseTool.__init__(self, **kwargs)
+        self.client = TavilyEndpointClient(base_url, self.api_key)
+        self.async_client = AsyncTavilyEndpointClient(base_url, self.api_key)
+
+
+class RecordingEndpointTavilySearchTool(RecordingTavilySearchTool, EndpointTavilySearchTool):
+    """EndpointTavilySearchTool que grava/reproduz os resultados conforme CASSETTE_MODE."""
+
+
+class CompressedSearchTool(BaseTool):
+    """
+    Envolve uma ferramenta de busca e compacta os resultados antes de
+    entregá-los ao agente (ver src/compression.py). A ferramenta interna
+    continua recebendo e gravando (cassette) a resposta completa.
+    """
+
+    name: str = "Tavily Search"
+    description: str = ""
+    search_tool: BaseTool
+    focus: str = ""
+
+    def __init__(self, search_tool: BaseTool, focus: str = "", **kwargs: Any):
+        kwargs.setdefault("name", search_tool.name)
+        kwargs.setdefault(
+            "description",
+            f"{search_tool.description} Os resultados chegam compactados: apenas as sentenças "
+            "mais relevantes para a consulta, agrupadas por fonte com título e URL."
+        )
+        kwargs.setdefault("args_schema", search_tool.args_schema)
+        super().__init__(search_tool=search_tool, focus=focus or "", **kwargs)
+
+    def _run(self, query: str, **kwargs: Any) -> str:
+        return compress_search_results(self.search_tool._run(query, **kwargs), query, self.focus)
+
+    async def _arun(self, query: str, **kwargs: Any) -> str:
+        raw = await self.search_tool._arun(query, **kwargs)
+        return compress_search_results(raw, query, self.focus)
+
+
+def get_tavily_tool(focus: str = "", session: Optional[SessionContext] = None):
     """
     Configura e retorna a ferramenta Tavily Search.
-    
+
+    Com CASSETTE_MODE diferente de "off", retorna a versão que grava/reproduz
+    as buscas (em replay a chave não é necessária). Com TAVILY_BASE_URL, as
+    buscas vão para o endpoint compatível configurado. Com
+    SEARCH_COMPRESSION_ENABLED, a ferramenta é envolvida pela compressão
+    extrativa dos resultados.
+
+    Args:
+        focus: Categoria já classificada, usada para priorizar as sentenças
+        session: Credenciais da sessão (None usa configuração e TAVILY_API_KEY)
+
     Returns:
         TavilySearchTool configurada ou None se API key não estiver disponível
     """
-    api_key = os.getenv("TAVILY_API_KEY")
-    
+    tool = _build_tavily_tool((session or DEFAULT_SESSION).resolve_tavily_key())
+    if tool is None or not get_config().search_compression_enabled:
+        return tool
+    return CompressedSearchTool(tool, focus=focus)
+
+
+def _build_tavily_tool(api_key: Optional[str]):
+    config = get_config()
+    mode = cassette_mode()
+
+    if mode == "replay":
+        if config.tavily_base_url:
+            return RecordingEndpointTavilySearchTool(
+                config.tavily_base_url, api_key=api_key or "replay", timeout=config.tavily_timeout
+            )
+        return RecordingTavilySearchTool(api_key=api_key or "replay", timeout=config.tavily_timeout)
+
     if not api_key:
         print("AVISO: TAVILY_API_KEY não encontrada nas variáveis de ambiente")
         return None
-    
-    return TavilySearchTool(api_key=api_key)
 
+    if config.tavily_base_url:
+        # Gravação (record/auto) vale também para o endpoint compatível
+        tool_class = RecordingEndpointTavilySearchTool if mode != "off" else EndpointTavilySearchTool
+        return tool_class(config.tavily_base_url, api_key=api_key, timeout=config.tavily_timeout)
+
+    tool_class = RecordingTavilySearchTool if mode != "off" else TavilySearchTool
+    return tool_class(api_key=api_key, timeout=config.tavily_timeout)
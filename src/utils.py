@@ -1,6 +1,7 @@
 """
 Utilitários para carregamento e pré-processamento de dados.
 """
+import mmap
 import os
 import re
 import pandas as pd
@@ -8,18 +9,30 @@ from pathlib import Path
 from sklearn.datasets import fetch_20newsgroups
 import random
 
+from src.config import get_config
+from src.corpus import make_ref, open_corpus, parse_ref, read_ref
 
-def fetch_newsgroups_samples(output_dir: str = "data/samples", num_samples: int = 5):
+
+def fetch_newsgroups_samples(output_dir: str = "data/samples", num_samples: int = 5, corpus_path: str = None):
     """
     Baixa amostras aleatórias do dataset 20 Newsgroups e salva com ground truth no filename.
     
+    Se corpus_path apontar para um corpus empacotado existente (src/corpus.py),
+    sorteia as amostras dele, estratificadas por categoria, sem baixar o
+    dataset nem gravar arquivos.
+    
     Args:
         output_dir: Diretório onde salvar as amostras
         num_samples: Número de amostras aleatórias a baixar
+        corpus_path: Corpus empacotado do 20 Newsgroups (opcional)
     
     Returns:
-        Lista de caminhos dos arquivos salvos
+        Lista de caminhos dos arquivos salvos (ou referências "<corpus>.jsonl#<id>")
     """
+    if corpus_path and os.path.exists(corpus_path):
+        corpus = open_corpus(corpus_path)
+        return [make_ref(corpus_path, doc_id) for doc_id in corpus.stratified_sample(n=num_samples)]
+    
     # Criar diretório se não existir
     Path(output_dir).mkdir(parents=True, exist_ok=True)
     
@@ -100,17 +113,50 @@ def load_custom_csv(csv_path: str = "data/raw/Base_dados_textos_6_classes.csv")
         return pd.DataFrame()
 
 
+def detect_csv_columns(df: pd.DataFrame) -> tuple:
+    """
+    Detecta automaticamente as colunas de texto e de categoria de um CSV.
+    
+    Args:
+        df: DataFrame carregado
+    
+    Returns:
+        Tupla (coluna_texto, coluna_categoria); cada uma pode ser None
+    """
+    text_col = None
+    category_col = None
+    
+    for col in df.columns:
+        col_lower = col.lower()
+        if 'text' in col_lower or 'texto' in col_lower:
+            text_col = col
+        if 'categor' in col_lower or 'class' in col_lower or 'label' in col_lower:
+            category_col = col
+    
+    return text_col, category_col
+
+
 def extract_ground_truth_from_filename(filename: str) -> str:
     """
     Extrai a categoria (ground truth) do nome do arquivo.
     Formato esperado: categoria___sampleN.txt
     
+    Referências de corpus empacotado ("<corpus>.jsonl#<id>", ver src/corpus.py)
+    retornam a categoria do índice do corpus.
+    
     Args:
-        filename: Nome do arquivo ou caminho completo
+        filename: Nome do arquivo, caminho completo ou referência de corpus
     
     Returns:
         Categoria extraída ou string vazia se não encontrar
     """
+    ref = parse_ref(filename)
+    if ref is not None:
+        try:
+            return open_corpus(ref[0]).category(ref[1])
+        except (OSError, KeyError):
+            return ""
+    
     # Extrair apenas o nome do arquivo se for caminho completo
     basename = os.path.basename(filename)
     
@@ -122,20 +168,117 @@ def extract_ground_truth_from_filename(filename: str) -> str:
     return ""
 
 
-def get_text_from_file(filepath: str) -> str:
+def decode_text(data: bytes) -> str:
     """
-    Lê conteúdo de um arquivo de texto.
+    Decodifica bytes de texto sem reler o arquivo em caso de erro.
+    
+    Tenta UTF-8; com poucos bytes inválidos, substitui apenas esses bytes; com
+    muitos (arquivo em outra codificação, comum em posts antigos), usa latin-1.
+    
+    Args:
+        data: Bytes lidos
+    
+    Returns:
+        Texto decodificado
+    """
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError:
+        text = data.decode('utf-8', errors='replace')
+        if text.count('\ufffd') <= max(len(text) // 100, 1):
+            return text
+        return data.decode('latin-1')
+
+
+def _char_boundary(data, index: int) -> int:
+    # Recua até o início de um caractere UTF-8 (bytes 10xxxxxx são continuação)
+    while 0 < index < len(data) and (data[index] & 0xC0) == 0x80:
+        index -= 1
+    return index
+
+
+def read_text_window(filepath: str, max_bytes: int = None, head_ratio: float = None) -> str:
+    """
+    Lê um arquivo de texto materializando no máximo max_bytes.
+    
+    Arquivos maiores são mapeados em memória (mmap) e só o início
+    (head_ratio do limite) e o final são copiados, separados por um marcador
+    com o número de bytes omitidos.
     
     Args:
         filepath: Caminho para o arquivo
+        max_bytes: Limite em bytes (padrão: input_max_bytes da configuração)
+        head_ratio: Fração do limite lida do início (padrão: input_head_ratio)
+    
+    Returns:
+        Texto (completo ou janelas de início e fim)
+    
+    Raises:
+        OSError: Se o arquivo não puder ser lido
+    """
+    config = get_config()
+    max_bytes = max_bytes or config.input_max_bytes
+    head_ratio = config.input_head_ratio if head_ratio is None else head_ratio
+    
+    with open(filepath, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size <= max_bytes:
+            return decode_text(f.read(max_bytes))
+        
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            head_end = _char_boundary(mapped, int(max_bytes * head_ratio))
+            tail_start = _char_boundary(mapped, size - (max_bytes - head_end))
+            head = mapped[:head_end]
+            tail = mapped[tail_start:]
+    
+    return f"{decode_text(head)}\n\n[... {tail_start - head_end} bytes omitidos ...]\n\n{decode_text(tail)}"
+
+
+def cap_text(text: str, max_chars: int = None, head_ratio: float = None) -> str:
+    """
+    Limita um texto já carregado (ex: corpo de requisição ou registro de CSV)
+    ao início e ao final, como read_text_window.
+    
+    Args:
+        text: Texto de entrada
+        max_chars: Limite em caracteres (padrão: input_max_bytes da configuração)
+        head_ratio: Fração do limite mantida do início (padrão: input_head_ratio)
+    
+    Returns:
+        O próprio texto, se couber no limite, ou início + marcador + final
+    """
+    config = get_config()
+    max_chars = max_chars or config.input_max_bytes
+    if len(text) <= max_chars:
+        return text
+    head_ratio = config.input_head_ratio if head_ratio is None else head_ratio
+    head = int(max_chars * head_ratio)
+    tail = max_chars - head
+    return f"{text[:head]}\n\n[... {len(text) - head - tail} caracteres omitidos ...]\n\n{text[len(text) - tail:]}"
+
+
+def get_text_from_file(filepath: str) -> str:
+    """
+    Lê conteúdo de um arquivo de texto ou de um documento de corpus
+    empacotado ("<corpus>.jsonl#<id>", ver src/corpus.py).
+    
+    Arquivos grandes são lidos por mmap e limitados a input_max_bytes (início
+    e final; ver read_text_window).
+    
+    Args:
+        filepath: Caminho para o arquivo ou referência de corpus
     
     Returns:
         Conteúdo do arquivo
+    
+    Raises:
+        ValueError: Se o arquivo ou o documento não puder ser lido (o chamador
+            exibe ou registra o erro em vez de classificar um texto vazio)
     """
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return f.read()
+        if parse_ref(filepath) is not None:
+            return cap_text(read_ref(filepath)["text"])
+        return read_text_window(filepath)
     except Exception as e:
-        print(f"Erro ao ler arquivo {filepath}: {e}")
-        return ""
+        raise ValueError(f"Erro ao ler arquivo {filepath}: {e}") from e
 
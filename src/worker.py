@@ -0,0 +1,138 @@
+"""
+Worker da fila de jobs do VerbaFlow.
+
+Uso:
+    python -m src.worker --workers 4
+
+Cada processo consome jobs de src/jobs.py e executa o pipeline completo.
+O número de workers escala de forma independente da interface Streamlit.
+"""
+import argparse
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import traceback
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from src.config import get_config
+from src.jobs import JobQueue
+
+
+class Heartbeat:
+    """
+    Renova o heartbeat de um job em uma thread própria enquanto ele executa,
+    independente de quanto dure cada etapa do pipeline.
+    """
+
+    def __init__(self, queue: JobQueue, job_id: str, worker_id: str, interval: Optional[float] = None):
+        self.queue = queue
+        self.job_id = job_id
+        self.worker_id = worker_id
+        # Várias renovações por janela de job_stale_timeout
+        self.interval = interval or max(1.0, get_config().job_stale_timeout / 4)
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"heartbeat-{job_id[:8]}", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                if not self.queue.heartbeat(self.job_id, self.worker_id):
+                    self.lost = True
+                    print(f"⚠️ Job {self.job_id} reenfileirado por outro worker; resultado será descartado")
+                    return
+            except Exception as e:
+                print(f"⚠️ Falha ao renovar heartbeat do job {self.job_id}: {e}")
+
+
+def process_job(queue: JobQueue, job: dict):
+    """
+    Executa um job reservado e grava o resultado (ou erro) na fila.
+
+    Args:
+        queue: Fila de jobs
+        job: Job retornado por JobQueue.claim
+    """
+    # Import tardio: mantém o processo pai leve e evita carregar CrewAI antes do fork
+    from src.labels import get_label_set
+    from src.pipeline import run_pipeline
+
+    payload = job["payload"]
+    worker_id = job["worker_id"]
+    with Heartbeat(queue, job["id"], worker_id):
+        try:
+            record = run_pipeline(
+                raw_text=payload["raw_text"],
+                ground_truth=payload.get("ground_truth", ""),
+                model_name=payload.get("model_name"),
+                few_shot_examples=payload.get("few_shot_examples"),
+                label_set=get_label_set(payload.get("label_set")),
+                on_stage=lambda label: queue.update_stage(job["id"], worker_id, label),
+                profile=payload.get("profile")
+            )
+            queue.complete(job["id"], worker_id, record)
+        except Exception as e:
+            print(f"Erro no job {job['id']}: {e}")
+            traceback.print_exc()
+            queue.fail(job["id"], worker_id, str(e))
+
+
+def run_worker(db_path: Optional[str] = None, poll_interval: Optional[float] = None):
+    """
+    Loop principal de um worker: reserva e processa jobs indefinidamente.
+
+    Args:
+        db_path: Caminho do banco da fila (None usa a configuração)
+        poll_interval: Intervalo entre consultas quando a fila está vazia
+    """
+    load_dotenv()
+    config = get_config()
+    poll_interval = poll_interval or config.job_poll_interval
+    queue = JobQueue(db_path)
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    print(f"Worker {worker_id} aguardando jobs em {queue.db_path}")
+
+    while True:
+        queue.requeue_stale()
+        job = queue.claim(worker_id)
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+        print(f"Worker {worker_id} processando job {job['id']}")
+        process_job(queue, job)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Workers da fila de jobs do VerbaFlow")
+    parser.add_argument("--workers", type=int, default=1, help="Número de processos worker")
+    parser.add_argument("--db", default=None, help="Caminho do banco SQLite da fila")
+    args = parser.parse_args()
+
+    if args.workers <= 1:
+        run_worker(args.db)
+        return
+
+    processes = [
+        multiprocessing.Process(target=run_worker, args=(args.db,), daemon=False)
+        for _ in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()